@@ -0,0 +1,245 @@
+import base64
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import numpy as np
+
+from utils.daemon_client import SOCKET_PATH
+
+# Heavy imports happen once here, not per authentication
+import cv2
+import face_recognition
+import face_auth.recognize_face as face_verify
+import face_auth.register_face as face_register
+import voice_auth.voice_verify as voice_verify
+from utils import encryption, orchestrator, session, shadow, verify_service
+from voice_auth import features, phrase_match
+
+
+# === Resident State ===
+# Everything a verification needs that is expensive to load: dlib models (loaded
+# by the face_recognition import), the face encoding and GMM, the secret
+# phrase, and the MFCC filterbank matrices.
+class WarmState:
+    def __init__(self):
+        self.saved_encoding = None
+        self.gmm_model = None
+        self.saved_phrase = None
+        self.phrase_templates = None
+        self.reload()
+        self.warm_up()
+
+    def reload(self):
+        self.saved_encoding = None
+        self.gmm_model = None
+        self.saved_phrase = None
+        if face_verify.saved_encoding_exists():
+            self.saved_encoding = face_verify.load_saved_encoding()
+        if voice_verify.voice_model_exists() and os.path.exists(voice_verify.PHRASE_FILE):
+            self.gmm_model, self.saved_phrase = voice_verify.load_voice_models()
+        self.phrase_templates = phrase_match.load_templates()
+
+    def warm_up(self):
+        # First calls build the MFCC matrices and dlib allocations; pay for them before any user waits
+        features.mfcc(np.zeros(voice_verify.RATE, dtype=np.int16), voice_verify.RATE)
+        face_recognition.face_locations(np.zeros((120, 160, 3), dtype=np.uint8))
+        if self.gmm_model is not None:
+            self.gmm_model.score(np.zeros((1, 13)))
+
+    def loaded(self):
+        return {
+            "face": self.saved_encoding is not None,
+            "voice": self.gmm_model is not None,
+            "phrase": self.saved_phrase is not None,
+            "phrase_templates": len(self.phrase_templates[0]),
+        }
+
+
+class AuthHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        start = time.perf_counter()
+        try:
+            message = json.loads(line)
+            response = self.server.dispatch(message)
+        except verify_service.ServiceBusy as e:
+            # Backpressure: the terminal should retry shortly
+            response = {"ok": False, "error": str(e), "busy": True}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        response["elapsed"] = time.perf_counter() - start
+        self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+class AuthDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    # Each connection gets a thread so terminal sessions (session_* ops) are served
+    # concurrently; everything using this host's camera and microphone, or
+    # reloading models, still runs one at a time under device_lock
+    daemon_threads = True
+    SESSION_OPS = ("session_open", "session_frame", "session_voice", "session_close", "ping")
+
+    def __init__(self, path=SOCKET_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+        self.state = WarmState()
+        self.device_lock = threading.Lock()
+        self.service = None
+        self.service_lock = threading.Lock()
+        super().__init__(path, AuthHandler)
+        os.chmod(path, 0o600)
+
+    def dispatch(self, message):
+        if message.get("op") in self.SESSION_OPS:
+            return self.dispatch_session(message)
+        with self.device_lock:
+            return self.dispatch_device(message)
+
+    # === Terminal Sessions ===
+    # A door terminal opens a session, then sends frames (base64 JPEG/PNG, with
+    # its own face box if it has one) and endpointed utterances (base64 int16
+    # PCM at 16 kHz) until the result carries a decision, then closes it.
+    # Work from all sessions is batched by utils/verify_service.py, which also
+    # enforces the policy: voice only after the face, failed attempts counted on
+    # disk per identity (shared with every other entry point), and a lockdown run
+    # here the moment a session's face passed and its voice failed.
+    def lockdown(self, verification):
+        print(f"🚨 Session {verification.id}: face passed, voice failed. Securing secure_files.")
+        encryption.secure_delete_folder("secure_files", silent=True)
+
+    def dispatch_session(self, message):
+        op = message.get("op")
+        state = self.state
+
+        if op == "ping":
+            return {"ok": True, "loaded": state.loaded()}
+
+        if op == "session_open":
+            with self.service_lock:
+                if self.service is None:
+                    self.service = verify_service.VerificationService(state.saved_encoding, state.gmm_model,
+                                                                      state.phrase_templates, failures=session,
+                                                                      on_lockdown=self.lockdown)
+            return {"ok": True, "session": self.service.open_session().id}
+
+        if self.service is None:
+            return {"ok": False, "error": "No sessions are open."}
+
+        if op == "session_frame":
+            verification = self.service.session(message["session"])
+            data = np.frombuffer(base64.b64decode(message["frame"]), dtype=np.uint8)
+            frame = cv2.imdecode(data, cv2.IMREAD_COLOR)
+            if frame is None:
+                return {"ok": False, "error": "Frame is not a JPEG/PNG image"}
+            result = verification.submit_frame(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), message.get("box")).result()
+            if result is None:
+                return {"ok": True, "dropped": True}
+            return {"ok": True, "result": result}
+
+        if op == "session_voice":
+            verification = self.service.session(message["session"])
+            samples = np.frombuffer(base64.b64decode(message["samples"]), dtype=np.int16)
+            return {"ok": True, "result": verification.submit_utterance(samples).result()}
+
+        if op == "session_close":
+            return {"ok": True, "result": self.service.close_session(message["session"])}
+
+    def dispatch_device(self, message):
+        op = message.get("op")
+        state = self.state
+
+        if op == "reload":
+            state.reload()
+            self.update_service()
+            return {"ok": True, "loaded": state.loaded()}
+
+        if op == "verify_face":
+            if state.saved_encoding is None:
+                return {"ok": False, "error": "No face encoding found. Please run setup."}
+            result = face_verify.verify_face(pipelined=message.get("pipelined", False),
+                                             saved_encoding=state.saved_encoding)
+            return {"ok": True, "result": bool(result)}
+
+        if op == "verify_voice":
+            if state.gmm_model is None:
+                return {"ok": False, "error": "Voice model or passphrase file not found."}
+            # Attempts continue from the shared per-identity count (utils/.failures),
+            # so each request does not get MAX_ATTEMPTS of its own
+            try:
+                result = voice_verify.verify_speaker_and_phrase(state.gmm_model, state.saved_phrase,
+                                                              state.phrase_templates)
+            except SystemExit:
+                # Lockdown ran and asked the process to exit; the client exits instead of the daemon
+                return {"ok": True, "result": False, "lockdown": True}
+            if result and voice_verify.ADAPT_ON_LOGIN:
+                state.reload()  # Pick up the adapted voiceprint
+                self.update_service()
+            return {"ok": True, "result": bool(result)}
+
+        if op == "verify_concurrent":
+            if state.saved_encoding is None or state.gmm_model is None:
+                return {"ok": False, "error": "Biometric model missing. Please run setup."}
+            outcome = orchestrator.verify_concurrently(
+                pipelined=message.get("pipelined", False), saved_encoding=state.saved_encoding,
+                gmm_model=state.gmm_model, saved_phrase=state.saved_phrase,
+                phrase_templates=state.phrase_templates)
+            if outcome["granted"] and voice_verify.ADAPT_ON_LOGIN:
+                state.reload()
+                self.update_service()
+            return {"ok": True, "result": outcome}
+
+        if op == "score_voice":
+            if state.gmm_model is None:
+                return {"ok": False, "error": "Voice model not loaded."}
+            vector = np.asarray(message["features"], dtype=np.float64).reshape(1, -1)
+            return {"ok": True, "result": float(state.gmm_model.score(vector))}
+
+        if op == "enroll_face":
+            face_register.capture_and_save_face(identity=message.get("identity"))
+            state.reload()
+            self.update_service()
+            return {"ok": True, "loaded": state.loaded()}
+
+        if op == "shutdown":
+            # shutdown() blocks until serve_forever() returns, so it cannot run on this thread
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+
+        return {"ok": False, "error": f"Unknown op: {op}"}
+
+    def update_service(self):
+        # Sessions opened from now on use the reloaded models
+        if self.service is not None:
+            self.service.saved_encoding = self.state.saved_encoding
+            self.service.gmm_model = self.state.gmm_model
+            self.service.phrase_templates = self.state.phrase_templates
+
+    def server_close(self):
+        super().server_close()
+        if self.service is not None:
+            self.service.stop()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else SOCKET_PATH
+    print("⏳ Loading biometric models...")
+    t0 = time.perf_counter()
+    daemon = AuthDaemon(path)
+    print(f"✅ Auth daemon ready on {path} ({time.perf_counter() - t0:.2f}s warm-up)")
+    if shadow.ENABLED:
+        # Backups kept current in the background, so a lockdown only has to wipe
+        shadow.ShadowProtector("secure_files", encryption.load_key(), encryption.encrypt_file,
+                               encryption.ENCRYPTED_DIR).start()
+        print(f"🛡 Shadow encryption of secure_files every {shadow.SHADOW_INTERVAL:.0f}s")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
@@ -0,0 +1,119 @@
+# Backing up many small files: one .enc container per file (the default layout)
+# versus appending them to indexed pack files (utils/archive.py). Reports files/s
+# for the backup alone and for the whole lockdown (backup + secure wipe), the
+# cost of restoring one file from each layout, and checks that every file comes
+# back byte for byte.
+# Runs in a temporary directory. Usage: python -m benchmarks.bench_archive [--files 20000] [--max-kb 8]
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORIES = 100
+
+
+def make_tree(root, count, max_kb, seed=0):
+    # Small documents spread over nested folders; returns relative path -> sha256
+    rng = random.Random(seed)
+    digests = {}
+    for i in range(count):
+        rel = os.path.join(f"dir{i % DIRECTORIES:03d}", f"sub{i % 7}", f"doc{i:06d}.txt")
+        data = rng.randbytes(rng.randint(256, max_kb * 1024))
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        digests[rel] = hashlib.sha256(data).hexdigest()
+    return digests
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--max-kb", type=int, default=8, help="File sizes are uniform between 256 B and this")
+    parser.add_argument("--restores", type=int, default=200)
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from utils import archive, encryption, lockdown, stream_crypto
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # encrypt_file works relative to the repository layout (secure_files/, .encrypted_backups/)
+        os.chdir(tmp)
+        key = encryption.load_key()
+        results = {}
+
+        # --- Backup only, one thread: the per-file metadata cost in isolation ---
+        digests = make_tree("secure_files", args.files, args.max_kb)
+        paths = [os.path.join("secure_files", rel) for rel in digests]
+        seconds, _ = timed(lambda: [encryption.encrypt_file(p, key) for p in paths])
+        results["per-file .enc, backup"] = seconds
+
+        def pack_all():
+            writer = archive.PackWriter(encryption.ENCRYPTED_DIR, key, root="secure_files")
+            for p in paths:
+                writer.add(p)
+            writer.seal()
+        seconds, _ = timed(pack_all)
+        results["packed, backup"] = seconds
+        packs = archive.list_packs(encryption.ENCRYPTED_DIR)
+
+        # --- Single-file restore ---
+        sample = random.Random(1).sample(list(digests), min(args.restores, len(digests)))
+        enc_dir = encryption.ENCRYPTED_DIR
+        t0 = time.perf_counter()
+        for rel in sample:
+            stream_crypto.decrypt_path(os.path.join(enc_dir, rel + ".enc"), "restored.tmp", key)
+        enc_restore = (time.perf_counter() - t0) / len(sample)
+        t0 = time.perf_counter()
+        for rel in sample:
+            archive.restore_file(rel, "restored.tmp", key, enc_dir)
+        pack_restore = (time.perf_counter() - t0) / len(sample)
+        with archive.PackReader(packs[-1], key) as reader:
+            t0 = time.perf_counter()
+            for rel in sample:
+                reader.read(rel)
+            open_restore = (time.perf_counter() - t0) / len(sample)
+
+        # --- Round trip ---
+        seconds_restore, restored = timed(lambda: archive.restore_all("restored", key, enc_dir))
+        bad = [rel for rel, digest in digests.items()
+               if hashlib.sha256(open(os.path.join("restored", rel), "rb").read()).hexdigest() != digest]
+
+        # --- Full lockdown (backup + wipe) through the engine, both layouts ---
+        for label, packed in (("per-file .enc, lockdown", False), ("packed, lockdown", True)):
+            make_tree("secure_files", args.files, args.max_kb)
+            packer = archive.PackWriter(enc_dir, key, root="secure_files") if packed else None
+            engine = lockdown.LockdownEngine(key, encryption.encrypt_file, encryption.secure_delete,
+                                             silent=True, packer=packer)
+            stats = engine.run("secure_files")
+            results[label] = stats["seconds"]
+            if stats["errors"] or stats["files"] != args.files:
+                print(f"⚠️ {label}: {stats['files']} files, {stats['errors']} errors")
+
+        os.chdir(REPO_ROOT)
+
+    print(f"{args.files} files of 256 B – {args.max_kb} KiB, {len(packs)} pack file(s)\n")
+    print(f"{'layout':<26}{'seconds':>9}{'files/s':>10}")
+    for label, seconds in results.items():
+        print(f"{label:<26}{seconds:>9.2f}{args.files / seconds:>10.0f}")
+    print(f"\nRestore one file: .enc {enc_restore * 1000:.2f} ms, pack (open + index + entry) "
+          f"{pack_restore * 1000:.2f} ms, open pack {open_restore * 1000:.3f} ms")
+    print(f"Restored all {restored} files from packs in {seconds_restore:.2f}s; "
+          + ("✅ all match" if not bad else f"❌ {len(bad)} differ"))
+    if bad:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Cold start (fresh interpreter imports and loads every model) versus a warm
+# auth daemon, measured end to end from a new client process each time.
+# Usage: python -m benchmarks.bench_cold_warm [--runs 5]
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEATURES = [0.0] * 13
+
+COLD_SCRIPT = f"""
+import numpy as np
+import face_auth.recognize_face as face_verify
+import voice_auth.voice_verify as voice_verify
+from voice_auth import features
+face_verify.load_saved_encoding()
+gmm, phrase = voice_verify.load_voice_models()
+features.mfcc(np.zeros(voice_verify.RATE, dtype=np.int16), voice_verify.RATE)
+gmm.score(np.array([{FEATURES}]))
+"""
+
+WARM_SCRIPT = f"""
+from utils.daemon_client import request
+request("score_voice", features={FEATURES})
+"""
+
+
+def write_synthetic_models(directory):
+    from sklearn.mixture import GaussianMixture
+    rng = np.random.default_rng(0)
+    gmm = GaussianMixture(n_components=3, covariance_type="diag", reg_covar=1e-2).fit(rng.normal(size=(30, 13)))
+    from voice_auth.gmm import DiagonalGMM
+    from face_auth.recognize_face import save_encoding
+    DiagonalGMM.from_sklearn(gmm).save(os.path.join(directory, "voiceprint.model"))
+    save_encoding(rng.normal(0.0, 0.1, 128), os.path.join(directory, "face_encoding.model"))
+    os.makedirs(os.path.join(directory, "voice_auth"), exist_ok=True)
+    with open(os.path.join(directory, "voice_auth", "secret_phrase.txt"), "w") as f:
+        f.write("open sesame")
+
+
+def timed_run(script, cwd, env):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", script], cwd=cwd, env=env, check=True)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_synthetic_models(tmp)
+        socket_path = os.path.join(tmp, "bench.sock")
+        python_path = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+        env = dict(os.environ, PYTHONPATH=python_path, SECUREAUTH_SOCKET=socket_path)
+
+        cold = [timed_run(COLD_SCRIPT, tmp, env) for _ in range(args.runs)]
+
+        t0 = time.perf_counter()
+        daemon = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "auth_daemon.py"), socket_path],
+                                  cwd=tmp, env=env, stdout=subprocess.DEVNULL)
+        try:
+            sys.path.insert(0, REPO_ROOT)
+            from utils.daemon_client import daemon_available, request
+            while not daemon_available(socket_path):
+                if daemon.poll() is not None:
+                    raise RuntimeError("Auth daemon exited during start-up")
+                time.sleep(0.05)
+            startup = time.perf_counter() - t0
+
+            warm = [timed_run(WARM_SCRIPT, tmp, env) for _ in range(args.runs)]
+            in_process = []
+            for _ in range(args.runs * 20):
+                t1 = time.perf_counter()
+                request("score_voice", path=socket_path, features=FEATURES)
+                in_process.append(time.perf_counter() - t1)
+            request("shutdown", path=socket_path)
+        finally:
+            daemon.wait(timeout=10)
+
+    print(f"Daemon one-off start-up:          {startup * 1000:9.1f} ms")
+    print(f"Cold client (imports + models):   {np.median(cold) * 1000:9.1f} ms median of {args.runs}")
+    print(f"Warm client (new process):        {np.median(warm) * 1000:9.1f} ms median of {args.runs}")
+    print(f"Warm request (socket round trip): {np.median(in_process) * 1000:9.3f} ms median")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# End-to-end enroll and verify flows replayed from a recorded corpus, with
+# per-stage p50/p95 latency, throughput and peak memory. Each flow runs in its
+# own interpreter (so peak RSS is per flow) with the camera, microphone and
+# typed answers replaced by utils.sources replays. Nothing is mocked: the real
+# detection, encoding, MFCC, training, scoring and phrase matching code runs.
+#
+# Corpus layout (--corpus DIR); without one a synthetic corpus is generated,
+# which exercises every stage but is no substitute for real faces and voices:
+#   face_enroll/    frames (images) or one video replayed as the enrollment camera
+#   face_verify/    frames or video for each verification attempt
+#   voice_enroll/   WAVs in recording order: 3 guided sentences, the secret phrase,
+#                   then its 2 repetitions
+#   voice_verify/   WAVs of the secret phrase, one per verification attempt
+#   answers.txt     typed enrollment answers (the phrase, then "y")
+#
+# Usage: python -m benchmarks.bench_e2e [--corpus DIR] [--enroll-runs 1] [--verify-runs 10]
+#                                       [--json out.json] [--baseline old.json --tolerance 0.25]
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RATE = 16000
+SYNTHETIC_PHRASE = "open sesame"
+SYNTHETIC_FRAMES = 12
+
+
+# === Synthetic Corpus ===
+def _voice(pitches, seconds, rng, formants=(700.0, 1200.0, 2600.0)):
+    # A crude "speaker": harmonics of a gliding pitch shaped by fixed formants,
+    # one syllable per pitch, with a little noise so no two takes are identical
+    t = np.arange(int(seconds * RATE)) / RATE
+    syllable = len(t) // len(pitches)
+    signal = np.zeros(len(t))
+    for i, f0 in enumerate(pitches):
+        part = t[:syllable]
+        f0 = f0 * (1 + 0.01 * rng.normal())
+        envelope = np.sin(np.pi * np.arange(syllable) / syllable) ** 2
+        for h in range(1, 16):
+            gain = sum(np.exp(-((h * f0 - f) / 150.0) ** 2) for f in formants) + 0.05
+            signal[i * syllable:(i + 1) * syllable] += gain / h * envelope * np.sin(2 * np.pi * h * f0 * part)
+    signal += 0.01 * rng.normal(size=len(t))
+    return (0.3 * signal / np.abs(signal).max() * 32767).astype(np.int16)
+
+
+def _write_wav(path, samples):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(samples.tobytes())
+
+
+def _face_frames(directory, rng):
+    import cv2
+    os.makedirs(directory, exist_ok=True)
+    for i in range(SYNTHETIC_FRAMES):
+        frame = np.full((480, 640, 3), 90, dtype=np.uint8)
+        cx, cy = 320 + int(rng.integers(-4, 5)), 240 + int(rng.integers(-4, 5))
+        cv2.ellipse(frame, (cx, cy), (90, 120), 0, 0, 360, (140, 170, 215), -1)
+        for dx in (-35, 35):
+            cv2.circle(frame, (cx + dx, cy - 30), 10, (40, 40, 40), -1)
+        cv2.ellipse(frame, (cx, cy + 50), (35, 12), 0, 0, 180, (60, 60, 150), 4)
+        cv2.imwrite(os.path.join(directory, f"frame_{i:03d}.jpg"), frame)
+
+
+def synthesize_corpus(root, verify_takes=5):
+    rng = np.random.default_rng(0)
+    _face_frames(os.path.join(root, "face_enroll"), rng)
+    _face_frames(os.path.join(root, "face_verify"), rng)
+
+    phrase = [180, 220, 160, 200]
+    # The guided sentences reuse the phrase's syllables in other orders: same "voice", different words
+    enroll = [[220, 180, 200, 160], [160, 200, 220, 180], [200, 160, 180, 220], phrase, phrase, phrase]
+    os.makedirs(os.path.join(root, "voice_enroll"))
+    for i, pitches in enumerate(enroll):
+        _write_wav(os.path.join(root, "voice_enroll", f"{i:02d}.wav"), _voice(pitches, 4, rng))
+    os.makedirs(os.path.join(root, "voice_verify"))
+    for i in range(verify_takes):
+        _write_wav(os.path.join(root, "voice_verify", f"{i:02d}.wav"), _voice(phrase, 4, rng))
+    with open(os.path.join(root, "answers.txt"), "w", encoding="utf-8") as f:
+        f.write(f"{SYNTHETIC_PHRASE}\ny\n")
+
+
+# === Flow Runner (child process) ===
+STAGES = {}
+
+
+def timed(name, fn):
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            STAGES.setdefault(name, []).append(time.perf_counter() - t0)
+    return wrapper
+
+
+def instrument(owner, attr, name):
+    setattr(owner, attr, timed(name, getattr(owner, attr)))
+
+
+def run_flow(flow, runs, out_path, replay):
+    import resource
+    import face_recognition
+    import face_auth.recognize_face as face_verify
+    import face_auth.register_face as face_register
+    import voice_auth.voice_register as voice_register
+    import voice_auth.voice_verify as voice_verify
+    from voice_auth import phrase_match
+    from voice_auth.gmm import DiagonalGMM
+
+    from utils import sources
+    sources.use_replay(**replay)
+
+    # Stage boundaries are the functions the flows already call through module attributes
+    instrument(face_recognition, "face_locations", "face.detect")
+    instrument(face_recognition, "face_encodings", "face.encode")
+    instrument(voice_register, "record_samples", "voice.record")
+    instrument(voice_register, "sample_vectors", "voice.features")
+    instrument(voice_register.VoiceprintTrainer, "_train", "voice.train_step")
+    instrument(voice_register, "save_phrase_templates", "voice.phrase_templates")
+    instrument(voice_verify, "record_to_memory", "voice.capture")
+    instrument(DiagonalGMM, "score", "voice.score")
+    instrument(phrase_match, "match_phrase", "voice.phrase_match")
+
+    results = []
+    if flow == "enroll":
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            timed("face.enroll", face_register.capture_and_save_face)()
+            timed("voice.enroll", voice_register.record_and_save_voice)()
+            results.append((time.perf_counter() - t0, face_verify.saved_encoding_exists()
+                            and voice_verify.voice_model_exists()))
+    else:
+        saved_encoding = timed("load.face", face_verify.load_saved_encoding)()
+        gmm_model, saved_phrase = timed("load.voice", voice_verify.load_voice_models)()
+        templates = timed("load.phrase", phrase_match.load_templates)()
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            face_ok = timed("face.verify", face_verify.verify_face)(saved_encoding=saved_encoding)
+            voice_ok = timed("voice.verify", voice_verify.voice_attempt)(gmm_model, saved_phrase, templates,
+                                                                         settle_seconds=0)
+            results.append((time.perf_counter() - t0, bool(face_ok and voice_ok)))
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"runs": [r[0] for r in results], "ok": sum(r[1] for r in results),
+                   "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                   "stages": STAGES}, f)
+
+
+# === Driver ===
+def launch(flow, runs, corpus, workdir, verbose):
+    answers = os.path.join(workdir, "answers.txt")
+    if flow == "enroll":
+        # Every enrollment run types the same answers again
+        with open(os.path.join(corpus, "answers.txt"), "r", encoding="utf-8") as f:
+            script = f.read()
+        with open(answers, "w", encoding="utf-8") as f:
+            f.write((script.rstrip("\n") + "\n") * runs)
+
+    python_path = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+    env = dict(os.environ, PYTHONPATH=python_path, SECUREAUTH_TTS="off")
+    out_path = os.path.join(workdir, f"{flow}.json")
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--run-flow", flow, "--runs", str(runs),
+                    "--out", out_path, "--camera", os.path.join(corpus, f"face_{flow}"),
+                    "--mic", os.path.join(corpus, f"voice_{flow}"), "--answers", answers],
+                   cwd=workdir, env=env, check=True,
+                   stdout=None if verbose else subprocess.DEVNULL)
+    with open(out_path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    result["process_seconds"] = time.perf_counter() - t0
+    return result
+
+
+def summarize(durations):
+    d = np.asarray(durations) * 1000
+    return {"n": len(d), "p50_ms": float(np.percentile(d, 50)), "p95_ms": float(np.percentile(d, 95)),
+            "per_second": float(len(d) / max(d.sum() / 1000, 1e-9))}
+
+
+def report(flows):
+    summary = {}
+    for flow, result in flows.items():
+        stats = summarize(result["runs"])
+        stats.update(ok=result["ok"], peak_rss_mb=result["peak_rss_mb"])
+        stages = {name: summarize(values) for name, values in sorted(result["stages"].items())}
+        summary[flow] = {"flow": stats, "stages": stages}
+
+        print(f"\n{flow}: {stats['ok']}/{stats['n']} succeeded, p50 {stats['p50_ms']:.0f} ms, "
+              f"p95 {stats['p95_ms']:.0f} ms, {stats['per_second']:.2f} runs/s, peak RSS {stats['peak_rss_mb']:.0f} MB")
+        print(f"  {'stage':<24}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'calls/s':>10}")
+        for name, s in stages.items():
+            print(f"  {name:<24}{s['n']:>7}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['per_second']:>10.1f}")
+    return summary
+
+
+def regressions(summary, baseline, tolerance):
+    # p95 of every flow and stage present in both runs, slower by more than tolerance
+    found = []
+    for flow, current in summary.items():
+        old = baseline.get(flow)
+        if not old:
+            continue
+        pairs = [(flow, current["flow"], old["flow"])]
+        pairs += [(f"{flow}/{name}", s, old["stages"][name]) for name, s in current["stages"].items()
+                  if name in old["stages"]]
+        for name, new, previous in pairs:
+            if new["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                found.append(f"{name}: p95 {previous['p95_ms']:.2f} -> {new['p95_ms']:.2f} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="Recorded corpus directory (see the layout above)")
+    parser.add_argument("--enroll-runs", type=int, default=1)
+    parser.add_argument("--verify-runs", type=int, default=10)
+    parser.add_argument("--json", help="Write the summary here")
+    parser.add_argument("--baseline", help="Summary from an earlier run; exit 1 if a p95 regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--verbose", action="store_true", help="Show the flows' own output")
+    parser.add_argument("--run-flow", choices=("enroll", "verify"), help=argparse.SUPPRESS)
+    parser.add_argument("--runs", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    parser.add_argument("--camera", help=argparse.SUPPRESS)
+    parser.add_argument("--mic", help=argparse.SUPPRESS)
+    parser.add_argument("--answers", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_flow:
+        run_flow(args.run_flow, args.runs, args.out,
+                 {"camera": args.camera, "mic": args.mic, "answers": args.answers})
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = os.path.join(tmp, "corpus")
+            synthesize_corpus(corpus)
+            print("ℹ️ No --corpus given: using a synthetic corpus (timings only; match results are not meaningful).")
+        corpus = os.path.abspath(corpus)
+        workdir = os.path.join(tmp, "work")
+        os.makedirs(workdir)
+
+        flows = {"enroll": launch("enroll", args.enroll_runs, corpus, workdir, args.verbose),
+                 "verify": launch("verify", args.verify_runs, corpus, workdir, args.verbose)}
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = report(flows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            found = regressions(summary, json.load(f), args.tolerance)
+        for line in found:
+            print(f"❌ Regression {line}")
+        if found:
+            sys.exit(1)
+        print(f"✅ No p95 regression beyond {args.tolerance:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
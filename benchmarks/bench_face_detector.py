@@ -0,0 +1,119 @@
+# Full-frame HOG (face_recognition.face_locations) versus the cascaded detector
+# in face_auth/detector.py on a fixed image set: latency, recall against HOG's
+# own detections, and the distance between encodings computed from the two
+# boxes (far below the 0.6 match tolerance means faces enrolled with one
+# detector still verify with the other).
+#
+# The cascade is run twice: fresh for every image (cold, no size hint) and as
+# one session over the images in name order (adaptive resolution; meaningful
+# when the images are consecutive frames, e.g. extracted from a webcam video).
+# Usage: python -m benchmarks.bench_face_detector --images DIR [--width 640] [--first-stage haar|yunet]
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+MIN_IOU = 0.5
+
+
+def load_images(directory, width):
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        frame = cv2.imread(os.path.join(directory, name))
+        if frame is None:
+            continue
+        if width and frame.shape[1] != width:
+            frame = cv2.resize(frame, (width, int(frame.shape[0] * width / frame.shape[1])), interpolation=cv2.INTER_AREA)
+        images.append((name, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+    return images
+
+
+def iou(a, b):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area = lambda box: (box[2] - box[0]) * (box[1] - box[3])
+    return inter / max(area(a) + area(b) - inter, 1)
+
+
+def run(images, make):
+    # (per-image seconds, per-image boxes); make(i) returns the detector for image i
+    seconds, boxes = [], []
+    for i, (_, rgb) in enumerate(images):
+        detector = make(i)
+        t0 = time.perf_counter()
+        boxes.append(detector.locate(rgb))
+        seconds.append(time.perf_counter() - t0)
+    return seconds, boxes
+
+
+def compare(images, reference, boxes):
+    # Recall against the reference boxes, detections the reference does not have,
+    # and encoding distances for matched faces
+    import face_recognition
+    hits = expected = extra = 0
+    distances = []
+    for (_, rgb), ref, found in zip(images, reference, boxes):
+        if not ref:
+            extra += bool(found)
+            continue
+        expected += 1
+        best = max(found, key=lambda box: max(iou(box, r) for r in ref), default=None)
+        if best is None:
+            continue
+        match = max(ref, key=lambda r: iou(best, r))
+        if iou(best, match) < MIN_IOU:
+            continue
+        hits += 1
+        a, b = face_recognition.face_encodings(rgb, [match, best])
+        distances.append(float(np.linalg.norm(a - b)))
+    return hits, expected, extra, distances
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", required=True, help="Directory of face images or video frames")
+    parser.add_argument("--width", type=int, default=640, help="Resize to this width (webcam-like); 0 keeps the original")
+    parser.add_argument("--first-stage", choices=("haar", "yunet"), default=None)
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from face_auth import detector as detectors
+
+    images = load_images(args.images, args.width)
+    if not images:
+        sys.exit(f"No images in {args.images}")
+    candidates = detectors.first_stage(args.first_stage)
+    if candidates is None:
+        sys.exit("No Haar cascade or YuNet model available in this OpenCV build")
+    print(f"{len(images)} images, first stage: {candidates.name}")
+
+    hog_seconds, hog_boxes = run(images, lambda i: detectors.HogDetector())
+    session = detectors.CascadeDetector(candidates)
+    results = {
+        "hog (full frame)": (hog_seconds, hog_boxes),
+        "cascade, per image": run(images, lambda i: detectors.CascadeDetector(candidates)),
+        "cascade, session": run(images, lambda i: session),
+    }
+
+    print(f"\n{'detector':<22}{'p50 ms':>9}{'p95 ms':>9}{'img/s':>8}{'recall':>9}{'extra':>7}{'enc dist med/max':>18}")
+    for label, (seconds, boxes) in results.items():
+        ms = np.asarray(seconds) * 1000
+        hits, expected, extra, distances = compare(images, hog_boxes, boxes)
+        recall = f"{hits}/{expected}"
+        dist = f"{np.median(distances):.3f}/{np.max(distances):.3f}" if distances else "-"
+        print(f"{label:<22}{np.percentile(ms, 50):>9.1f}{np.percentile(ms, 95):>9.1f}"
+              f"{len(ms) / ms.sum() * 1000:>8.1f}{recall:>9}{extra:>7}{dist:>18}")
+    print(f"\nSession stats: {session.stats}")
+    print("recall: faces HOG found that the detector also found (IoU >= 0.5); "
+          "enc dist: encoding distance between the two boxes (match tolerance 0.6)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Face gallery match latency at growing gallery sizes.
+# Usage: python -m benchmarks.bench_face_gallery [--sizes 1000,100000,1000000] [--queries 200]
+import argparse
+import tempfile
+import time
+import numpy as np
+from face_auth.gallery import FaceGallery, ENCODING_DIM
+
+
+def synthetic_gallery(directory, size, rng, chunk=100000):
+    # Roughly the spread of real dlib encodings; one row per identity
+    gallery = FaceGallery(directory)
+    with open(gallery.matrix_path, "wb") as m, open(gallery.ids_path, "w") as ids:
+        for start in range(0, size, chunk):
+            n = min(chunk, size - start)
+            m.write(rng.normal(0.0, 0.1, (n, ENCODING_DIM)).astype(np.float32).tobytes())
+            ids.write("".join(f"user{i}\n" for i in range(start, start + n)))
+    gallery.reload()
+    return gallery
+
+
+def time_queries(fn, queries):
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>9} {'mode':>8} {'p50 ms':>9} {'p95 ms':>9} {'recall@1':>9} {'build s':>8}")
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            gallery = synthetic_gallery(tmp, size, rng)
+            picks = rng.choice(size, args.queries)
+            queries = np.asarray(gallery.matrix[picks]) + rng.normal(0.0, 0.02, (args.queries, ENCODING_DIM)).astype(np.float32)
+            gallery.sq_norms()  # One-off cost, paid at load in a long-running process
+
+            p50, p95 = time_queries(lambda q: gallery.search(q, 1), queries)
+            exact, _ = gallery.search(queries, 1)
+            print(f"{size:>9} {'exact':>8} {p50:>9.3f} {p95:>9.3f} {(exact[:, 0] == picks).mean():>9.3f} {'-':>8}")
+
+            t0 = time.perf_counter()
+            index = gallery.build_index()
+            build_s = time.perf_counter() - t0
+            p50, p95 = time_queries(lambda q: index.search(gallery.matrix, q, 1, nprobe=args.nprobe), queries)
+            approx, _ = index.search(gallery.matrix, queries, 1, nprobe=args.nprobe)
+            print(f"{size:>9} {'ivf-int8':>8} {p50:>9.3f} {p95:>9.3f} {(approx[:, 0] == picks).mean():>9.3f} {build_s:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# MFCC front end: librosa.load + librosa.feature.mfcc per file (the old
+# extract_features) versus voice_auth.features, single and batched, plus a
+# numerical-equivalence check against librosa that exits non-zero on mismatch.
+# Usage: python -m benchmarks.bench_features [--utterances 32] [--seconds 5] [--repeats 5]
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+import numpy as np
+from voice_auth import features
+
+RTOL = 1e-4  # Relative to the largest coefficient; float32 end to end stays far below this
+
+
+def synthetic_utterances(n, seconds, rng):
+    # Voiced-ish int16 audio: a few harmonics with a moving pitch plus noise and pauses
+    t = np.arange(int(seconds * features.RATE)) / features.RATE
+    utterances = []
+    for _ in range(n):
+        pitch = rng.uniform(90, 250) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(0.5, 2) * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / features.RATE
+        voiced = sum(np.sin(h * phase) / h for h in range(1, 6))
+        envelope = (np.sin(2 * np.pi * rng.uniform(1, 3) * t) > -0.3).astype(float)
+        y = 6000 * voiced * envelope + rng.normal(0, 200, len(t))
+        utterances.append(np.clip(y, -32768, 32767).astype(np.int16))
+    return utterances
+
+
+def write_wav(path, samples):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(features.RATE)
+        wf.writeframes(samples.tobytes())
+
+
+def first_call_seconds(statement):
+    # Fresh interpreter: imports plus the first MFCC, what a cold verification pays
+    script = ("import time; t0 = time.perf_counter(); import numpy as np; " + statement +
+              "; print(time.perf_counter() - t0)")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])))
+    out = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True, env=env)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def check_equivalence(utterances, paths):
+    import librosa
+    worst = 0.0
+    batch_frames, batch_pooled = features.extract_batch(utterances)
+    for samples, path, frames, pooled in zip(utterances, paths, batch_frames, batch_pooled):
+        y, _ = librosa.load(path, sr=features.RATE)
+        reference = librosa.feature.mfcc(y=y, sr=features.RATE, n_mfcc=features.N_MFCC)
+        scale = np.abs(reference).max()
+        single = features.mfcc(samples)
+        if single.shape != reference.shape:
+            raise AssertionError(f"Frame count differs: {single.shape} vs librosa {reference.shape}")
+        worst = max(worst,
+                    np.abs(single - reference).max() / scale,
+                    np.abs(frames - reference).max() / scale,
+                    np.abs(pooled - reference.mean(axis=1)).max() / scale)
+        if not np.allclose(features.load_wav(path), y, atol=1e-7):
+            raise AssertionError(f"{path}: load_wav differs from librosa.load")
+    if np.abs(features.mel_filterbank() - librosa.filters.mel(sr=features.RATE, n_fft=features.N_FFT,
+                                                              n_mels=features.N_MELS)).max() > 1e-6:
+        raise AssertionError("Mel filterbank differs from librosa.filters.mel")
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--utterances", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    import librosa
+    rng = np.random.default_rng(0)
+    utterances = synthetic_utterances(args.utterances, args.seconds, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i, samples in enumerate(utterances):
+            paths.append(os.path.join(tmp, f"utt{i}.wav"))
+            write_wav(paths[-1], samples)
+
+        worst = check_equivalence(utterances, paths)
+        print(f"Equivalence vs librosa: max relative error {worst:.2e} (limit {RTOL:.0e})")
+        if worst > RTOL:
+            print("❌ MFCC front end no longer matches librosa")
+            sys.exit(1)
+
+        def librosa_files():
+            for path in paths:
+                y, sr = librosa.load(path, sr=features.RATE)
+                np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=features.N_MFCC).T, axis=0)
+
+        def features_files():
+            for path in paths:
+                features.extract(features.load_wav(path))
+
+        runs = [
+            ("librosa, from WAV", librosa_files),
+            ("features, from WAV", features_files),
+            ("features, int16 each", lambda: [features.extract(u) for u in utterances]),
+            ("features, int16 batch", lambda: features.extract_batch(utterances)),
+        ]
+        cold_librosa = first_call_seconds("import librosa; librosa.feature.mfcc(y=np.zeros(16000, np.float32), sr=16000)")
+        cold_features = first_call_seconds("from voice_auth import features; features.mfcc(np.zeros(16000, np.int16))")
+        print(f"First call in a fresh process: librosa {cold_librosa * 1000:.0f} ms, features {cold_features * 1000:.0f} ms")
+
+        librosa_files()  # Warm up librosa in this process too; the table compares steady state
+        print(f"{'front end':>22} {'ms/utterance':>13} {'x realtime':>11}")
+        for name, fn in runs:
+            seconds = best_of(fn, args.repeats)
+            per = seconds / len(utterances)
+            print(f"{name:>22} {per * 1000:>13.3f} {args.seconds / per:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Cost of a protected action inside an authenticated session: issuing a token,
+# checking the stored token (file read + HMAC), checking one already in memory,
+# and rejecting a forged one, next to a full biometric pass (SecureAuth's face
+# and voice check takes seconds; pass --full-pass-ms to use a measured figure,
+# e.g. the auth.verify p50 from bench_e2e).
+# Runs in a temporary directory, so the real session and key are untouched.
+# Usage: python -m benchmarks.bench_session [--iterations 20000] [--full-pass-ms 9000]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(fn, iterations):
+    # Per-call microseconds, in batches of 100 so the timer is not what is measured
+    batches = []
+    for _ in range(max(iterations // 100, 1)):
+        t0 = time.perf_counter()
+        for _ in range(100):
+            fn()
+        batches.append((time.perf_counter() - t0) / 100 * 1e6)
+    return batches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--full-pass-ms", type=float, default=9000.0,
+                        help="Latency of one face + voice verification to compare against")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from utils import session
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session.SESSION_KEY_FILE = os.path.join(tmp, ".session_key")
+        session.SESSION_FILE = os.path.join(tmp, ".session")
+        token = session.issue(session.FACTORS)
+        body, mac = token.rsplit(".", 1)
+        forged = f"{body}.{'A' * len(mac)}"
+        assert session.check("high", token) is not None and session.current(forged) is None
+
+        cases = {
+            "issue (sign + write)": lambda: session.issue(session.FACTORS),
+            "check stored token": lambda: session.check("high"),
+            "check token in memory": lambda: session.check("high", token),
+            "reject forged token": lambda: session.current(forged),
+        }
+        print(f"{'operation':<26}{'p50 µs':>10}{'p95 µs':>10}{'vs full pass':>16}")
+        for label, fn in cases.items():
+            us = sorted(measure(fn, args.iterations))
+            p50 = statistics.median(us)
+            p95 = us[int(len(us) * 0.95) - 1]
+            print(f"{label:<26}{p50:>10.1f}{p95:>10.1f}{args.full_pass_ms * 1000 / p50:>15.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# Many terminals verifying against one host through utils/verify_service.py.
+# Each simulated terminal runs sessions back to back: it streams frames at
+# --fps (the first --miss frames do not match) until the face is decided, then
+# sends utterances until the voice is decided, and closes the session. Reports
+# sessions/s and session latency (open to decision, p50/p95/p99) as the number
+# of concurrent terminals grows, with the dynamic batching service against the
+# same service forced to one item at a time (and with CUDA-sized face batches,
+# which only pay off on a CUDA build of dlib). Fairness is the spread of
+# completed sessions across terminals; dropped frames and busy rejections show
+# the backpressure.
+#
+# Frames and utterances are synthetic. Terminals send their own face box (as a
+# terminal with on-device detection would), so the host cost per frame is
+# landmarks + encoding; with the real face_recognition models that is the real
+# dlib network. Nothing is mocked on the host side.
+#
+# Usage: python -m benchmarks.bench_sessions [--terminals 1,4,8,16,32] [--seconds 8] [--fps 10] [--miss 2]
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOX = (110, 420, 370, 220)  # top, right, bottom, left of the drawn face
+
+
+def owner_frame(rng):
+    h, w = 480, 640
+    y, x = np.mgrid[:h, :w]
+    img = np.full((h, w, 3), 90, dtype=np.uint8)
+    img[((x - 320) / 90) ** 2 + ((y - 240) / 120) ** 2 <= 1] = (215, 170, 140)
+    for dx in (-35, 35):
+        img[(x - 320 - dx) ** 2 + (y - 210) ** 2 <= 100] = (40, 40, 40)
+    img[(np.abs(x - 320) < 35) & (np.abs(y - 290) < 6)] = (150, 60, 60)
+    return np.clip(img + rng.normal(0, 3, img.shape), 0, 255).astype(np.uint8)
+
+
+def stranger_frame(rng):
+    return (rng.random((480, 640, 3)) * 255).astype(np.uint8)
+
+
+def build_models(rng):
+    # Owner face encoding, voiceprint and phrase templates from synthetic takes
+    from benchmarks.bench_e2e import _voice
+    from face_auth.recognize_face import encode_faces
+    from voice_auth import features, phrase_match
+    from voice_auth.gmm import DiagonalGMM
+
+    encoding = encode_faces([owner_frame(rng)], [BOX])[0]
+    phrase = [180, 220, 160, 200]
+    vectors = np.vstack([features.segment_pooled(features.mfcc(_voice(pitches, 4, rng)))
+                         for pitches in ([220, 180, 200, 160], [160, 200, 220, 180], phrase, phrase)])
+    gmm = DiagonalGMM.fit(vectors, 3)
+    templates = [phrase_match.features_from_samples(_voice(phrase, 2, rng)) for _ in range(3)]
+    return encoding, gmm, (templates, phrase_match.calibrate_threshold(templates))
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def run_level(service_args, models, inputs, terminals, seconds, fps, miss):
+    from utils import verify_service
+    service = verify_service.VerificationService(*models, max_sessions=max(terminals, 1), **service_args)
+    owner, strangers, utterances = inputs
+    latencies, completed, busy = [], [0] * terminals, [0]
+    stop_at = time.perf_counter() + seconds
+    lock = threading.Lock()
+
+    def terminal(n):
+        k = 0
+        while time.perf_counter() < stop_at:
+            try:
+                session = service.open_session(subject=f"terminal {n}")
+            except verify_service.ServiceBusy:
+                with lock:
+                    busy[0] += 1
+                time.sleep(0.01)
+                continue
+            # Face: frames at camera pace, without waiting for results
+            sent = 0
+            while session.face is None and time.perf_counter() < stop_at:
+                frame = strangers[(k + sent) % len(strangers)] if sent < miss else owner
+                session.submit_frame(frame, BOX)
+                sent += 1
+                time.sleep(1.0 / fps)
+            # Voice: one utterance at a time, each waits for its result
+            attempt = 0
+            while session.face and session.voice is None and time.perf_counter() < stop_at:
+                try:
+                    session.submit_utterance(utterances[(k + attempt) % len(utterances)]).result()
+                    attempt += 1
+                except verify_service.ServiceBusy:
+                    with lock:
+                        busy[0] += 1
+                    time.sleep(0.01)
+            k += 1
+            decision = service.close_session(session.id)
+            if decision["decided"]:
+                with lock:
+                    latencies.append(decision["timings"]["total"])
+                    completed[n] += 1
+
+    threads = [threading.Thread(target=terminal, args=(n,)) for n in range(terminals)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stats = service.stats()
+    service.stop()
+    batch = lambda s: s["items"] / s["batches"] if s["batches"] else 0.0
+    return {"sessions_s": len(latencies) / elapsed, "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95), "p99": percentile(latencies, 99),
+            "fair": (min(completed), max(completed)), "face_batch": batch(stats["face"]),
+            "voice_batch": batch(stats["voice"]), "dropped": stats["face"]["dropped"], "busy": busy[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--terminals", default="1,4,8,16,32", help="Comma-separated concurrent terminal counts")
+    parser.add_argument("--seconds", type=float, default=8.0, help="Run time per level and mode")
+    parser.add_argument("--fps", type=float, default=10.0, help="Frames per second each terminal sends")
+    parser.add_argument("--miss", type=int, default=2, help="Non-matching frames at the start of each session")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks.bench_e2e import _voice
+    from utils import verify_service
+    from voice_auth import features
+
+    rng = np.random.default_rng(0)
+    models = build_models(rng)
+    phrase = [180, 220, 160, 200]
+    inputs = (owner_frame(rng), [stranger_frame(rng) for _ in range(4)],
+              [_voice(phrase, 2, rng) for _ in range(4)])
+
+    # Stage cost alone: 16 utterances as one batch versus one at a time
+    utterances = [_voice(phrase, 2, rng) for _ in range(16)]
+    session_models = {"saved_encoding": models[0], "gmm_model": models[1], "phrase_templates": models[2]}
+    probe = verify_service.VerificationService(**session_models, max_sessions=16)
+    sessions = [probe.open_session() for _ in range(16)]
+    features.extract_batch(utterances[:1])
+    t0 = time.perf_counter()
+    verify_service.process_voices(list(zip(sessions, utterances)))
+    batched_ms = (time.perf_counter() - t0) * 1000 / 16
+    t0 = time.perf_counter()
+    for item in zip(sessions, utterances):
+        verify_service.process_voices([item])
+    single_ms = (time.perf_counter() - t0) * 1000 / 16
+    probe.stop()
+    print(f"Voice stage per utterance: {batched_ms:.1f} ms in a batch of 16, {single_ms:.1f} ms one at a time")
+    print(f"Face batch size on this build: {verify_service.face_batch_size()}\n")
+
+    # "batched" uses the service defaults (on CPU dlib builds faces go one per batch);
+    # "face x8" forces CUDA-sized face batches to show what they cost on this build
+    modes = {"batched": {},
+             "face x8": {"face_batch": verify_service.CUDA_FACE_BATCH},
+             "one at a time": {"face_batch": 1, "voice_batch": 1, "max_wait": 0.0}}
+    print(f"{args.fps:.0f} fps per terminal, {args.miss} non-matching frame(s) per session, "
+          f"{args.seconds:.0f}s per row\n")
+    print(f"{'terminals':>9}  {'mode':<14}{'sess/s':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}"
+          f"{'fair min-max':>14}{'face b':>8}{'voice b':>8}{'dropped':>9}{'busy':>6}")
+    for terminals in (int(n) for n in args.terminals.split(",")):
+        for mode, service_args in modes.items():
+            r = run_level(service_args, models, inputs, terminals, args.seconds, args.fps, args.miss)
+            fair = f"{r['fair'][0]}-{r['fair'][1]}"
+            print(f"{terminals:>9}  {mode:<14}{r['sessions_s']:>8.2f}{r['p50']:>8.2f}{r['p95']:>8.2f}"
+                  f"{r['p99']:>8.2f}{fair:>14}{r['face_batch']:>8.1f}{r['voice_batch']:>8.1f}"
+                  f"{r['dropped']:>9}{r['busy']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Speaker identification latency: one GMM score per enrolled user versus the
+# batched speaker bank (exact and pruned), at growing bank sizes.
+# Usage: python -m benchmarks.bench_speaker_bank [--sizes 10,1000,10000] [--queries 50] [--frames 1]
+import argparse
+import tempfile
+import time
+import numpy as np
+from voice_auth.gmm import DiagonalGMM
+from voice_auth.speaker_bank import SpeakerBank
+
+N_COMPONENTS = 3
+N_FEATURES = 13
+
+
+def synthetic_bank(directory, size, rng):
+    # Mean-MFCC-like voiceprints: speakers spread out, components close together
+    speakers = []
+    for i in range(size):
+        centre = rng.normal(0.0, 20.0, N_FEATURES)
+        means = centre + rng.normal(0.0, 3.0, (N_COMPONENTS, N_FEATURES))
+        precisions = 1.0 / rng.uniform(4.0, 16.0, (N_COMPONENTS, N_FEATURES))
+        speakers.append((f"speaker{i}", DiagonalGMM(rng.dirichlet(np.ones(N_COMPONENTS)), means, precisions)))
+    bank = SpeakerBank(directory)
+    bank.add_many(speakers)
+    return bank, [model for _, model in speakers]
+
+
+def time_queries(fn, queries):
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,1000,10000")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=1, help="1 = mean-MFCC vector, as verification uses")
+    parser.add_argument("--prune", type=int, default=64)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'speakers':>9} {'mode':>12} {'p50 ms':>9} {'p95 ms':>9} {'top-1 agrees':>13}")
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            bank, models = synthetic_bank(tmp, size, rng)
+            picks = rng.choice(size, args.queries)
+            queries = [models[p].means[np.argmax(models[p].weights)] + rng.normal(0.0, 2.0, (args.frames, N_FEATURES))
+                       for p in picks]
+
+            def per_user(q):
+                return int(np.argmax([m.score(q) for m in models]))
+
+            reference = [per_user(q) for q in queries]
+            p50, p95 = time_queries(per_user, queries)
+            print(f"{size:>9} {'per-user':>12} {p50:>9.3f} {p95:>9.3f} {'-':>13}")
+
+            # The batched scores must be the per-user scores, not just rank the same
+            q = queries[0]
+            assert np.allclose(bank.score_all(q), [m.score(q) for m in models], rtol=1e-9, atol=1e-9)
+
+            for mode, prune in (("batched", None), (f"pruned-{args.prune}", args.prune)):
+                p50, p95 = time_queries(lambda q: bank.search(q, 1, prune=prune), queries)
+                top1 = [int(bank.search(q, 1, prune=prune)[0][0]) for q in queries]
+                agree = np.mean(np.array(top1) == np.array(reference))
+                print(f"{size:>9} {mode:>12} {p50:>9.3f} {p95:>9.3f} {agree:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Throughput and peak RSS: legacy whole-file Fernet versus the chunked AES-GCM container.
+# Each run happens in a fresh subprocess so ru_maxrss only reflects that run.
+# Usage: python -m benchmarks.bench_stream_crypto [--size-mb 256]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RUN_SCRIPT = """
+import json, os, resource, sys, time
+from utils import encryption
+from utils import stream_crypto
+mode, src, dst = sys.argv[1:4]
+key = encryption.generate_key() if not os.path.exists(encryption.KEY_FILE) else encryption.load_key()
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+if mode == "fernet":
+    fernet = encryption.fernet_lib.Fernet(key)
+    with open(src, "rb") as f:
+        data = fernet.encrypt(f.read())
+    with open(dst, "wb") as f:
+        f.write(data)
+else:
+    stream_crypto.encrypt_path(src, dst, key)
+elapsed = time.perf_counter() - t0
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": elapsed, "peak_kb": peak, "baseline_kb": baseline, "out_bytes": os.path.getsize(dst)}))
+"""
+
+
+def run(mode, src, dst, cwd):
+    python_path = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+    proc = subprocess.run([sys.executable, "-c", RUN_SCRIPT, mode, src, dst], cwd=cwd, check=True,
+                          capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=python_path))
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "plain.bin")
+        with open(src, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        size = os.path.getsize(src)
+        print(f"{'format':>8} {'MB/s':>8} {'peak RSS MB':>12} {'over baseline MB':>17} {'output/input':>13}")
+        for mode in ("fernet", "chunked"):
+            dst = os.path.join(tmp, f"{mode}.enc")
+            r = run(mode, src, dst, tmp)
+            os.remove(dst)
+            mb_s = size / r["seconds"] / 1e6
+            print(f"{mode:>8} {mb_s:>8.1f} {r['peak_kb'] / 1024:>12.1f} "
+                  f"{(r['peak_kb'] - r['baseline_kb']) / 1024:>17.1f} {r['out_bytes'] / size:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Cost of the tracing layer per span: off (the default), JSON lines and
+# Prometheus export. Tracing is configured at import, so each mode runs in its
+# own interpreter.
+# Usage: python -m benchmarks.bench_trace [--calls 200000]
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import sys, time
+from utils import trace
+
+@trace.traced("bench.fn")
+def work(x):
+    return x + 1
+
+def plain(x):
+    return x + 1
+
+calls = int(sys.argv[1])
+results = []
+for label, fn in (("baseline", None), ("span", None), ("traced", work)):
+    best = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        if label == "baseline":
+            for i in range(calls):
+                plain(i)
+        elif label == "span":
+            for i in range(calls):
+                with trace.span("bench.span"):
+                    plain(i)
+        else:
+            for i in range(calls):
+                fn(i)
+        best = min(best, time.perf_counter() - t0)
+    results.append(best / calls * 1e9)
+trace.flush()
+print(" ".join(f"{ns:.0f}" for ns in results))
+"""
+
+
+def run(calls, trace_file):
+    python_path = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+    env = dict(os.environ, PYTHONPATH=python_path, SECUREAUTH_TRACE=trace_file)
+    out = subprocess.run([sys.executable, "-c", SCRIPT, str(calls)], env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return [float(v) for v in out.split()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = [("off", ""), ("jsonl", os.path.join(tmp, "trace.jsonl")), ("prometheus", os.path.join(tmp, "trace.prom"))]
+        print(f"{'mode':<12}{'plain call':>12}{'+ span':>12}{'+ @traced':>12}   (ns per call, best of 3)")
+        for label, path in modes:
+            baseline, span, traced = run(args.calls, path)
+            print(f"{label:<12}{baseline:>12.0f}{span - baseline:>12.0f}{traced - baseline:>12.0f}")
+            if path:
+                print(f"{'':<12}output {os.path.getsize(path) / 1e6:.1f} MB for {2 * 3 * args.calls} spans")
+
+
+if __name__ == "__main__":
+    main()
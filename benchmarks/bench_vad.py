@@ -0,0 +1,180 @@
+# Recording latency saved per verification attempt by the endpointer
+# (voice_auth/vad.py): each WAV is replayed through the same chunked capture as
+# voice_verify.record_to_memory, and the time the microphone stays open is
+# compared with the fixed RECORD_SECONDS window. Also reports how much audio
+# reaches the MFCC front end, leading/trailing silence trimmed, and the
+# endpointer's CPU cost per second of audio.
+#
+# --corpus DIR takes every WAV below DIR (e.g. the voice_verify/ recordings of a
+# bench_e2e corpus); each file is one attempt as the microphone heard it, from
+# the "speak now" prompt on. Without one, synthetic takes are generated: the
+# bench_e2e phrase voice between random stretches of room noise, at several
+# noise levels, some with a pause between words; there the detected span is
+# also checked against where the speech really is.
+#
+# A regression check always runs as well: 30 s of room noise with a 100 ms burst
+# (a click, a knock) every 700 ms and a 5 s wait. The bursts are too short to be
+# speech, so the recording has to end at the wait cap with every sample emitted
+# exactly once, in order; exits 1 otherwise.
+#
+# Usage: python -m benchmarks.bench_vad [--corpus DIR] [--takes 40]
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthesize(takes, seconds, rate, seed=0):
+    # (name, samples, (speech start, speech end) in seconds) per take
+    from benchmarks.bench_e2e import _voice
+    rng = np.random.default_rng(seed)
+    phrase = [180, 220, 160, 200]
+    corpus = []
+    for i in range(takes):
+        lead = rng.uniform(0.3, 1.5)
+        length = rng.uniform(1.2, 2.5)
+        speech = _voice(phrase, length, rng).astype(np.float64)
+        if i % 3 == 2:
+            # A 300 ms pause between the second and third word
+            half = len(speech) // 2
+            speech = np.concatenate([speech[:half], np.zeros(int(0.3 * rate)), speech[half:]])
+        noise_db = rng.uniform(-60, -40)  # Room noise, dBFS
+        total = int(seconds * rate)
+        start = int(lead * rate)
+        take = rng.normal(size=total) * 32768 * 10 ** (noise_db / 20)
+        end = min(total, start + len(speech))
+        take[start:end] += speech[:end - start]
+        samples = np.clip(np.rint(take), -32768, 32767).astype(np.int16)
+        corpus.append((f"synthetic {i:02d} ({noise_db:.0f} dBFS noise)", samples, (start / rate, end / rate)))
+    return corpus
+
+
+def load_corpus(directory, rate):
+    from voice_auth import features
+    corpus = []
+    for root, _, names in sorted(os.walk(directory)):
+        for name in sorted(names):
+            if name.lower().endswith(".wav"):
+                path = os.path.join(root, name)
+                y = features.load_wav(path, rate)
+                samples = np.clip(np.rint(y * 32768.0), -32768, 32767).astype(np.int16)
+                corpus.append((os.path.relpath(path, directory), samples, None))
+    return corpus
+
+
+def periodic_bursts(rate, seconds=30.0, every=0.7, burst=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    take = rng.normal(size=int(seconds * rate)) * 32768 * 10 ** (-50 / 20)
+    for start in np.arange(0.5, seconds, every):
+        a = int(start * rate)
+        take[a:a + int(burst * rate)] += rng.normal(size=len(take[a:a + int(burst * rate)])) * 32768 * 10 ** (-12 / 20)
+    return np.clip(np.rint(take), -32768, 32767).astype(np.int16)
+
+
+def check_periodic_bursts(vad, rate, chunk, wait=5.0):
+    # Returns a list of problems (empty when the endpointer behaves)
+    samples = periodic_bursts(rate)
+    kept = []
+    endpointer = vad.record(ArrayMicrophone(samples), rate, chunk, wait, kept.append)
+    kept = np.concatenate(kept) if kept else np.zeros(0, dtype=np.int16)
+    listened = endpointer.frames_seen * endpointer.frame / rate
+    problems = []
+    if listened > wait + chunk / rate:
+        problems.append(f"listened {listened:.2f}s with a {wait:.0f}s wait")
+    if endpointer.stats()["onset"] is not None:
+        problems.append(f"a burst was taken for speech at {endpointer.stats()['onset']:.2f}s")
+    if len(kept) != endpointer.frames_seen * endpointer.frame or not np.array_equal(kept, samples[:len(kept)]):
+        problems.append(f"emitted {len(kept) / rate:.2f}s of audio, not the {listened:.2f}s listened, in order")
+    return listened, problems
+
+
+class ArrayMicrophone:
+    # Reads a take chunk by chunk, silence after its end (like ReplayMicrophone)
+    def __init__(self, samples):
+        self.samples = samples
+        self.position = 0
+
+    def read(self, n):
+        chunk = self.samples[self.position:self.position + n]
+        self.position += n
+        if len(chunk) < n:
+            chunk = np.concatenate([chunk, np.zeros(n - len(chunk), dtype=np.int16)])
+        return chunk
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="Directory of WAV recordings, one per attempt")
+    parser.add_argument("--takes", type=int, default=40, help="Synthetic takes when no corpus is given")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from voice_auth import vad
+    from voice_auth.voice_verify import CHUNK, RATE, RECORD_SECONDS
+
+    window = int(RATE / CHUNK * RECORD_SECONDS) * CHUNK / RATE  # What the fixed capture records
+    corpus = load_corpus(args.corpus, RATE) if args.corpus else synthesize(args.takes, RECORD_SECONDS, RATE)
+    if not corpus:
+        print(f"❌ No WAV files under {args.corpus}")
+        sys.exit(1)
+
+    rows = []
+    cpu = audio = 0.0
+    for name, samples, truth in corpus:
+        kept = []
+        t0 = time.perf_counter()
+        endpointer = vad.record(ArrayMicrophone(samples), RATE, CHUNK, RECORD_SECONDS, kept.append)
+        cpu += time.perf_counter() - t0
+        stats = endpointer.stats()
+        # The microphone is read in whole chunks, so it stays open until the chunk holding the end
+        listened = -(-endpointer.frames_seen * endpointer.frame // CHUNK) * CHUNK / RATE
+        audio += listened
+        kept_seconds = sum(len(k) for k in kept) / RATE
+        row = {"name": name, "listened": listened, "kept": kept_seconds, "onset": stats["onset"]}
+        if truth is not None:
+            # Detected span: onset minus pre-roll, to the end of the kept tail
+            start = max(0.0, stats["onset"] - vad.PRE_ROLL_MS / 1000) if stats["onset"] is not None else 0.0
+            row["covered"] = stats["onset"] is not None and start <= truth[0] + 0.05 and \
+                start + kept_seconds >= truth[1] - 0.05
+            row["onset_error"] = None if stats["onset"] is None else stats["onset"] - truth[0]
+        rows.append(row)
+
+    print(f"{len(rows)} takes, fixed window {window:.2f}s\n")
+    print(f"{'take':<36}{'listened':>9}{'saved':>7}{'to MFCC':>9}{'onset':>7}")
+    for row in rows:
+        onset = "-" if row["onset"] is None else f"{row['onset']:.2f}"
+        flag = "" if row.get("covered", True) else "  ⚠️ speech cut"
+        print(f"{row['name'][:35]:<36}{row['listened']:>9.2f}{window - row['listened']:>7.2f}"
+              f"{row['kept']:>9.2f}{onset:>7}{flag}")
+
+    saved = [window - row["listened"] for row in rows]
+    kept = [row["kept"] for row in rows]
+    no_speech = sum(1 for row in rows if row["onset"] is None)
+    print(f"\nRecording latency saved per attempt: mean {statistics.mean(saved):.2f}s, "
+          f"median {statistics.median(saved):.2f}s, min {min(saved):.2f}s, max {max(saved):.2f}s")
+    print(f"Audio into the MFCC front end: mean {statistics.mean(kept):.2f}s per attempt "
+          f"(fixed window: {window:.2f}s)")
+    print(f"No speech detected (whole window kept): {no_speech}/{len(rows)}")
+    print(f"Endpointer CPU: {cpu / audio * 1000:.2f} ms per second of audio")
+    if any("covered" in row for row in rows):
+        errors = [abs(row["onset_error"]) for row in rows if row.get("onset_error") is not None]
+        cut = sum(1 for row in rows if not row.get("covered", True))
+        print(f"Against the synthetic ground truth: onset error median {statistics.median(errors) * 1000:.0f} ms, "
+              f"{cut} take(s) with speech cut")
+
+    listened, problems = check_periodic_bursts(vad, RATE, CHUNK)
+    for problem in problems:
+        print(f"❌ Periodic 100 ms bursts: {problem}")
+    if not problems:
+        print(f"✅ Periodic 100 ms bursts every 700 ms: recording ended at the wait cap ({listened:.2f}s)")
+    if problems or any(not row.get("covered", True) for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Start-up regression gate for main.py: parses `python -X importtime` output
+# for everything imported before the first prompt and fails (exit 1) when the
+# import budget is exceeded or a heavy package is imported eagerly.
+# Usage: python -m benchmarks.startup_budget [--budget-ms 300] [--runs 3]
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that must only load once authentication actually needs them
+HEAVY_MODULES = ["cv2", "face_recognition", "dlib", "librosa", "sklearn", "scipy", "numba",
+                 "pyaudio", "sounddevice", "speech_recognition", "pyttsx3", "cryptography", "requests"]
+
+
+def parse_importtime(stderr):
+    # Lines look like "import time:      1234 |      5678 |   package.name";
+    # nesting is shown by indenting the name, so top-level imports have none.
+    modules = {}
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_field, name_field = line.split("|", 2)
+        cumulative = int(cumulative_field.strip())
+        modules[name_field.strip()] = cumulative
+        if name_field[1:2] != " ":
+            total_us += cumulative
+    return modules, total_us
+
+
+def measure(env):
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing main.py failed:\n{proc.stderr[-2000:]}")
+    modules, total_us = parse_importtime(proc.stderr)
+    return wall, total_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="Budget for imports before the first prompt")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    env = dict(os.environ, SECUREAUTH_FAST_START="1",
+               SECUREAUTH_SOCKET=os.path.join(REPO_ROOT, ".startup-budget-no-daemon.sock"))
+
+    results = [measure(env) for _ in range(args.runs)]
+    best_wall, best_imports, modules = min(results, key=lambda r: r[1])
+
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:10]
+    print("Slowest imports (cumulative ms):")
+    for name, us in slowest:
+        print(f"  {us / 1000:8.1f}  {name}")
+    print(f"Import time before first prompt: {best_imports:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"Interpreter start to first prompt: {best_wall * 1000:.1f} ms")
+
+    eager = sorted({name.split(".")[0] for name in modules} & set(HEAVY_MODULES))
+    failed = False
+    if eager:
+        print(f"❌ Heavy packages imported at start-up: {', '.join(eager)}")
+        failed = True
+    if best_imports > args.budget_ms:
+        print("❌ Start-up import budget exceeded.")
+        failed = True
+    if not failed:
+        print("✅ Start-up within budget.")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from face_auth.gallery import FaceGallery, GALLERY_DIR
+from utils.lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+face_recognition = lazy_import("face_recognition")
+np = lazy_import("numpy")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm"}
+MANIFEST_FILENAME = "enrolled_sources.txt"  # Sources already processed, for resuming
+
+BATCH_SIZE = 16  # Images per worker task, so IPC and task overhead are paid per batch
+VIDEO_STRIDE = 15  # Every Nth video frame is considered
+MAX_VIDEO_FRAMES = 40  # Sampled frames per video at most
+DETECT_MAX_SIDE = 800  # Detection runs on a copy downscaled to this; encoding uses full resolution
+MIN_FACE_PX = 80  # Smaller faces (in the original image) give unreliable encodings
+MIN_SHARPNESS = 60.0  # Variance of the Laplacian over the face crop; lower is blurry
+MAX_SECOND_FACE = 0.5  # Skip frames where another face is at least this fraction of the main one's size
+MAX_PER_IDENTITY = 5
+MIN_DIVERSITY = 0.15  # A new encoding closer than this to one already kept adds nothing
+PROGRESS_INTERVAL = 2.0
+
+
+# === Sources ===
+# <root>/<identity>/* (images or videos), or files directly in <root> named after
+# the identity ("alice.jpg", "alice_2.jpg" -> "alice"; only a numeric suffix is dropped).
+def iter_sources(root):
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if entry.is_dir():
+            for dirpath, _, filenames in os.walk(entry.path):
+                for name in sorted(filenames):
+                    if _kind(name):
+                        yield entry.name, os.path.join(dirpath, name)
+        elif _kind(entry.name):
+            yield re.sub(r"_\d+$", "", os.path.splitext(entry.name)[0]), entry.path
+
+
+def _kind(name):
+    ext = os.path.splitext(name)[1].lower()
+    return "image" if ext in IMAGE_EXTENSIONS else "video" if ext in VIDEO_EXTENSIONS else None
+
+
+def _source_key(path):
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}\t{st.st_size}\t{int(st.st_mtime)}"
+
+
+def iter_tasks(root, done):
+    # Images are grouped into batches per identity; each video is its own task
+    batch_identity, batch = None, []
+    for identity, path in iter_sources(root):
+        if _source_key(path) in done:
+            continue
+        if _kind(path) == "video":
+            yield identity, [path]
+            continue
+        if batch and (identity != batch_identity or len(batch) >= BATCH_SIZE):
+            yield batch_identity, batch
+            batch = []
+        batch_identity = identity
+        batch.append(path)
+    if batch:
+        yield batch_identity, batch
+
+
+# === Worker Side ===
+def _frames(path):
+    if _kind(path) == "image":
+        frame = cv2.imread(path)
+        if frame is not None:
+            yield frame
+        return
+    cap = cv2.VideoCapture(path)
+    try:
+        index = sampled = 0
+        while sampled < MAX_VIDEO_FRAMES:
+            ok = cap.grab()
+            if not ok:
+                break
+            if index % VIDEO_STRIDE == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    sampled += 1
+                    yield frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def _best_face(frame):
+    # (encoding, quality) for the one clear face in the frame, or None
+    scale = min(1.0, DETECT_MAX_SIDE / max(frame.shape[:2]))
+    small = cv2.resize(frame, None, fx=scale, fy=scale) if scale < 1.0 else frame
+    locations = face_recognition.face_locations(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+    if not locations:
+        return None
+
+    boxes = sorted(((int(t / scale), int(r / scale), int(b / scale), int(l / scale)) for t, r, b, l in locations),
+                   key=lambda box: (box[2] - box[0]) * (box[1] - box[3]), reverse=True)
+    top, right, bottom, left = boxes[0]
+    size = min(bottom - top, right - left)
+    if size < MIN_FACE_PX:
+        return None
+    if len(boxes) > 1 and min(boxes[1][2] - boxes[1][0], boxes[1][1] - boxes[1][3]) >= MAX_SECOND_FACE * size:
+        return None  # Group photo: no way to tell which face the identity refers to
+
+    crop = cv2.cvtColor(frame[max(top, 0):bottom, max(left, 0):right], cv2.COLOR_BGR2GRAY)
+    sharpness = float(cv2.Laplacian(crop, cv2.CV_64F).var())
+    if sharpness < MIN_SHARPNESS:
+        return None
+
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    encoding = face_recognition.face_encodings(rgb, [boxes[0]])[0]
+    return encoding.astype(np.float32), sharpness * size
+
+
+def process_task(identity, paths):
+    # Runs in a worker process: decode, detect, filter and encode every frame of the batch.
+    # Returns (identity, paths, [(encoding, quality)], frames seen).
+    results = []
+    frames = 0
+    for path in paths:
+        try:
+            for frame in _frames(path):
+                frames += 1
+                face = _best_face(frame)
+                if face is not None:
+                    results.append(face)
+        except Exception as e:
+            print(f"⚠️ {path}: {e}")
+    return identity, paths, results, frames
+
+
+# === Bulk Enrollment ===
+class BulkEnroller:
+    def __init__(self, gallery_dir=GALLERY_DIR, workers=None, max_per_identity=MAX_PER_IDENTITY):
+        self.gallery = FaceGallery(gallery_dir)
+        self.manifest_path = os.path.join(gallery_dir, MANIFEST_FILENAME)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_per_identity = max_per_identity
+        self.stats = {"sources": 0, "frames": 0, "faces": 0, "enrolled": 0, "skipped_sources": 0}
+        self.kept = {}
+        for identity, row in zip(self.gallery.ids, self.gallery.matrix):
+            self.kept.setdefault(identity, []).append(np.asarray(row))
+
+    def _done_sources(self):
+        if not os.path.exists(self.manifest_path):
+            return set()
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f}
+
+    def _select(self, identity, faces):
+        # Best quality first; keep an encoding only if it adds a view not already stored
+        kept = self.kept.setdefault(identity, [])
+        selected = []
+        for encoding, _ in sorted(faces, key=lambda face: face[1], reverse=True):
+            if len(kept) >= self.max_per_identity:
+                break
+            if all(np.linalg.norm(encoding - other) >= MIN_DIVERSITY for other in kept):
+                kept.append(encoding)
+                selected.append(encoding)
+        return selected
+
+    def _record(self, results):
+        # results: (identity, paths, faces, frames) per finished task. One append
+        # to the gallery for all of them, without reloading it (run() reloads
+        # at the end), so onboarding N identities stays linear in N.
+        entries, sources = [], []
+        for identity, paths, faces, frames in results:
+            self.stats["sources"] += len(paths)
+            self.stats["frames"] += frames
+            self.stats["faces"] += len(faces)
+            selected = self._select(identity, faces)
+            if selected:
+                entries.append((identity, np.stack(selected)))
+                self.stats["enrolled"] += len(selected)
+            sources.extend(paths)
+        # Gallery first, manifest second: a crash in between re-processes the
+        # sources, and the diversity check drops the duplicates
+        self.gallery.add_many(entries, reload=False)
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write("".join(_source_key(p) + "\n" for p in sources))
+
+    def _report(self, elapsed, final=False):
+        s = self.stats
+        print(f"{'✅' if final else '⏳'} {s['sources']} files, {s['frames']} frames "
+              f"({s['frames'] / max(elapsed, 1e-9):.1f} images/s), {s['faces']} usable faces, "
+              f"{s['enrolled']} encodings enrolled")
+
+    def run(self, root):
+        done = self._done_sources()
+        self.stats["skipped_sources"] = len(done)
+        if done:
+            print(f"↩️ Resuming: {len(done)} source(s) already enrolled are skipped.")
+
+        start = last_report = time.perf_counter()
+        in_flight = set()
+        # Bounded submission: directory scanning never runs far ahead of the workers
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            def drain(return_when):
+                nonlocal in_flight, last_report
+                finished, in_flight = wait(in_flight, return_when=return_when)
+                self._record([future.result() for future in finished])
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    self._report(now - start)
+
+            for identity, paths in iter_tasks(root, done):
+                if len(in_flight) >= self.workers * 2:
+                    drain(FIRST_COMPLETED)
+                in_flight.add(pool.submit(process_task, identity, paths))
+            while in_flight:
+                drain(FIRST_COMPLETED)
+
+        self.gallery.reload()
+        self.stats["seconds"] = time.perf_counter() - start
+        self._report(self.stats["seconds"], final=True)
+        return dict(self.stats)
+
+
+# python -m face_auth.bulk_enroll <directory> [--workers N] [--max-per-identity 5]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enroll identities from a directory of photos and videos.")
+    parser.add_argument("directory")
+    parser.add_argument("--gallery", default=GALLERY_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-per-identity", type=int, default=MAX_PER_IDENTITY)
+    args = parser.parse_args()
+
+    BulkEnroller(args.gallery, args.workers, args.max_per_identity).run(args.directory)
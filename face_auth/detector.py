@@ -0,0 +1,166 @@
+import os
+from utils import trace
+from utils.lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+face_recognition = lazy_import("face_recognition")
+
+# "hog": face_recognition's HOG detector on the full frame (the original behaviour).
+# "cascade": a cheap detector on a downscaled frame proposes candidates, HOG confirms
+# each one on a small crop, and encoding then uses the confirmed box at full resolution.
+DETECTOR = os.environ.get("SECUREAUTH_FACE_DETECTOR", "hog")
+# YuNet (cv2.FaceDetectorYN) is used as the first stage when this model is present,
+# otherwise OpenCV's bundled Haar cascade (OpenCV 4.x)
+YUNET_MODEL = os.environ.get("SECUREAUTH_YUNET_MODEL", "face_auth/models/face_detection_yunet_2023mar.onnx")
+HAAR_MODEL = "haarcascade_frontalface_default.xml"
+
+DEFAULT_DETECT_WIDTH = 320  # First-stage frame width until a face has been seen
+MIN_DETECT_WIDTH = 160
+TARGET_FACE_PX = 40  # Later frames are scaled so the last face found is about this wide for the first stage
+MAX_CANDIDATES = 3
+CROP_MARGIN = 0.4  # Candidate boxes grow by this fraction of their size on each side before confirming
+CONFIRM_FACE_PX = 120  # Crops are scaled so the face is about this wide for HOG (its window is 80 px)
+FULL_SCAN_AFTER = 3  # Frames in a row without a confirmed face before one full-frame HOG pass
+
+
+def _area(box):
+    top, right, bottom, left = box
+    return (bottom - top) * (right - left)
+
+
+# === First Stage ===
+# Candidate finders take an RGB frame and return (x, y, w, h) boxes in its pixels
+class HaarCandidates:
+    name = "haar"
+
+    def __init__(self):
+        self.cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, HAAR_MODEL))
+        if self.cascade.empty():
+            raise RuntimeError(f"Could not load {HAAR_MODEL}")
+
+    def __call__(self, rgb):
+        gray = cv2.equalizeHist(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY))
+        found = self.cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=(24, 24))
+        return [tuple(int(v) for v in box) for box in found]
+
+
+class YuNetCandidates:
+    name = "yunet"
+
+    def __init__(self, model=YUNET_MODEL):
+        self.detector = cv2.FaceDetectorYN.create(model, "", (DEFAULT_DETECT_WIDTH, DEFAULT_DETECT_WIDTH),
+                                                  score_threshold=0.6)
+
+    def __call__(self, rgb):
+        self.detector.setInputSize((rgb.shape[1], rgb.shape[0]))
+        _, faces = self.detector.detect(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        if faces is None:
+            return []
+        return [tuple(int(v) for v in face[:4]) for face in sorted(faces, key=lambda f: -f[14])]
+
+
+def first_stage(name=None):
+    # The requested candidate finder, or the best one this OpenCV build supports; None if neither
+    if name in (None, "yunet") and hasattr(cv2, "FaceDetectorYN") and os.path.exists(YUNET_MODEL):
+        return YuNetCandidates()
+    if name in (None, "haar") and hasattr(cv2, "CascadeClassifier"):
+        return HaarCandidates()
+    return None
+
+
+# === Detectors ===
+# locate(rgb_frame) returns (top, right, bottom, left) boxes in full-resolution
+# pixels, ready for face_recognition.face_encodings.
+class HogDetector:
+    name = "hog"
+
+    def __init__(self):
+        self.stats = {"frames": 0, "full_scans": 0}
+
+    def locate(self, rgb_frame):
+        self.stats["frames"] += 1
+        self.stats["full_scans"] += 1
+        return face_recognition.face_locations(rgb_frame)
+
+
+# Boxes come back largest first. Stateful per capture session: the detection
+# resolution follows the size of the face found in earlier frames (a face
+# filling the frame is found on a thumbnail), and a miss resets it.
+class CascadeDetector:
+    name = "cascade"
+
+    def __init__(self, candidates=None):
+        self.candidates = candidates or first_stage()
+        if self.candidates is None:
+            raise RuntimeError("No first-stage face detector available in this OpenCV build")
+        self.face_px = None
+        self.misses = 0
+        self.stats = {"frames": 0, "candidates": 0, "confirmed": 0, "full_scans": 0}
+
+    def _scale(self, width):
+        scale = TARGET_FACE_PX / self.face_px if self.face_px else DEFAULT_DETECT_WIDTH / width
+        return min(1.0, max(scale, MIN_DETECT_WIDTH / width))
+
+    def _confirm(self, rgb_frame, x, y, w, h):
+        # HOG on the candidate crop only, scaled so the face is CONFIRM_FACE_PX wide
+        height, width = rgb_frame.shape[:2]
+        margin = CROP_MARGIN * max(w, h)
+        x0, y0 = max(int(x - margin), 0), max(int(y - margin), 0)
+        x1, y1 = min(int(x + w + margin), width), min(int(y + h + margin), height)
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        s = CONFIRM_FACE_PX / max(w, h)
+        crop = rgb_frame[y0:y1, x0:x1]
+        crop = cv2.resize(crop, None, fx=s, fy=s, interpolation=cv2.INTER_AREA if s < 1 else cv2.INTER_LINEAR)
+        found = face_recognition.face_locations(crop, number_of_times_to_upsample=0)
+        if not found:
+            return None
+        top, right, bottom, left = max(found, key=_area)
+        return (y0 + int(round(top / s)), x0 + int(round(right / s)),
+                y0 + int(round(bottom / s)), x0 + int(round(left / s)))
+
+    def locate(self, rgb_frame):
+        self.stats["frames"] += 1
+        scale = self._scale(rgb_frame.shape[1])
+        small = rgb_frame if scale >= 1.0 else cv2.resize(rgb_frame, None, fx=scale, fy=scale,
+                                                          interpolation=cv2.INTER_AREA)
+        with trace.span("face.detect.candidates"):
+            candidates = self.candidates(small)[:MAX_CANDIDATES]
+        self.stats["candidates"] += len(candidates)
+
+        with trace.span("face.detect.confirm"):
+            boxes = [self._confirm(rgb_frame, x / scale, y / scale, w / scale, h / scale)
+                     for x, y, w, h in candidates]
+        boxes = [box for box in boxes if box is not None]
+        self.stats["confirmed"] += len(boxes)
+
+        if boxes:
+            self.misses = 0
+        else:
+            self.misses += 1
+            self.face_px = None
+            if self.misses >= FULL_SCAN_AFTER:
+                # The cheap stage keeps missing: one full-frame pass, so a face it cannot see is still found
+                self.misses = 0
+                self.stats["full_scans"] += 1
+                with trace.span("face.detect.full_scan"):
+                    boxes = face_recognition.face_locations(rgb_frame)
+
+        boxes.sort(key=_area, reverse=True)
+        if boxes:
+            top, right, bottom, left = boxes[0]
+            self.face_px = max(bottom - top, right - left)
+        return boxes
+
+
+def make_detector(name=None):
+    # One detector per capture session (the cascade keeps per-session state)
+    name = name or DETECTOR
+    if name == "cascade":
+        candidates = first_stage()
+        if candidates is not None:
+            return CascadeDetector(candidates)
+        print("⚠️ No Haar or YuNet face detector in this OpenCV build; using full-frame HOG.")
+    elif name != "hog":
+        raise ValueError(f"Unknown face detector: {name}")
+    return HogDetector()
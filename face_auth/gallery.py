@@ -0,0 +1,295 @@
+import os
+from collections import Counter
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+GALLERY_DIR = "face_gallery"
+MATRIX_FILENAME = "encodings.f32"
+IDS_FILENAME = "ids.txt"
+INDEX_FILENAME = "ivf_index.npz"
+ENCODING_DIM = 128
+DEFAULT_TOLERANCE = 0.6  # Same default as face_recognition.compare_faces
+SEARCH_BLOCK_ROWS = 262144  # Rows scored per block, keeps temporaries bounded on huge galleries
+ASSIGN_BLOCK_ROWS = 16384  # Rows per block when assigning to IVF lists (rows x n_lists temporaries)
+
+
+# === Gallery Store ===
+# Encodings live in a raw float32 N x 128 file so it can be memory-mapped and
+# appended to without rewriting; row i belongs to line i of ids.txt.
+class FaceGallery:
+    def __init__(self, directory=GALLERY_DIR, mmap=True):
+        self.directory = directory
+        self.mmap = mmap
+        self.matrix_path = os.path.join(directory, MATRIX_FILENAME)
+        self.ids_path = os.path.join(directory, IDS_FILENAME)
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.index = None
+        self.reload()
+
+    def reload(self):
+        self.ids = []
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                self.ids = [line.rstrip("\n") for line in f]
+        # Rows owned by the largest identity: match() over-fetches by this much
+        self.max_rows_per_identity = max(Counter(self.ids).values(), default=1)
+
+        rows = 0
+        if os.path.exists(self.matrix_path):
+            rows = os.path.getsize(self.matrix_path) // (ENCODING_DIM * 4)
+        if rows != len(self.ids):
+            raise ValueError(f"Face gallery is corrupt: {rows} encodings but {len(self.ids)} ids")
+
+        if rows == 0:
+            self.matrix = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        elif self.mmap:
+            self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(rows, ENCODING_DIM))
+        else:
+            self.matrix = np.fromfile(self.matrix_path, dtype=np.float32).reshape(rows, ENCODING_DIM)
+        self._sq_norms = None
+
+        self.index = None
+        if os.path.exists(self.index_path):
+            index = IVFIndex.load(self.index_path)
+            # A stale index (gallery grew since it was built) is ignored rather than trusted
+            if index.size == rows:
+                self.index = index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def identities(self):
+        return sorted(set(self.ids))
+
+    def add(self, identity, encodings, reload=True):
+        return self.add_many([(identity, encodings)], reload=reload)
+
+    def add_many(self, entries, reload=True):
+        # entries: (identity, encodings) pairs, appended in one write to each file.
+        # reload=False skips re-reading ids.txt and re-mapping the matrix, for
+        # bulk loaders that append many times and reload once at the end.
+        rows, ids = [], []
+        for identity, encodings in entries:
+            if not identity or "\n" in identity:
+                raise ValueError("Identity must be a non-empty single-line string")
+            encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+            rows.append(encodings)
+            ids.append((identity + "\n") * len(encodings))
+        count = sum(len(r) for r in rows)
+        if count == 0:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Matrix first, ids second: a crash in between leaves extra rows that reload() reports
+        with open(self.matrix_path, "ab") as f:
+            f.write(np.ascontiguousarray(np.concatenate(rows)).tobytes())
+        with open(self.ids_path, "a", encoding="utf-8") as f:
+            f.write("".join(ids))
+
+        if reload:
+            self.reload()
+        return count
+
+    def sq_norms(self):
+        if self._sq_norms is None:
+            self._sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        return self._sq_norms
+
+    # === Exact Search ===
+    # One vectorized pass: ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2
+    def search(self, queries, k=1):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        n = len(self)
+        k = min(k, n)
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        best_idx = np.empty((len(queries), 0), dtype=np.int64)
+        best_d2 = np.empty((len(queries), 0), dtype=np.float32)
+
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            block = self.matrix[start:start + SEARCH_BLOCK_ROWS]
+            d2 = self.sq_norms()[start:start + len(block)][None, :] - 2.0 * (queries @ block.T)
+            d2 += q_norms[:, None]
+            kk = min(k, d2.shape[1])
+            part = np.argpartition(d2, kk - 1, axis=1)[:, :kk]
+            best_idx = np.concatenate([best_idx, part + start], axis=1)
+            best_d2 = np.concatenate([best_d2, np.take_along_axis(d2, part, axis=1)], axis=1)
+
+        order = np.argsort(best_d2, axis=1)[:, :k]
+        best_idx = np.take_along_axis(best_idx, order, axis=1)
+        best_d2 = np.take_along_axis(best_d2, order, axis=1)
+        return best_idx, np.sqrt(np.maximum(best_d2, 0.0))
+
+    def match(self, encoding, k=1, tolerance=DEFAULT_TOLERANCE, approximate=None, nprobe=8):
+        # Returns up to k (identity, distance) pairs within tolerance, one per identity
+        if approximate is None:
+            approximate = self.index is not None
+        if approximate and self.index is None:
+            raise ValueError("No approximate index built. Run build_index() first.")
+
+        # Identities can own several rows, so over-fetch before de-duplicating: with
+        # at most max_rows_per_identity rows each, k times that many rows always
+        # span k identities when the gallery has them
+        fetch = k * self.max_rows_per_identity
+        if approximate:
+            idx, dist = self.index.search(self.matrix, encoding, fetch, nprobe=nprobe)
+        else:
+            idx, dist = self.search(encoding, fetch)
+
+        results = []
+        seen = set()
+        for i, d in zip(idx[0], dist[0]):
+            if i < 0 or d > tolerance:
+                break
+            identity = self.ids[i]
+            if identity in seen:
+                continue
+            seen.add(identity)
+            results.append((identity, float(d)))
+            if len(results) == k:
+                break
+        return results
+
+    def build_index(self, n_lists=None, quantize=True, seed=0):
+        self.index = IVFIndex.build(self.matrix, n_lists=n_lists, quantize=quantize, seed=seed)
+        self.index.save(self.index_path)
+        return self.index
+
+
+# === Approximate Index (IVF + int8 residuals) ===
+# Rows are bucketed by a coarse k-means; a query scans only the nprobe closest
+# buckets. With quantize=True the scan uses int8 residual codes and the best
+# candidates are re-ranked against the exact float32 rows.
+class IVFIndex:
+    def __init__(self, centroids, list_offsets, row_ids, codes=None, scale=None):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.row_ids = row_ids
+        self.codes = codes
+        self.scale = scale
+
+    @property
+    def size(self):
+        return len(self.row_ids)
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, quantize=True, n_iter=10, seed=0):
+        n = len(matrix)
+        if n == 0:
+            raise ValueError("Cannot index an empty gallery")
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, n_lists * 64)
+        sample = np.asarray(matrix[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = _kmeans(sample, n_lists, n_iter, rng)
+
+        assign = _nearest_centroid(matrix, centroids)
+        row_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        counts = np.bincount(assign, minlength=n_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        codes = scale = None
+        if quantize:
+            codes = np.empty((n, matrix.shape[1]), dtype=np.int8)
+            max_abs = np.zeros(matrix.shape[1], dtype=np.float32)
+            for start in range(0, n, ASSIGN_BLOCK_ROWS):
+                block = np.asarray(matrix[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+                residual = block - centroids[assign[start:start + len(block)]]
+                max_abs = np.maximum(max_abs, np.abs(residual).max(axis=0))
+            scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+            for start in range(0, n, ASSIGN_BLOCK_ROWS):
+                rows = row_ids[start:start + ASSIGN_BLOCK_ROWS]
+                residual = matrix[rows] - centroids[assign[rows]]
+                codes[start:start + len(rows)] = np.clip(np.rint(residual / scale), -127, 127)
+
+        return cls(centroids, list_offsets, row_ids, codes, scale)
+
+    def search(self, matrix, queries, k=1, nprobe=8, rerank=4):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        nprobe = min(nprobe, len(self.centroids))
+        all_idx = np.full((len(queries), k), -1, dtype=np.int64)
+        all_dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+
+        c_d2 = _sq_distances(queries, self.centroids)
+        probes = np.argpartition(c_d2, nprobe - 1, axis=1)[:, :nprobe]
+
+        for qi, query in enumerate(queries):
+            positions = np.concatenate([
+                np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in probes[qi]
+            ])
+            if len(positions) == 0:
+                continue
+
+            if self.codes is not None:
+                # Approximate distance of each residual code to (query - its centroid)
+                list_of = np.repeat(probes[qi], np.diff(self.list_offsets)[probes[qi]])
+                approx = self.codes[positions].astype(np.float32) * self.scale
+                approx -= query - self.centroids[list_of]
+                approx_d2 = np.einsum("ij,ij->i", approx, approx)
+                keep = min(len(positions), k * rerank)
+                positions = positions[np.argpartition(approx_d2, keep - 1)[:keep]]
+
+            candidates = np.sort(self.row_ids[positions])
+            rows = np.asarray(matrix[candidates], dtype=np.float32)
+            diff = rows - query
+            d2 = np.einsum("ij,ij->i", diff, diff)
+            kk = min(k, len(candidates))
+            top = np.argsort(d2)[:kk]
+            all_idx[qi, :kk] = candidates[top]
+            all_dist[qi, :kk] = np.sqrt(d2[top])
+
+        return all_idx, all_dist
+
+    def save(self, path):
+        arrays = dict(centroids=self.centroids, list_offsets=self.list_offsets, row_ids=self.row_ids)
+        if self.codes is not None:
+            arrays.update(codes=self.codes, scale=self.scale)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["centroids"], data["list_offsets"], data["row_ids"],
+                data["codes"] if "codes" in data else None,
+                data["scale"] if "scale" in data else None,
+            )
+
+
+def _sq_distances(a, b):
+    d2 = np.einsum("ij,ij->i", a, a)[:, None] - 2.0 * (a @ b.T)
+    d2 += np.einsum("ij,ij->i", b, b)[None, :]
+    return d2
+
+
+def _nearest_centroid(matrix, centroids):
+    assign = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmin(_sq_distances(block, centroids), axis=1)
+    return assign
+
+
+def _kmeans(sample, n_clusters, n_iter, rng):
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _nearest_centroid(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_clusters)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)])[filled]
+        centroids[filled] = np.add.reduceat(sample[order], starts, axis=0) / counts[filled, None]
+        empty = counts == 0
+        # Re-seed empty clusters from random sample points
+        if empty.any():
+            centroids[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+    return centroids
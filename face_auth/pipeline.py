@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import deque
+import cv2
+import face_recognition
+import numpy as np
+from face_auth.detector import make_detector
+from utils import sources, trace
+
+RING_SIZE = 4  # Frames kept by the capture thread; older frames are dropped
+MAX_TRACK_AGE = 10  # Frames a tracked box may be reused before detection is forced
+MOTION_THRESHOLD = 12.0  # Mean absolute grey-level change inside the box that marks it stale
+FRAME_TIMEOUT = 2.0  # Seconds to wait for the capture thread before giving up
+
+
+# === Frame Ring Buffer ===
+# The capture thread pushes, the worker always takes the newest frame, so a
+# slow detection pass never makes the camera queue up stale frames.
+class FrameRing:
+    def __init__(self, size=RING_SIZE):
+        self.frames = deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.closed = False
+
+    def push(self, frame):
+        with self.cond:
+            self.seq += 1
+            self.frames.append((self.seq, frame))
+            self.cond.notify_all()
+
+    def latest(self, after_seq=0, timeout=FRAME_TIMEOUT):
+        with self.cond:
+            self.cond.wait_for(lambda: self.closed or (self.frames and self.frames[-1][0] > after_seq), timeout)
+            if not self.frames or self.frames[-1][0] <= after_seq:
+                return None, None
+            return self.frames[-1]
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class CaptureThread(threading.Thread):
+    def __init__(self, cap, ring):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.ring = ring
+        self.stop_event = threading.Event()
+        self.error = None
+        self.frames_read = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                self.error = "Failed to capture image from webcam"
+                break
+            self.frames_read += 1
+            self.ring.push(frame)
+        self.ring.close()
+
+    def stop(self):
+        self.stop_event.set()
+        self.join(timeout=FRAME_TIMEOUT)
+
+
+# === Face Box Tracker ===
+# Reuses the last detected box while the face stays put. The box goes stale
+# when it gets too old or the pixels inside it change noticeably.
+class FaceTracker:
+    def __init__(self, max_age=MAX_TRACK_AGE, motion_threshold=MOTION_THRESHOLD):
+        self.max_age = max_age
+        self.motion_threshold = motion_threshold
+        self.box = None
+        self.patch = None
+        self.age = 0
+
+    def _crop(self, gray, box):
+        top, right, bottom, left = box
+        return gray[max(top, 0):bottom, max(left, 0):right].astype(np.int16)
+
+    def current(self, gray):
+        if self.box is None or self.age >= self.max_age:
+            return None
+        patch = self._crop(gray, self.box)
+        if patch.shape != self.patch.shape or np.abs(patch - self.patch).mean() > self.motion_threshold:
+            return None
+        self.age += 1
+        return self.box
+
+    def update(self, gray, box):
+        self.box = box
+        self.patch = self._crop(gray, box)
+        self.age = 0
+
+    def reset(self):
+        self.box = None
+        self.patch = None
+
+
+@trace.traced("face.verify_pipelined")
+def verify_face_pipelined(saved_encoding, max_attempts=5, show_window=None, cancel_event=None):
+    if show_window is None:
+        show_window = sources.show_preview()
+    # The capture thread free-runs, so a replayed recording is paced like a camera
+    cap = sources.open_camera(realtime=True)
+    if not cap.isOpened():
+        raise Exception("Could not open webcam")
+
+    ring = FrameRing()
+    capture = CaptureThread(cap, ring)
+    tracker = FaceTracker()
+    detector = make_detector()
+    capture.start()
+
+    match_found = False
+    attempts = 0
+    detections = 0
+    last_seq = 0
+    start = time.perf_counter()
+
+    try:
+        while attempts < max_attempts:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            last_seq, frame = ring.latest(last_seq)
+            if frame is None:
+                raise Exception(capture.error or "Failed to capture image from webcam")
+
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            box = tracker.current(gray)
+            if box is None:
+                with trace.span("face.detect"):
+                    face_locations = detector.locate(rgb_frame)
+                detections += 1
+                if face_locations:
+                    box = face_locations[0]
+                    tracker.update(gray, box)
+                else:
+                    tracker.reset()
+
+            if box is not None:
+                with trace.span("face.encode"):
+                    live_encoding = face_recognition.face_encodings(rgb_frame, [box])[0]
+                result = face_recognition.compare_faces([saved_encoding], live_encoding)
+                if result[0]:
+                    match_found = True
+                    print("✅ Face match successful.")
+                    break
+                else:
+                    print("❌ Face did not match. Try again.")
+
+            attempts += 1
+            if show_window:
+                cv2.imshow("Face Authentication - Press 'q' to exit", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    print("❌ Authentication canceled.")
+                    break
+    finally:
+        capture.stop()
+        cap.release()
+        if show_window:
+            cv2.destroyAllWindows()
+
+    elapsed = time.perf_counter() - start
+    fps = capture.frames_read / elapsed if elapsed > 0 else 0.0
+    print(f"⏱ Face decision in {elapsed:.2f}s ({attempts + match_found} frames processed, "
+          f"{detections} detections, camera {fps:.1f} fps)")
+    return match_found
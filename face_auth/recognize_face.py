@@ -1,37 +1,87 @@
-import cv2
-import face_recognition
 import pickle
 import os
+from utils import model_format, sources, trace
+from utils.lazy import lazy_import
+from face_auth.detector import make_detector
+from face_auth.gallery import FaceGallery, DEFAULT_TOLERANCE
 
-ENCODINGS_FILE = "face_encodings.pkl"
+cv2 = lazy_import("cv2")
+face_recognition = lazy_import("face_recognition")
+np = lazy_import("numpy")
 
-def verify_face():
+ENCODINGS_FILE = "face_encoding.model"
+LEGACY_ENCODINGS_FILE = "face_encodings.pkl"  # Pickled numpy array; run python -m utils.migrate_models
+MODEL_KIND = "face-encoding"
+
+def saved_encoding_exists():
+    return os.path.exists(ENCODINGS_FILE) or os.path.exists(LEGACY_ENCODINGS_FILE)
+
+def save_encoding(encoding, path=ENCODINGS_FILE):
+    return model_format.save(path, MODEL_KIND, {"encoding": np.asarray(encoding, dtype=np.float64)})
+
+def load_saved_encoding():
+    if os.path.exists(ENCODINGS_FILE):
+        arrays, _ = model_format.load(ENCODINGS_FILE, kind=MODEL_KIND)
+        return arrays["encoding"]
+    print("⚠️ Loading legacy pickled face encoding. Run: python -m utils.migrate_models")
+    with open(LEGACY_ENCODINGS_FILE, "rb") as f:
+        return pickle.load(f)
+
+def encode_faces(images, boxes):
+    # One encoding per (RGB image, (top, right, bottom, left) box), as an N x 128 array.
+    # dlib takes the whole list as one batch through the network (one forward
+    # pass on CUDA builds); face_recognition builds without dlib's batch call
+    # are encoded one image at a time.
+    if not images:
+        return np.empty((0, 128))
+    api = getattr(face_recognition, "api", None)
+    if api is None or not hasattr(api, "face_encoder"):
+        return np.array([face_recognition.face_encodings(img, [box])[0] for img, box in zip(images, boxes)])
+    dlib = api.dlib
+    shapes = [dlib.full_object_detections([api.pose_predictor_5_point(img, api._css_to_rect(box))])
+              for img, box in zip(images, boxes)]
+    return np.array([list(faces[0]) for faces in api.face_encoder.compute_face_descriptor(list(images), shapes, 1)])
+
+@trace.traced("face.verify")
+def verify_face(pipelined=False, saved_encoding=None, cancel_event=None):
     print("\n[Face Auth] Please align your face with the camera...")
 
-    if not os.path.exists(ENCODINGS_FILE):
-        print("❌ No face encoding found. Please run setup.")
-        return False
+    # A warm caller (the auth daemon) passes the encoding it already holds in memory
+    if saved_encoding is None:
+        if not saved_encoding_exists():
+            print("❌ No face encoding found. Please run setup.")
+            return False
+        saved_encoding = load_saved_encoding()
 
-    with open(ENCODINGS_FILE, "rb") as f:
-        saved_encoding = pickle.load(f)
+    if pipelined:
+        from face_auth.pipeline import verify_face_pipelined
+        return verify_face_pipelined(saved_encoding, cancel_event=cancel_event)
 
-    cap = cv2.VideoCapture(0)
+    cap = sources.open_camera()
     if not cap.isOpened():
         raise Exception("Could not open webcam")
 
+    preview = sources.show_preview()
+    detector = make_detector()
     match_found = False
     attempts = 0
 
     while attempts < 5:
+        # Another factor already failed, so this result no longer matters
+        if cancel_event is not None and cancel_event.is_set():
+            break
+
         ret, frame = cap.read()
         if not ret:
             raise Exception("Failed to capture image from webcam")
 
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
+        with trace.span("face.detect"):
+            face_locations = detector.locate(rgb_frame)
 
         if face_locations:
-            live_encoding = face_recognition.face_encodings(rgb_frame, face_locations)[0]
+            with trace.span("face.encode"):
+                live_encoding = face_recognition.face_encodings(rgb_frame, face_locations[:1])[0]
             result = face_recognition.compare_faces([saved_encoding], live_encoding)
             if result[0]:
                 match_found = True
@@ -41,11 +91,63 @@ def verify_face():
                 print("❌ Face did not match. Try again.")
 
         attempts += 1
-        cv2.imshow("Face Authentication - Press 'q' to exit", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            print("❌ Authentication canceled.")
-            break
+        if preview:
+            cv2.imshow("Face Authentication - Press 'q' to exit", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                print("❌ Authentication canceled.")
+                break
 
     cap.release()
-    cv2.destroyAllWindows()
+    if preview:
+        cv2.destroyAllWindows()
     return match_found
+
+@trace.traced("face.identify")
+def identify_face(k=1, tolerance=DEFAULT_TOLERANCE):
+    # Returns the top-k (identity, distance) matches from the gallery, or [] if nobody matched
+    print("\n[Face ID] Please align your face with the camera...")
+
+    gallery = FaceGallery()
+    if len(gallery) == 0:
+        print("❌ Face gallery is empty. Please enroll identities first.")
+        return []
+
+    cap = sources.open_camera()
+    if not cap.isOpened():
+        raise Exception("Could not open webcam")
+
+    preview = sources.show_preview()
+    detector = make_detector()
+    matches = []
+    attempts = 0
+
+    while attempts < 5:
+        ret, frame = cap.read()
+        if not ret:
+            raise Exception("Failed to capture image from webcam")
+
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with trace.span("face.detect"):
+            face_locations = detector.locate(rgb_frame)
+
+        if face_locations:
+            with trace.span("face.encode"):
+                live_encoding = face_recognition.face_encodings(rgb_frame, face_locations[:1])[0]
+            matches = gallery.match(live_encoding, k=k, tolerance=tolerance)
+            if matches:
+                print(f"✅ Identified: {matches[0][0]} (distance {matches[0][1]:.3f})")
+                break
+            else:
+                print("❌ Face not found in gallery. Try again.")
+
+        attempts += 1
+        if preview:
+            cv2.imshow("Face Identification - Press 'q' to exit", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                print("❌ Identification canceled.")
+                break
+
+    cap.release()
+    if preview:
+        cv2.destroyAllWindows()
+    return matches
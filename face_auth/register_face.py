@@ -1,40 +1,58 @@
-import cv2
-import face_recognition
-import pickle
 import os
+from face_auth.detector import make_detector
+from face_auth.gallery import FaceGallery
+from face_auth.recognize_face import ENCODINGS_FILE, save_encoding
+from utils import sources, trace
+from utils.lazy import lazy_import
 
-ENCODINGS_FILE = "face_encodings.pkl"
+cv2 = lazy_import("cv2")
+face_recognition = lazy_import("face_recognition")
 
-def capture_and_save_face():
+@trace.traced("face.enroll")
+def capture_and_save_face(identity=None, cancel_event=None):
     print("\n[Face Setup] Please look into the camera...")
 
-    cap = cv2.VideoCapture(0)
+    cap = sources.open_camera()
     if not cap.isOpened():
         raise Exception("Could not open webcam")
+    preview = sources.show_preview()
+    detector = make_detector()
 
     while True:
+        # The GUI's Cancel button; nothing is saved
+        if cancel_event is not None and cancel_event.is_set():
+            print("❌ Registration canceled.")
+            break
+
         ret, frame = cap.read()
         if not ret:
             raise Exception("Failed to capture image from webcam")
 
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
+        with trace.span("face.detect"):
+            face_locations = detector.locate(rgb_frame)
 
         if face_locations:
-            face_encoding = face_recognition.face_encodings(rgb_frame, face_locations)[0]
+            with trace.span("face.encode"):
+                face_encoding = face_recognition.face_encodings(rgb_frame, face_locations[:1])[0]
 
-            with open(ENCODINGS_FILE, "wb") as f:
-                pickle.dump(face_encoding, f)
+            save_encoding(face_encoding, ENCODINGS_FILE)
+
+            # Multi-user deployments also enroll the encoding into the shared gallery
+            if identity:
+                FaceGallery().add(identity, face_encoding)
 
             print("✅ Face registered successfully.")
             break
         else:
             print("❌ No face detected. Try again...")
 
-        cv2.imshow("Face Registration - Press 'q' to exit", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            print("❌ Registration canceled.")
-            break
+        if preview:
+            cv2.imshow("Face Registration - Press 'q' to exit", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                print("❌ Registration canceled.")
+                break
 
     cap.release()
-    cv2.destroyAllWindows()
+    if preview:
+        cv2.destroyAllWindows()
@@ -1,16 +1,25 @@
 import os
 import time
-import importlib
 import subprocess
 import sys
-from utils.tts import speak
+import threading
+from utils import session, trace
+from utils.tts import speak, speech_stats
+from utils.daemon_client import daemon_available, request
+from utils.lazy import lazy_import, missing_modules
 from rich.console import Console
 from rich.text import Text
 
 console = Console()
 
+# Fast start: banner printed without animation, for kiosks and scripted runs
+FAST_START = "--fast" in sys.argv or os.environ.get("SECUREAUTH_FAST_START") == "1"
+
 # === Animation Banner ===
 def typewriter(text, delay=0.02):
+    if FAST_START:
+        print(text)
+        return
     for char in text:
         sys.stdout.write(char)
         sys.stdout.flush()
@@ -37,100 +46,192 @@ def show_banner():
 
     typewriter("\n🔐  SecureAuthOS - Biometric Security System")
     # typewriter("🛡️   Developed by Kartik Rawal\n")
-    time.sleep(0.5)
+    if not FAST_START:
+        time.sleep(0.5)
 
-show_banner()
+# The animation plays while start-up continues; join it before the first prompt
+banner_thread = threading.Thread(target=show_banner, daemon=True)
+banner_thread.start()
+
+# === Warm Daemon ===
+# When auth_daemon.py is running it already holds every model in memory, so this
+# process stays a thin client and skips the heavy imports below.
+USE_DAEMON = daemon_available()
 
 # === Dependency Check ===
-required_modules = ["cv2", "librosa", "numpy", "pyttsx3", "sounddevice", "scipy", "sklearn"]
-for module in required_modules:
-    try:
-        importlib.import_module(module)
-    except ImportError:
-        print(f"❌ Missing required package: {module}")
+# Packages are located on disk, not imported; they load on first use
+if not USE_DAEMON:
+    required_modules = ["cv2", "numpy", "pyttsx3", "sounddevice", "scipy"]
+    missing = missing_modules(required_modules)
+    if missing:
+        banner_thread.join()
+        print(f"❌ Missing required package: {', '.join(missing)}")
         print("Please install missing packages and rerun the application.")
         exit(1)
 
-# === Auth Modules ===
-import face_auth.register_face as face_register
-import face_auth.recognize_face as face_verify
-import voice_auth.voice_register as voice_register
-import voice_auth.voice_verify as voice_verify
+# === Auth Modules (loaded lazily) ===
+face_register = lazy_import("face_auth.register_face")
+face_verify = lazy_import("face_auth.recognize_face")
+voice_register = lazy_import("voice_auth.voice_register")
+voice_verify = lazy_import("voice_auth.voice_verify")
+orchestrator = lazy_import("utils.orchestrator")
 
 # === File Paths ===
-FACE_DATA_FILE = "face_encodings.pkl"
-VOICE_MODEL_FILE = "voiceprint.gmm"
+# Current model file first, then the legacy pickle it replaces (either counts as enrolled)
+FACE_DATA_FILES = ("face_encoding.model", "face_encodings.pkl")
+VOICE_MODEL_FILES = ("voiceprint.model", "voiceprint.gmm")
 SECRET_PHRASE_FILE = "voice_auth/secret_phrase.txt"
 
+# Capture thread + box tracking instead of serial read/detect/encode per frame
+PIPELINED_FACE = "--pipelined" in sys.argv
+# Camera and microphone at the same time, event-driven prompts instead of fixed sleeps
+CONCURRENT_AUTH = "--concurrent" in sys.argv
+# Low-risk operations need one factor; high-risk ones (the default) need both
+RISK = "low" if "--low-risk" in sys.argv else "high"
+
 # === Check if Setup is Complete ===
 def is_first_time():
     checks = [
-        os.path.exists(FACE_DATA_FILE),
-        os.path.exists(VOICE_MODEL_FILE),
+        any(os.path.exists(p) for p in FACE_DATA_FILES),
+        any(os.path.exists(p) for p in VOICE_MODEL_FILES),
         os.path.exists(SECRET_PHRASE_FILE)
     ]
     return not all(checks)
 
+# === Factor Checks (daemon or in-process) ===
+def check_face():
+    if USE_DAEMON:
+        return request("verify_face", pipelined=PIPELINED_FACE)["result"]
+    return face_verify.verify_face(pipelined=PIPELINED_FACE)
+
+def check_voice():
+    if USE_DAEMON:
+        response = request("verify_voice")
+        if response.get("lockdown"):
+            sys.exit(0)
+        return response["result"]
+    return voice_verify.verify_speaker_and_phrase()
+
 # === First-Time Setup ===
+@trace.traced("auth.enroll")
 def first_time_setup():
     speak("Welcome. Let's start your biometric setup.")
     print("\n🛠️  Starting first-time biometric registration...\n")
 
     speak("Registering your face.")
-    face_register.capture_and_save_face()
+    if USE_DAEMON:
+        request("enroll_face")
+    else:
+        face_register.capture_and_save_face()
 
+    # Voice enrollment asks for typed confirmation, so it always runs in this terminal
     speak("Now registering your voice.")
     voice_register.record_and_save_voice()
+    if USE_DAEMON:
+        request("reload")
 
     print("\n✅ All biometric data registered.\n")
     speak("All biometric data registered. You're ready to proceed.")
 
 # === Verification Mode ===
-def begin_verification():
-    speak("Starting authentication.")
+def verify_factor(factor):
+    # One factor of a full or step-up verification; a failed voice check locks down
+    if factor == "face":
+        speak("Please show your face to the camera.", wait=False, cache=True)
+        print("[Face Auth] Please align your face with the camera...")
+        if not check_face():
+            speak("Face authentication failed.", wait=False, cache=True)
+            print("❌ Face authentication failed.")
+            return False
+        print("✅ Face match successful.")
+        speak("Face verified.", wait=False, cache=True)
+        return True
+
+    speak("Now verifying your voice and secret phrase.", wait=False, cache=True)
+
+    # check_voice runs the retries itself (and the lockdown once they are used up);
+    # its recording prompts block on the speech queue, so no pause is needed first
+    if check_voice():
+        return True
+
+    speak("Authentication failed. Access denied.", wait=False, cache=True)
+    print("❌ Authentication failed. Please try again later.")
+
+    # Optional: Trigger secure deletion/encryption
+    from utils.encryption import secure_delete_folder
+    secure_delete_folder("secure_files")
+    return False
+
+@trace.traced("auth.verify")
+def begin_verification(risk=RISK):
+    # A valid session token skips the biometric pass: one HMAC check
+    claims = session.check(risk)
+    if claims is not None:
+        print(f"✅ Session active ({', '.join(claims['factors'])}, "
+              f"{session.remaining(claims)}s left). Access Granted!")
+        return
+
+    speak("Starting authentication.", wait=False, cache=True)
     print("\n🔐 Starting Authentication...\n")
 
     # Extra check before starting verification
-    if not all([os.path.exists(FACE_DATA_FILE), os.path.exists(VOICE_MODEL_FILE), os.path.exists(SECRET_PHRASE_FILE)]):
+    if is_first_time():
         print("❌ Voice model or passphrase file not found. Please run initial setup first.")
-        speak("Biometric model missing. Please run setup.")
+        speak("Biometric model missing. Please run setup.", wait=False)
         return
 
-    speak("Please show your face to the camera.")
-    print("[Face Auth] Please align your face with the camera...")
-    if not face_verify.verify_face():
-        speak("Face authentication failed.")
-        print("❌ Face authentication failed.")
+    if CONCURRENT_AUTH and len(session.missing_factors(risk)) == len(session.FACTORS):
+        begin_concurrent_verification()
         return
-    print("✅ Face match successful.")
 
-    speak("Face verified. Now verifying your voice and secret phrase.")
+    # Only the factors the session does not hold yet are asked for (step-up)
+    if session.step_up(risk, verify_factor):
+        speak("Access granted.", wait=False, cache=True)
+        print("✅ Access Granted!")
 
-    # Retry voice authentication 3 times
-    for attempt in range(3):
-        time.sleep(5 + attempt * 2)
-        result = voice_verify.verify_speaker_and_phrase()
-        if result:
-            speak("Access granted.")
-            print("✅ Access Granted!")
-            return
+def begin_concurrent_verification():
+    speak("Please look at the camera and speak your secret phrase when prompted.", wait=False, cache=True)
+    print("[Auth] Face and voice are checked together...")
+    if USE_DAEMON:
+        outcome = request("verify_concurrent", pipelined=PIPELINED_FACE)["result"]
+    else:
+        outcome = orchestrator.verify_concurrently(pipelined=PIPELINED_FACE)
 
-    speak("Authentication failed. Access denied.")
-    print("❌ Authentication failed. Please try again later.")
+    if outcome["granted"]:
+        session.issue(session.FACTORS)
+        speak("Access granted.", wait=False, cache=True)
+        print("✅ Access Granted!")
+        return
+    session.revoke()
+    if outcome["face"] is False:
+        speak("Face authentication failed.", wait=False, cache=True)
+        print("❌ Face authentication failed.")
+        return
 
-    # Optional: Trigger secure deletion/encryption
-    from utils.encryption import secure_delete_folder
-    secure_delete_folder("secure_files")
-    return
+    speak("Authentication failed. Access denied.", wait=False, cache=True)
+    print("❌ Authentication failed. Please try again later.")
+    if outcome["lockdown"]:
+        from utils.encryption import secure_delete_folder
+        secure_delete_folder("secure_files")
 
 
 # === Main Execution ===
 if __name__ == "__main__":
+    banner_thread.join()
     if is_first_time():
         speak("Biometric data missing.")
         print("⚠️  Some biometric data is missing.")
         first_time_setup()
     else:
-        begin_verification()
+        with trace.profiled("begin_verification"):
+            begin_verification()
+        stats = speech_stats()
+        print(f"⏱ Blocked on speech: {stats['blocked_seconds']:.1f}s "
+              f"({stats['spoken']} prompts spoken, {stats['dropped']} superseded)")
+        stages = sorted(trace.summary().items(), key=lambda item: item[1][1], reverse=True)
+        if stages:
+            print(f"⏱ Stage times (full trace in {trace.TRACE_FILE}):")
+            for name, (count, seconds) in stages:
+                print(f"   {name:<22} {count:4d}x {seconds:8.3f}s")
         
 
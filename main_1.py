@@ -1,98 +1,338 @@
 import os
+import queue
+import threading
 import time
-import importlib
 import tkinter as tk
+from contextlib import contextmanager
 from tkinter import messagebox
+from utils import session, trace
 from utils.tts import speak
+from utils.daemon_client import daemon_available, request
+from utils.lazy import lazy_import, missing_modules
+
+# === Warm Daemon ===
+# When auth_daemon.py is running it already holds every model in memory, so the
+# GUI stays a thin client and skips the heavy imports below.
+USE_DAEMON = daemon_available()
 
 # === Dependency Check ===
-required_modules = ["cv2", "librosa", "numpy", "pyttsx3", "sounddevice", "scipy", "sklearn"]
-for module in required_modules:
-    try:
-        importlib.import_module(module)
-    except ImportError:
-        messagebox.showerror("Missing Dependency", f"❌ Missing required package: {module}\nInstall it and rerun.")
+# Packages are located on disk, not imported; they load on first use
+if not USE_DAEMON:
+    required_modules = ["cv2", "numpy", "pyttsx3", "sounddevice", "scipy"]
+    missing = missing_modules(required_modules)
+    if missing:
+        messagebox.showerror("Missing Dependency", f"❌ Missing required package: {', '.join(missing)}\nInstall it and rerun.")
         exit(1)
 
-# === Auth Modules ===
-import face_auth.register_face as face_register
-import face_auth.recognize_face as face_verify
-import voice_auth.voice_register as voice_register
-import voice_auth.voice_verify as voice_verify
+# === Auth Modules (loaded lazily) ===
+face_register = lazy_import("face_auth.register_face")
+face_verify = lazy_import("face_auth.recognize_face")
+voice_register = lazy_import("voice_auth.voice_register")
+voice_verify = lazy_import("voice_auth.voice_verify")
+phrase_match = lazy_import("voice_auth.phrase_match")
 from utils.encryption import secure_delete_folder
 
 # === File Paths ===
-FACE_DATA_FILE = "face_encodings.pkl"
-VOICE_MODEL_FILE = "voiceprint.gmm"
+# Current model file first, then the legacy pickle it replaces (either counts as enrolled)
+FACE_DATA_FILES = ("face_encoding.model", "face_encodings.pkl")
+VOICE_MODEL_FILES = ("voiceprint.model", "voiceprint.gmm")
 SECRET_PHRASE_FILE = "voice_auth/secret_phrase.txt"
+MAX_VOICE_ATTEMPTS = 3
 
 # === Check if Setup is Complete ===
 def is_first_time():
     checks = [
-        os.path.exists(FACE_DATA_FILE),
-        os.path.exists(VOICE_MODEL_FILE),
+        any(os.path.exists(p) for p in FACE_DATA_FILES),
+        any(os.path.exists(p) for p in VOICE_MODEL_FILES),
         os.path.exists(SECRET_PHRASE_FILE)
     ]
     return not all(checks)
 
+# === Worker Runs ===
+# Enrollment and verification run on a worker thread; the Tk thread only draws.
+# The flow reports progress through post() and a queue that the window drains
+# every POLL_MS with after(). Cancel is honoured at the next checkpoint: between
+# stages, during retry pauses, and inside the face and voice capture loops.
+# Failed voice attempts are persisted (session.record_failure), so Cancel and a
+# fresh run continue the count rather than buying three new attempts.
+POLL_MS = 100
+
+
+class Cancelled(Exception):
+    pass
+
+
+class AuthRun:
+    def __init__(self):
+        self.events = queue.Queue()
+        self.cancel = threading.Event()
+        self.started = time.perf_counter()
+        self.thread = None
+
+    def post(self, kind, **data):
+        # (kind, seconds since start, data); consumed on the Tk thread
+        self.events.put((kind, time.perf_counter() - self.started, data))
+
+    def check(self):
+        if self.cancel.is_set():
+            raise Cancelled()
+
+    @contextmanager
+    def stage(self, name):
+        self.check()
+        self.post("stage", name=name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.post("stage_done", name=name, seconds=time.perf_counter() - start)
+
+    def sleep(self, seconds):
+        # A retry pause that Cancel cuts short
+        if self.cancel.wait(seconds):
+            raise Cancelled()
+
+    def start(self, flow):
+        def work():
+            try:
+                flow(self)
+            except Cancelled:
+                self.post("cancelled")
+            except Exception as e:
+                self.post("error", message=str(e))
+            finally:
+                self.post("finished")
+
+        self.thread = threading.Thread(target=work, name="auth-flow", daemon=True)
+        self.thread.start()
+        return self
+
+
+# === Factor Checks (daemon or in-process) ===
+# A daemon request cannot be interrupted; Cancel takes effect once it returns.
+def check_face(run):
+    if USE_DAEMON:
+        result = request("verify_face")["result"]
+    else:
+        result = face_verify.verify_face(cancel_event=run.cancel)
+    run.check()
+    run.post("score", factor="face", match=bool(result))
+    return result
+
+def check_voice(run, models):
+    # One attempt in-process (the window drives the retries), or the daemon's full
+    # verification: it runs the remaining attempts, records them in the shared
+    # count and locks down itself. Returns (result, lockdown).
+    if USE_DAEMON:
+        response = request("verify_voice")
+        return response["result"], bool(response.get("lockdown"))
+    gmm_model, saved_phrase, templates = models
+    result = voice_verify.voice_attempt(
+        gmm_model, saved_phrase, templates, cancel_event=run.cancel,
+        on_accept=voice_verify.adapt_voiceprint if voice_verify.ADAPT_ON_LOGIN else None,
+        on_scores=lambda scores: run.post("score", factor="voice", **scores))
+    return result, False
+
 # === First-Time Setup ===
-def first_time_setup():
-    speak("Welcome. Let's start your biometric setup.")
-    messagebox.showinfo("Setup", "Starting first-time biometric registration...")
+@trace.traced("auth.enroll")
+def first_time_setup(run):
+    with run.stage("Welcome"):
+        speak("Welcome. Let's start your biometric setup.")
 
-    speak("Registering your face.")
-    face_register.capture_and_save_face()
+    with run.stage("Face enrollment"):
+        speak("Registering your face.")
+        if USE_DAEMON:
+            request("enroll_face")
+        else:
+            face_register.capture_and_save_face(cancel_event=run.cancel)
 
-    speak("Now registering your voice.")
-    voice_register.record_and_save_voice()
+    # Voice enrollment asks for typed confirmation, so it always runs in this process
+    with run.stage("Voice enrollment"):
+        speak("Now registering your voice.")
+        voice_register.record_and_save_voice()
+        if USE_DAEMON:
+            request("reload")
 
-    messagebox.showinfo("Setup Complete", "✅ All biometric data registered.")
+    run.post("result", ok=True, title="Setup Complete", message="✅ All biometric data registered.")
     speak("Setup complete. You're ready to proceed.")
 
 # === Verification Mode ===
-def begin_verification():
-    speak("Starting authentication.")
-    messagebox.showinfo("Authentication", "🔐 Starting Authentication...")
-
-    if not all([os.path.exists(FACE_DATA_FILE), os.path.exists(VOICE_MODEL_FILE), os.path.exists(SECRET_PHRASE_FILE)]):
-        messagebox.showerror("Error", "❌ Biometric model missing. Please run setup first.")
-        speak("Biometric model missing. Please run setup.")
+@trace.traced("auth.verify")
+def begin_verification(run):
+    # A valid session token skips the biometric pass
+    claims = session.check("high")
+    if claims is not None:
+        run.post("result", ok=True, title="Success",
+                 message=f"✅ Session active ({session.remaining(claims)}s left). Access Granted!")
         return
 
-    speak("Please show your face to the camera.")
-    if not face_verify.verify_face():
+    with run.stage("Start"):
+        speak("Starting authentication.")
+        if is_first_time():
+            run.post("result", ok=False, title="Error", message="❌ Biometric model missing. Please run setup first.")
+            speak("Biometric model missing. Please run setup.")
+            return
+        models = None
+        if not USE_DAEMON:
+            models = voice_verify.load_voice_models() + (phrase_match.load_templates(),)
+
+    with run.stage("Face"):
+        speak("Please show your face to the camera.")
+        face_ok = check_face(run)
+    if not face_ok:
+        session.revoke()
+        run.post("result", ok=False, title="Auth Failed", message="❌ Face authentication failed.")
         speak("Face authentication failed.")
-        messagebox.showerror("Auth Failed", "❌ Face authentication failed.")
         return
 
     speak("Face verified. Now verifying your voice and secret phrase.")
-    for attempt in range(3):
-        time.sleep(3 + attempt)
-        result = voice_verify.verify_speaker_and_phrase()
+    attempts = range(session.failures(), MAX_VOICE_ATTEMPTS)
+    if USE_DAEMON:
+        attempts = attempts[:1]  # One request covers the rest
+    for attempt in attempts:
+        with run.stage(f"Pause before attempt {attempt + 1}"), trace.span("auth.retry_sleep"):
+            run.sleep(3 + attempt)
+        label = f"Voice attempts {attempt + 1}-{MAX_VOICE_ATTEMPTS} (daemon)" if USE_DAEMON else \
+            f"Voice attempt {attempt + 1}"
+        with run.stage(label):
+            result, lockdown = check_voice(run, models)
         if result:
+            if not USE_DAEMON:
+                session.clear_failures()
+            session.issue(session.FACTORS)
+            run.post("result", ok=True, title="Success", message="✅ Access Granted!")
             speak("Access granted.")
-            messagebox.showinfo("Success", "✅ Access Granted!")
             return
+        if lockdown:
+            # The daemon already secured the files
+            run.post("lockdown")
+            return
+        # Recorded before Cancel is honoured: a scored rejection always counts,
+        # an attempt without a score (not understood) counts unless it was cancelled
+        if not USE_DAEMON and (result is False or not run.cancel.is_set()):
+            session.record_failure()
+        run.check()
 
     speak("Authentication failed. Access denied.")
-    messagebox.showerror("Denied", "❌ Authentication failed. Files will be deleted.")
-    secure_delete_folder("secure_files")
+    run.post("lockdown")
+    with run.stage("Lockdown"):
+        try:
+            secure_delete_folder("secure_files")
+        except SystemExit:
+            pass  # The window closes once the lockdown event is shown
 
 # === UI ===
 def launch_app():
     root = tk.Tk()
     root.title("SecureAuthOS")
-    root.geometry("400x250")
+    root.geometry("440x420")
 
     tk.Label(root, text="🔐 SecureAuthOS", font=("Arial", 16, "bold")).pack(pady=10)
     tk.Label(root, text="Biometric Security System").pack()
 
-    if is_first_time():
-        tk.Button(root, text="Run First-Time Setup", width=20, command=first_time_setup).pack(pady=15)
-    else:
-        tk.Button(root, text="Authenticate", width=20, command=begin_verification).pack(pady=15)
+    status = tk.StringVar(value="Ready.")
+    tk.Label(root, textvariable=status).pack(pady=5)
+    # Live timings: one line per stage, the running one ticking, plus scores as they arrive
+    timings = tk.Listbox(root, width=52, height=10, font=("Courier", 10))
+    timings.pack(padx=10)
+
+    state = {"run": None, "stage": None, "line": None, "stage_started": 0.0, "outcome": None}
+
+    def stage_line(name, seconds, running=False):
+        return f"{'▶' if running else '✔'} {name:<30}{seconds:7.2f}s"
+
+    def start(flow):
+        state.update(run=AuthRun(), stage=None, line=None, outcome=None)
+        timings.delete(0, tk.END)
+        action.config(state=tk.DISABLED)
+        cancel.config(state=tk.NORMAL)
+        status.set("Running...")
+        state["run"].start(flow)
+        root.after(POLL_MS, poll)
+
+    def handle(kind, elapsed, data):
+        if kind == "stage":
+            timings.insert(tk.END, stage_line(data["name"], 0.0, running=True))
+            state.update(stage=data["name"], line=timings.size() - 1, stage_started=time.perf_counter())
+            status.set(f"{data['name']}...")
+        elif kind == "stage_done":
+            if state["line"] is not None:
+                timings.delete(state["line"])
+                timings.insert(state["line"], stage_line(data["name"], data["seconds"]))
+            state.update(stage=None, line=None)
+        elif kind == "score":
+            details = ", ".join(f"{k} {v}" for k, v in data.items() if k != "factor")
+            timings.insert(tk.END, f"    {data['factor']}: {details}")
+        elif kind in ("result", "lockdown", "error", "cancelled"):
+            state["outcome"] = (kind, data)
+        elif kind == "finished":
+            timings.insert(tk.END, f"  total {elapsed:.2f}s")
+        timings.see(tk.END)
+
+    def poll():
+        run = state["run"]
+        finished = False
+        while True:
+            try:
+                kind, elapsed, data = run.events.get_nowait()
+            except queue.Empty:
+                break
+            handle(kind, elapsed, data)
+            finished = finished or kind == "finished"
+        if state["line"] is not None:
+            timings.delete(state["line"])
+            timings.insert(state["line"], stage_line(state["stage"], time.perf_counter() - state["stage_started"],
+                                                     running=True))
+        if finished:
+            done()
+        else:
+            root.after(POLL_MS, poll)
+
+    def done():
+        cancel.config(state=tk.DISABLED)
+        kind, data = state["outcome"] or ("cancelled", {})
+        if kind == "result":
+            status.set(data["message"])
+            (messagebox.showinfo if data["ok"] else messagebox.showerror)(data["title"], data["message"])
+        elif kind == "lockdown":
+            messagebox.showerror("Denied", "❌ Authentication failed. Files will be deleted.")
+            root.destroy()
+            return
+        elif kind == "error":
+            status.set(f"❌ {data['message']}")
+            messagebox.showerror("Error", f"❌ {data['message']}")
+        else:
+            status.set("⏹ Cancelled.")
+        configure_action()
+
+    def on_cancel():
+        if state["run"] is not None:
+            state["run"].cancel.set()
+            cancel.config(state=tk.DISABLED)
+            status.set("Cancelling...")
+
+    def on_exit():
+        if state["stage"] == "Lockdown":
+            # Leaving now would stop the lockdown half-way
+            status.set("🔐 Securing files, please wait...")
+            return
+        if state["run"] is not None:
+            state["run"].cancel.set()
+        root.destroy()
+
+    def configure_action():
+        if is_first_time():
+            action.config(text="Run First-Time Setup", command=lambda: start(first_time_setup), state=tk.NORMAL)
+        else:
+            action.config(text="Authenticate", command=lambda: start(begin_verification), state=tk.NORMAL)
 
-    tk.Button(root, text="Exit", width=20, command=root.quit).pack(pady=10)
+    action = tk.Button(root, width=20)
+    action.pack(pady=(15, 5))
+    cancel = tk.Button(root, text="Cancel", width=20, command=on_cancel, state=tk.DISABLED)
+    cancel.pack(pady=5)
+    tk.Button(root, text="Exit", width=20, command=on_exit).pack(pady=5)
+    configure_action()
+    root.protocol("WM_DELETE_WINDOW", on_exit)
 
     root.mainloop()
 
@@ -0,0 +1,247 @@
+import base64
+import os
+import struct
+import sys
+import time
+import zlib
+from utils.lazy import lazy_import
+from utils.stream_crypto import CHUNK_SIZE, TAG_SIZE, ContainerError
+
+aead = lazy_import("cryptography.hazmat.primitives.ciphers.aead")
+hkdf = lazy_import("cryptography.hazmat.primitives.kdf.hkdf")
+hashes = lazy_import("cryptography.hazmat.primitives.hashes")
+
+# === Pack Format (v1) ===
+# Many small files appended into one file, instead of one .enc file (makedirs,
+# create, fsync, rename) per file.
+#
+# header:  MAGIC(8) | version u8 | salt(16)
+# entries: each file's bytes as AES-256-GCM chunks of CHUNK_SIZE, each with a 16-byte tag
+# index:   zlib-compressed (offset u64, size u64, mtime f64, path length u16, path) per entry,
+#          encrypted as one AES-GCM record
+# footer:  index offset u64 | index length u32 | FOOTER_MAGIC(8)
+#
+# Key = HKDF(master key, salt). nonce = entry number (7 bytes) | chunk index
+# (4 bytes) | final flag (1 byte), with the last entry number reserved for the
+# index. Every entry is sealed on its own, so restoring one file reads the
+# index and that file's chunks, not the whole pack.
+MAGIC = b"SAOSPAK\x00"
+FOOTER_MAGIC = b"SAOSIDX\x00"
+VERSION = 1
+HEADER = struct.Struct(">8sB16s")
+FOOTER = struct.Struct(">QI8s")
+ENTRY = struct.Struct(">QQdH")
+INDEX_ENTRY_NO = (1 << 56) - 1
+PACK_SUFFIX = ".pack"
+
+PACK_MAX_FILE_SIZE = 1024 * 1024  # Larger files keep their own .enc container (their cost is bytes, not metadata)
+PACK_MAX_FILES = 10000  # A pack is sealed (fsync, rename) after this many files...
+PACK_MAX_BYTES = 256 * 1024 * 1024  # ...or this many plaintext bytes
+WRITE_BUFFER = 4 * 1024 * 1024  # Encrypted entries are written out in batches of this size
+
+
+def _pack_key(master_key, salt):
+    raw = base64.urlsafe_b64decode(master_key)
+    kdf = hkdf.HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"secureauthos pack v1")
+    return kdf.derive(raw)
+
+
+def _nonce(entry_no, chunk, final):
+    return entry_no.to_bytes(7, "big") + chunk.to_bytes(4, "big") + (b"\x01" if final else b"\x00")
+
+
+def sealed_size(size):
+    # Bytes an entry of `size` plaintext bytes takes in the pack (an empty file is one empty chunk)
+    return size + max(1, -(-size // CHUNK_SIZE)) * TAG_SIZE
+
+
+# === Writing ===
+class PackWriter:
+    # Appends files to the current pack; add() returns (pack path, [(path, size)])
+    # once a pack has been sealed and is safe on disk, so those originals can be
+    # wiped, and None while the pack is still filling.
+    def __init__(self, directory, master_key, root):
+        self.directory = directory
+        self.master_key = master_key
+        self.root = os.fspath(root)
+        self.sequence = 0
+        self.file = None
+
+    def accepts(self, size):
+        return size <= PACK_MAX_FILE_SIZE
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.sequence += 1
+        name = time.strftime("pack-%Y%m%d-%H%M%S") + f"-{os.getpid()}-{self.sequence:04d}{PACK_SUFFIX}"
+        self.path = os.path.join(self.directory, name)
+        self.file = open(self.path + ".part", "wb", buffering=WRITE_BUFFER)
+        salt = os.urandom(16)
+        self.header = HEADER.pack(MAGIC, VERSION, salt)
+        self.cipher = aead.AESGCM(_pack_key(self.master_key, salt))
+        self.file.write(self.header)
+        self.offset = HEADER.size
+        self.entries = []  # (offset, size, mtime, relative path)
+        self.sources = []  # (source path, size) to wipe once sealed
+        self.bytes = 0
+
+    def add(self, path, size=None):
+        if self.file is None:
+            self._open()
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+        entry_no = len(self.entries)
+        chunks = max(1, -(-len(data) // CHUNK_SIZE))
+        offset = self.offset
+        for i in range(chunks):
+            chunk = data[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE]
+            self.file.write(self.cipher.encrypt(_nonce(entry_no, i, i == chunks - 1), chunk, self.header))
+        self.offset += sealed_size(len(data))
+        self.entries.append((offset, len(data), st.st_mtime, os.path.relpath(path, self.root)))
+        self.sources.append((path, len(data) if size is None else size))
+        self.bytes += len(data)
+        if len(self.entries) >= PACK_MAX_FILES or self.bytes >= PACK_MAX_BYTES:
+            return self.seal()
+        return None
+
+    def seal(self):
+        # Index + footer, fsync, atomic rename: the pack is complete or absent
+        if self.file is None:
+            return None
+        index = bytearray()
+        for offset, size, mtime, rel in self.entries:
+            name = rel.encode("utf-8")
+            index += ENTRY.pack(offset, size, mtime, len(name)) + name
+        record = self.cipher.encrypt(_nonce(INDEX_ENTRY_NO, 0, True), zlib.compress(bytes(index)), self.header)
+        self.file.write(record)
+        self.file.write(FOOTER.pack(self.offset, len(record), FOOTER_MAGIC))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
+        os.replace(self.path + ".part", self.path)
+        return self.path, self.sources
+
+
+# === Reading ===
+class PackReader:
+    def __init__(self, path, master_key):
+        self.path = path
+        self.file = open(path, "rb")
+        self.header = self.file.read(HEADER.size)
+        if len(self.header) != HEADER.size:
+            raise ContainerError("File too short to be a pack")
+        magic, version, salt = HEADER.unpack(self.header)
+        if magic != MAGIC:
+            raise ContainerError("Not a pack file")
+        if version != VERSION:
+            raise ContainerError(f"Unsupported pack version {version}")
+        self.cipher = aead.AESGCM(_pack_key(master_key, salt))
+        self.entries = self._read_index()  # relative path -> (entry number, offset, size, mtime)
+
+    def _read_index(self):
+        self.file.seek(-FOOTER.size, os.SEEK_END)
+        index_offset, index_length, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+        if magic != FOOTER_MAGIC:
+            raise ContainerError("Pack has no index (unfinished write)")
+        self.file.seek(index_offset)
+        try:
+            index = zlib.decompress(self.cipher.decrypt(_nonce(INDEX_ENTRY_NO, 0, True),
+                                                        self.file.read(index_length), self.header))
+        except Exception:
+            raise ContainerError("Pack index failed authentication")
+        entries = {}
+        position = number = 0
+        while position < len(index):
+            offset, size, mtime, name_len = ENTRY.unpack_from(index, position)
+            position += ENTRY.size
+            rel = index[position:position + name_len].decode("utf-8")
+            position += name_len
+            entries[rel] = (number, offset, size, mtime)
+            number += 1
+        return entries
+
+    def read(self, rel):
+        # Decrypt a single entry; only its own chunks are read
+        entry_no, offset, size, _ = self.entries[rel]
+        self.file.seek(offset)
+        chunks = max(1, -(-size // CHUNK_SIZE))
+        out = bytearray()
+        for i in range(chunks):
+            length = min(CHUNK_SIZE, size - i * CHUNK_SIZE) + TAG_SIZE
+            try:
+                out += self.cipher.decrypt(_nonce(entry_no, i, i == chunks - 1), self.file.read(length), self.header)
+            except Exception:
+                raise ContainerError(f"{rel} failed authentication (tampered pack)")
+        return bytes(out)
+
+    def extract(self, rel, dst_path):
+        os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+        with open(dst_path, "wb") as f:
+            f.write(self.read(rel))
+        mtime = self.entries[rel][3]
+        os.utime(dst_path, (mtime, mtime))
+        return dst_path
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def list_packs(directory):
+    # Oldest first, so a file packed again by a later lockdown wins
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, n) for n in os.listdir(directory) if n.endswith(PACK_SUFFIX))
+
+
+def restore_file(rel, dst_path, master_key, directory):
+    # Newest copy of one file, without decrypting anything else
+    for pack in reversed(list_packs(directory)):
+        with PackReader(pack, master_key) as reader:
+            if rel in reader.entries:
+                return reader.extract(rel, dst_path)
+    raise FileNotFoundError(f"{rel} is not in any pack in {directory}")
+
+
+def restore_all(output_dir, master_key, directory):
+    count = 0
+    for pack in list_packs(directory):
+        with PackReader(pack, master_key) as reader:
+            for rel in reader.entries:
+                reader.extract(rel, os.path.join(output_dir, rel))
+                count += 1
+    return count
+
+
+# === Restore Tool ===
+# python -m utils.archive list
+# python -m utils.archive restore <path in secure_files> <output>
+# python -m utils.archive restore-all <output dir>
+if __name__ == "__main__":
+    from utils.encryption import ENCRYPTED_DIR, load_key
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "list" and len(sys.argv) == 2:
+        key = load_key()
+        for pack in list_packs(ENCRYPTED_DIR):
+            with PackReader(pack, key) as reader:
+                print(f"📦 {pack}: {len(reader.entries)} files")
+                for rel, (_, _, size, _) in sorted(reader.entries.items()):
+                    print(f"   {rel} ({size} bytes)")
+    elif command == "restore" and len(sys.argv) == 4:
+        restore_file(sys.argv[2], sys.argv[3], load_key(), ENCRYPTED_DIR)
+        print(f"✅ Restored {sys.argv[2]} → {sys.argv[3]}")
+    elif command == "restore-all" and len(sys.argv) == 3:
+        count = restore_all(sys.argv[2], load_key(), ENCRYPTED_DIR)
+        print(f"✅ Restored {count} files → {sys.argv[2]}")
+    else:
+        print("Usage: python -m utils.archive list | restore <path> <output> | restore-all <output dir>")
+        sys.exit(2)
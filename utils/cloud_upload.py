@@ -1,9 +1,11 @@
 import os
 import shutil
 import tempfile
-import requests
 from datetime import datetime
 from pathlib import Path
+from utils.lazy import lazy_import
+
+requests = lazy_import("requests")
 
 def stealth_backup(folder_path):
     if not os.path.exists(folder_path):
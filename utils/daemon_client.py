@@ -0,0 +1,37 @@
+import json
+import os
+import socket
+
+SOCKET_PATH = os.environ.get("SECUREAUTH_SOCKET", "secureauth.sock")
+CONNECT_TIMEOUT = 0.5  # Seconds; a missing daemon must not slow the cold path down
+REQUEST_TIMEOUT = 300  # Seconds; verification waits on the camera, microphone and user
+
+
+class DaemonError(Exception):
+    pass
+
+
+def daemon_available(path=SOCKET_PATH):
+    if not os.path.exists(path):
+        return False
+    try:
+        return request("ping", path=path, timeout=CONNECT_TIMEOUT).get("ok", False)
+    except (OSError, DaemonError):
+        return False
+
+
+def request(op, path=SOCKET_PATH, timeout=REQUEST_TIMEOUT, **params):
+    # One JSON line in, one JSON line out
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall((json.dumps(dict(params, op=op)) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as reader:
+            line = reader.readline()
+
+    if not line:
+        raise DaemonError(f"Auth daemon closed the connection during '{op}'")
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise DaemonError(response.get("error", f"'{op}' failed"))
+    return response
@@ -1,15 +1,26 @@
 import os
 import shutil
 import base64
-from cryptography.fernet import Fernet
 from pathlib import Path
+from utils.lazy import lazy_import
+from utils import archive, stream_crypto
+from utils.lockdown import LockdownEngine
+from utils import session, shadow
+from utils import trace
+from utils import wipe
+from utils.wipe import WIPE_PASSES
+
+fernet_lib = lazy_import("cryptography.fernet")
 
 KEY_FILE = "utils/.secretkey"
 ENCRYPTED_DIR = ".encrypted_backups"
+CHUNKED_FORMAT = True  # Chunked AES-GCM container (utils.stream_crypto); False = legacy whole-file Fernet
+# Small files go into indexed pack files (utils.archive) instead of one .enc file each
+ARCHIVE_MODE = os.environ.get("SECUREAUTH_ARCHIVE") == "1"
 
 
 def generate_key():
-    key = Fernet.generate_key()
+    key = fernet_lib.Fernet.generate_key()
     os.makedirs(os.path.dirname(KEY_FILE), exist_ok=True)
     with open(KEY_FILE, "wb") as f:
         f.write(key)
@@ -21,33 +32,44 @@ def load_key():
     with open(KEY_FILE, "rb") as f:
         return f.read()
 
-def encrypt_file(filepath, key):
-    fernet = Fernet(key)
-    with open(filepath, "rb") as f:
-        data = f.read()
-    encrypted = fernet.encrypt(data)
-
+@trace.traced("crypto.encrypt_file")
+def encrypt_file(filepath, key, suffix=""):
+    # suffix: written to <name>.enc<suffix> for the caller to publish (utils/shadow.py)
     filename = os.path.basename(filepath)
     rel_dir = os.path.relpath(os.path.dirname(filepath), start="secure_files")
     target_dir = os.path.join(ENCRYPTED_DIR, rel_dir)
     os.makedirs(target_dir, exist_ok=True)
+    encrypted_path = os.path.join(target_dir, filename + ".enc" + suffix)
+
+    # Constant memory and no base64 growth; decrypt with `python -m utils.stream_crypto`
+    if CHUNKED_FORMAT:
+        return stream_crypto.encrypt_path(filepath, encrypted_path, key)
+
+    fernet = fernet_lib.Fernet(key)
+    with open(filepath, "rb") as f:
+        data = f.read()
+    encrypted = fernet.encrypt(data)
 
-    encrypted_path = os.path.join(target_dir, filename + ".enc")
     with open(encrypted_path, "wb") as f:
         f.write(encrypted)
     return encrypted_path
 
-def secure_delete(filepath):
-    if os.path.exists(filepath):
-        length = os.path.getsize(filepath)
+@trace.traced("crypto.wipe_file")
+def secure_delete(filepath, passes=WIPE_PASSES):
+    # Streams a fixed-size CSPRNG buffer over the file in place; see utils/wipe.py
+    if os.path.lexists(filepath):
         try:
-            with open(filepath, "wb") as f:
-                f.write(os.urandom(length))
-        except:
-            pass
-        os.remove(filepath)
+            return wipe.wipe_file(filepath, passes)
+        except OSError:
+            if os.path.lexists(filepath):
+                os.remove(filepath)
 
+@trace.traced("crypto.lockdown")
 def secure_delete_folder(folder_path, silent=False):
+    # Any open session ends with the lockdown; background backups stop before the
+    # wipe, including the daemon's (it sees the stop file in ENCRYPTED_DIR)
+    session.revoke_all()
+    shadow.stop_all(ENCRYPTED_DIR)
     if not silent:
         print(f"\n⚠️ Securing contents of: {folder_path}")
     if not os.path.exists(folder_path):
@@ -57,19 +79,12 @@ def secure_delete_folder(folder_path, silent=False):
 
     key = load_key()
 
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            full_path = os.path.join(root, file)
-            if file.endswith(".enc"):  # Skip already encrypted files
-                continue
-            try:
-                enc_path = encrypt_file(full_path, key)
-                secure_delete(full_path)
-                if not silent:
-                    print(f"🔐 Encrypted and deleted: {full_path} → {enc_path}")
-            except Exception as e:
-                if not silent:
-                    print(f"❌ Error with {file}: {e}")
+    # Parallel, priority-ordered and safe to interrupt; see utils/lockdown.py.
+    # Files the shadow protector already backed up (utils/shadow.py) are only wiped.
+    packer = archive.PackWriter(ENCRYPTED_DIR, key, root=folder_path) if ARCHIVE_MODE else None
+    engine = LockdownEngine(key, encrypt_file, secure_delete, silent=silent, packer=packer,
+                            shadow=shadow.load_index(ENCRYPTED_DIR))
+    engine.run(folder_path)
 
     if not silent:
         print("✅ All files encrypted and securely deleted.\n")
@@ -0,0 +1,48 @@
+import importlib
+import importlib.util
+import sys
+
+
+# === Lazy Imports ===
+# Heavy packages (cv2, librosa, sklearn, face_recognition, ...) cost seconds to
+# import. A LazyModule stands in for the real module and imports it on first
+# attribute access, so start-up only pays for what the chosen path uses.
+class LazyModule:
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def module_available(name):
+    # Locates the top-level package without executing it
+    try:
+        return importlib.util.find_spec(name.split(".")[0]) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def missing_modules(names):
+    return [name for name in names if not module_available(name)]
@@ -0,0 +1,181 @@
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+WIPE_SUFFIX = ".wiping"  # Plaintext already backed up and being wiped; never re-encrypt these
+PRIORITY_WINDOW = 4096  # Files buffered for ordering; enumeration stays streaming beyond this
+PROGRESS_INTERVAL = 1.0  # Seconds between progress lines
+
+# Extensions that go first regardless of size: keys, credentials, databases, documents
+SENSITIVE_EXTENSIONS = {
+    ".key": 3, ".pem": 3, ".p12": 3, ".pfx": 3, ".kdbx": 3, ".gpg": 3, ".asc": 3, ".env": 3,
+    ".db": 2, ".sqlite": 2, ".sql": 2, ".csv": 2, ".xlsx": 2, ".xls": 2,
+    ".pdf": 1, ".docx": 1, ".doc": 1, ".txt": 1, ".json": 1,
+}
+
+
+# === Streaming Enumeration ===
+# os.scandir walk that yields files as they are found (no up-front list of the
+# whole tree), skipping already encrypted files.
+def iter_files(folder_path):
+    stack = [os.fspath(folder_path)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and not entry.name.endswith(".enc"):
+                        yield entry.path, entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+
+
+def priority(path, size):
+    if path.endswith(WIPE_SUFFIX):
+        return (4, size)  # Interrupted wipes are finished first: plaintext is still on disk
+    ext = os.path.splitext(path)[1].lower()
+    return (SENSITIVE_EXTENSIONS.get(ext, 0), size)
+
+
+def prioritized(files, window=PRIORITY_WINDOW):
+    # Most sensitive, then largest first within a sliding window of the enumeration
+    heap = []
+    counter = 0
+    for path, size in files:
+        sensitivity, nbytes = priority(path, size)
+        heapq.heappush(heap, (-sensitivity, -nbytes, counter, path, size))
+        counter += 1
+        if len(heap) >= window:
+            _, _, _, p, s = heapq.heappop(heap)
+            yield p, s
+    while heap:
+        _, _, _, p, s = heapq.heappop(heap)
+        yield p, s
+
+
+# === Lockdown Engine ===
+class LockdownEngine:
+    # With a packer (utils.archive.PackWriter), small files are appended to pack
+    # files on the enumerating thread and only their wipes go to the pool. With a
+    # shadow index (utils.shadow), files whose backup is still current are only wiped.
+    def __init__(self, key, encrypt_file, secure_delete, workers=None, silent=False, packer=None,
+                 shadow=None):
+        self.key = key
+        self.encrypt_file = encrypt_file
+        self.secure_delete = secure_delete
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self.silent = silent
+        self.packer = packer
+        self.shadow = shadow
+        self.lock = threading.Lock()
+        self.stats = {"files": 0, "bytes": 0, "wiped_bytes": 0, "errors": 0, "discovered": 0,
+                      "already_backed_up": 0}
+        self.started = None
+        self.last_report = 0.0
+
+    def _process(self, path, size):
+        # Order matters for interruption safety:
+        #   1. encrypt to a side file, fsync, atomic rename  -> .enc complete or absent
+        #   2. rename plaintext to *.wiping                 -> marks "backed up, safe to wipe"
+        #   3. overwrite and unlink
+        # A rerun re-encrypts plain files (idempotent) and only wipes *.wiping files.
+        if path.endswith(WIPE_SUFFIX):
+            return path, None, self.secure_delete(path)
+        enc_path = self.encrypt_file(path, self.key)
+        wipe_path = path + WIPE_SUFFIX
+        os.replace(path, wipe_path)
+        return path, enc_path, self.secure_delete(wipe_path)
+
+    def _wipe_backed_up(self, path, enc_path):
+        # The backup (a sealed pack or a current shadow copy) is already on disk
+        wipe_path = path + WIPE_SUFFIX
+        os.replace(path, wipe_path)
+        return path, enc_path, self.secure_delete(wipe_path)
+
+    def _done(self, future, size):
+        with self.lock:
+            try:
+                path, enc_path, wiped = future.result()
+                self.stats["files"] += 1
+                self.stats["bytes"] += size
+                if wiped:
+                    self.stats["wiped_bytes"] += wiped["bytes"]
+                    if wiped["skipped"] and not self.silent:
+                        print(f"⚠️ {path} not overwritten ({wiped['skipped']}), only unlinked")
+                if not self.silent and enc_path:
+                    print(f"🔐 Encrypted and deleted: {path} → {enc_path}")
+            except Exception as e:
+                self.stats["errors"] += 1
+                if not self.silent:
+                    print(f"❌ Error: {e}")
+            self._maybe_report()
+
+    def _maybe_report(self, force=False):
+        now = time.perf_counter()
+        if self.silent or (not force and now - self.last_report < PROGRESS_INTERVAL):
+            return
+        self.last_report = now
+        elapsed = max(now - self.started, 1e-9)
+        s = self.stats
+        print(f"⏳ {s['files']}/{s['discovered']} files, {s['bytes'] / 1e6:.1f} MB "
+              f"({s['files'] / elapsed:.0f} files/s, {s['bytes'] / 1e6 / elapsed:.1f} MB/s)")
+
+    def _counted(self, files):
+        for path, size in files:
+            self.stats["discovered"] += 1
+            yield path, size
+
+    def _pack(self, path, size):
+        # Sealed batch (pack path, [(path, size)]) or None; a file that cannot be read counts as an error
+        try:
+            return self.packer.add(path, size)
+        except OSError as e:
+            with self.lock:
+                self.stats["errors"] += 1
+                if not self.silent:
+                    print(f"❌ Error: {e}")
+            return None
+
+    def run(self, folder_path):
+        self.started = time.perf_counter()
+        in_flight = set()
+        # Bounded submission: enumeration never runs far ahead of the workers
+        max_in_flight = self.workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="lockdown") as pool:
+            def submit(fn, *args, size):
+                nonlocal in_flight
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                future = pool.submit(fn, *args)
+                future.add_done_callback(lambda f, size=size: self._done(f, size))
+                in_flight.add(future)
+
+            def submit_wipes(sealed):
+                if sealed:
+                    pack_path, sources = sealed
+                    for path, size in sources:
+                        submit(self._wipe_backed_up, path, pack_path, size=size)
+
+            for path, size in prioritized(self._counted(iter_files(folder_path))):
+                backup = None
+                if self.shadow is not None and not path.endswith(WIPE_SUFFIX):
+                    backup = self.shadow.current(path)
+                if backup is not None:
+                    self.stats["already_backed_up"] += 1
+                    submit(self._wipe_backed_up, path, backup, size=size)
+                elif self.packer is not None and self.packer.accepts(size) and not path.endswith(WIPE_SUFFIX):
+                    submit_wipes(self._pack(path, size))
+                else:
+                    submit(self._process, path, size, size=size)
+            if self.packer is not None:
+                submit_wipes(self.packer.seal())
+            wait(in_flight)
+
+        self._maybe_report(force=True)
+        self.stats["seconds"] = time.perf_counter() - self.started
+        return dict(self.stats)
@@ -0,0 +1,61 @@
+import os
+import pickle
+import sys
+from utils import wipe
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+face_verify = lazy_import("face_auth.recognize_face")
+voice_verify = lazy_import("voice_auth.voice_verify")
+gmm_lib = lazy_import("voice_auth.gmm")
+
+
+# === Pickle → Model File Migration ===
+# python -m utils.migrate_models [--remove-legacy]
+# Converts face_encodings.pkl and voiceprint.gmm (sklearn GaussianMixture) to the
+# pickle-free model format, checks that the converted model scores the same, and
+# with --remove-legacy securely wipes the old pickles. Only run it on pickles
+# this installation wrote: unpickling executes whatever the file contains.
+def migrate_face(remove_legacy=False):
+    legacy = face_verify.LEGACY_ENCODINGS_FILE
+    if not os.path.exists(legacy):
+        return False
+    with open(legacy, "rb") as f:
+        encoding = np.asarray(pickle.load(f), dtype=np.float64)
+    face_verify.save_encoding(encoding)
+    if not np.array_equal(face_verify.load_saved_encoding(), encoding):
+        raise RuntimeError("Converted face encoding does not match the pickle")
+    print(f"✅ {legacy} → {face_verify.ENCODINGS_FILE}")
+    if remove_legacy:
+        wipe.wipe_file(legacy)
+    return True
+
+
+def migrate_voice(remove_legacy=False):
+    legacy = voice_verify.LEGACY_VOICE_MODEL_FILE
+    if not os.path.exists(legacy):
+        return False
+    with open(legacy, "rb") as f:
+        sklearn_gmm = pickle.load(f)
+    gmm_lib.DiagonalGMM.from_sklearn(sklearn_gmm).save(voice_verify.VOICE_MODEL_FILE)
+
+    # Same scores as sklearn on points spread around the model
+    converted = gmm_lib.DiagonalGMM.load(voice_verify.VOICE_MODEL_FILE)
+    rng = np.random.default_rng(0)
+    probe = sklearn_gmm.means_[rng.integers(len(sklearn_gmm.means_), size=64)]
+    probe = probe + rng.normal(scale=np.sqrt(sklearn_gmm.covariances_.mean()), size=probe.shape)
+    if not np.allclose(converted.score_samples(probe), sklearn_gmm.score_samples(probe), rtol=1e-9, atol=1e-9):
+        raise RuntimeError("Converted voice model does not score like the pickle")
+    print(f"✅ {legacy} → {voice_verify.VOICE_MODEL_FILE}")
+    if remove_legacy:
+        wipe.wipe_file(legacy)
+    return True
+
+
+if __name__ == "__main__":
+    remove_legacy = "--remove-legacy" in sys.argv
+    migrated = [migrate_face(remove_legacy), migrate_voice(remove_legacy)]
+    if not any(migrated):
+        print("Nothing to migrate: no legacy pickles found.")
+    elif remove_legacy:
+        print("🧹 Legacy pickles wiped.")
@@ -0,0 +1,83 @@
+import json
+import os
+import struct
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# === Model File Format (v1) ===
+# header:  MAGIC(8) | version u8 | index length u32 | index (JSON)
+# body:    raw little-endian arrays, each starting on a 64-byte boundary
+#
+# The JSON index names the model kind, free-form metadata and every array's
+# dtype, shape and offset. Nothing is ever unpickled, and load() maps the
+# arrays straight from the file.
+MAGIC = b"SAOSMDL\x00"
+VERSION = 1
+HEADER = struct.Struct(">8sBI")
+ALIGN = 64
+
+
+class ModelFormatError(Exception):
+    pass
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def is_model_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save(path, kind, arrays, meta=None):
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    index = []
+    offset = 0
+    for name, a in arrays.items():
+        offset = _aligned(offset)
+        index.append({"name": name, "dtype": a.dtype.newbyteorder("<").str, "shape": list(a.shape), "offset": offset})
+        offset += a.nbytes
+    header = json.dumps({"kind": kind, "meta": meta or {}, "arrays": index}).encode()
+    data_start = _aligned(HEADER.size + len(header))
+
+    # Side file + rename, so a crash never leaves a half-written model behind
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(header)) + header)
+        for entry, a in zip(index, arrays.values()):
+            f.seek(data_start + entry["offset"])
+            f.write(a.astype(entry["dtype"], copy=False).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+def load(path, kind=None, mmap=True):
+    # Returns ({name: array}, meta). Arrays are read-only views of the mapped file.
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+        if len(raw) != HEADER.size:
+            raise ModelFormatError(f"{path}: file too short to be a model file")
+        magic, version, header_len = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ModelFormatError(f"{path}: not a model file")
+        if version != VERSION:
+            raise ModelFormatError(f"{path}: unsupported model format version {version}")
+        header = json.loads(f.read(header_len))
+    if kind is not None and header["kind"] != kind:
+        raise ModelFormatError(f"{path}: expected a {kind} model, found {header['kind']}")
+
+    data_start = _aligned(HEADER.size + header_len)
+    buf = np.memmap(path, dtype=np.uint8, mode="r") if mmap else np.fromfile(path, dtype=np.uint8)
+    arrays = {}
+    for entry in header["arrays"]:
+        dtype = np.dtype(entry["dtype"])
+        start = data_start + entry["offset"]
+        nbytes = dtype.itemsize * int(np.prod(entry["shape"], dtype=np.int64))
+        if start + nbytes > len(buf):
+            raise ModelFormatError(f"{path}: array {entry['name']} is truncated")
+        arrays[entry["name"]] = buf[start:start + nbytes].view(dtype).reshape(entry["shape"])
+    return arrays, header["meta"]
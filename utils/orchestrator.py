@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.lazy import lazy_import
+from utils import session, trace
+from utils.tts import speak
+
+face_verify = lazy_import("face_auth.recognize_face")
+voice_verify = lazy_import("voice_auth.voice_verify")
+phrase_match = lazy_import("voice_auth.phrase_match")
+
+
+# === Concurrent Face + Voice Verification ===
+# The camera runs on the calling thread (so its preview window keeps working)
+# while the microphone runs on a worker. Prompts are paced by the speech queue
+# instead of fixed sleeps. A failed face cancels the voice; a voice that runs
+# out of attempts does not cancel the face, so the lockdown below still applies.
+# Voice attempts share the persisted per-identity count (utils/.failures) with
+# the sequential flows and the daemon's terminal sessions.
+#
+# The decision policy is the same as the sequential flow:
+#   - face fails                          -> denied, no lockdown
+#   - face passes, voice fails 3 attempts -> denied, lockdown
+#   - both pass                           -> granted
+@trace.traced("auth.concurrent")
+def verify_concurrently(pipelined=False, saved_encoding=None, gmm_model=None, saved_phrase=None,
+                        phrase_templates=None):
+    if gmm_model is None or saved_phrase is None:
+        gmm_model, saved_phrase = voice_verify.load_voice_models()
+    if phrase_templates is None:
+        phrase_templates = phrase_match.load_templates()
+
+    cancel = threading.Event()
+    timings = {}
+    start = time.perf_counter()
+
+    def voice_task():
+        try:
+            for attempt in range(session.failures() + 1, voice_verify.MAX_ATTEMPTS + 1):
+                if cancel.is_set():
+                    return None
+                print(f"\n🔁 Voice attempt {attempt} of {voice_verify.MAX_ATTEMPTS}")
+                speak(f"Attempt {attempt} of {voice_verify.MAX_ATTEMPTS}", wait=False, key="attempt", cache=True)
+                on_accept = voice_verify.adapt_voiceprint if voice_verify.ADAPT_ON_LOGIN else None
+                result = voice_verify.voice_attempt(gmm_model, saved_phrase, phrase_templates,
+                                                    cancel_event=cancel, settle_seconds=0, on_accept=on_accept)
+                if result:
+                    session.clear_failures()
+                    return True
+                # A scored rejection counts even if the face failed meanwhile
+                if result is False or not cancel.is_set():
+                    session.record_failure()
+                if cancel.is_set():
+                    return None
+                if result is not None:
+                    print("❌ Voice verification failed.")
+                    speak("Verification failed.", wait=False, key="status", cache=True)
+            # Out of attempts. The camera is left to finish: a face that still matches
+            # means a lockdown, so holding the face back cannot dodge it
+            return False
+        finally:
+            timings["voice"] = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="voice") as pool:
+        voice_future = pool.submit(voice_task)
+
+        try:
+            face_result = face_verify.verify_face(pipelined=pipelined, saved_encoding=saved_encoding,
+                                                  cancel_event=cancel)
+        except Exception:
+            cancel.set()
+            raise
+        timings["face"] = time.perf_counter() - start
+
+        if not face_result:
+            print("❌ Face authentication failed.")
+            cancel.set()
+        voice_result = voice_future.result()
+
+    timings["total"] = time.perf_counter() - start
+
+    granted = bool(face_result and voice_result)
+    lockdown = bool(face_result) and voice_result is False
+    print(f"⏱ Face {timings['face']:.2f}s | Voice {timings['voice']:.2f}s | Total {timings['total']:.2f}s")
+    return {"granted": granted, "face": face_result, "voice": voice_result,
+            "lockdown": lockdown, "timings": timings}
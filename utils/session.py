@@ -0,0 +1,268 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads in one process are serialized
+    fcntl = None
+
+# === Session Configuration ===
+# A successful verification issues a signed, short-lived token, so protected
+# actions later in the same session check an HMAC instead of rerunning the
+# camera and microphone. The token expires at a fixed deadline (TTL) or once it
+# has gone unused for IDLE_TIMEOUT, and a lockdown or failed attempt revokes it.
+SESSION_KEY_FILE = "utils/.session_key"  # Per-install HMAC key; rotating it revokes every token
+SESSION_FILE = "utils/.session"  # The current token
+SESSION_TTL = int(os.environ.get("SECUREAUTH_SESSION_TTL", "900"))  # Seconds; 0 disables sessions
+IDLE_TIMEOUT = int(os.environ.get("SECUREAUTH_SESSION_IDLE", "300"))  # Seconds without use
+IDLE_REFRESH = 30  # The idle deadline is pushed back (token rewritten) at most this often
+TOKEN_VERSION = "v1"
+# Failed voice attempts outlive the run that made them: cancelling or closing
+# the window and starting again continues the count instead of resetting it.
+# A success or a lockdown clears it; attempts older than the window drop out.
+FAILURES_FILE = "utils/.failures"
+FAILURES_LOCK_FILE = "utils/.failures.lock"  # flock'd around every update: main_1.py and the daemon both write
+FAILURE_WINDOW = int(os.environ.get("SECUREAUTH_FAILURE_WINDOW", "3600"))  # Seconds
+
+# Factors in the order they are asked for, and how many of them each kind of
+# operation needs: a low-risk action is allowed after one factor, a high-risk
+# one needs both. A one-factor session is stepped up by asking for the rest.
+FACTORS = ("face", "voice")
+RISK_FACTORS = {"low": 1, "high": 2}
+
+_key = None
+_failures_lock = threading.Lock()
+
+
+# === Key ===
+def _load_key():
+    global _key
+    if _key is None:
+        if os.path.exists(SESSION_KEY_FILE):
+            with open(SESSION_KEY_FILE, "rb") as f:
+                _key = f.read()
+        else:
+            _key = rotate_key()
+    return _key
+
+
+def rotate_key():
+    # New random key: every token signed with the old one stops verifying
+    global _key
+    _key = secrets.token_bytes(32)
+    _write_private(SESSION_KEY_FILE, _key)
+    return _key
+
+
+def _write_private(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Per process and thread, so concurrent writers never share a side file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# === Tokens ===
+# "v1.<base64url JSON claims>.<base64url HMAC-SHA256>". Claims: sid, sub,
+# factors, iat, exp (absolute) and idle (deadline for the next use).
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(claims):
+    body = f"{TOKEN_VERSION}.{_b64(json.dumps(claims, separators=(',', ':')).encode('utf-8'))}"
+    mac = hmac.new(_load_key(), body.encode("ascii"), hashlib.sha256).digest()
+    return f"{body}.{_b64(mac)}"
+
+
+def _decode(token):
+    # Claims if the signature is genuine (constant-time compare), otherwise None.
+    # Expiry is not checked here.
+    try:
+        body, mac = token.rsplit(".", 1)
+        expected = hmac.new(_load_key(), body.encode("ascii"), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _unb64(mac)):
+            return None
+        version, payload = body.split(".", 1)
+        if version != TOKEN_VERSION:
+            return None
+        return json.loads(_unb64(payload))
+    except (ValueError, UnicodeError):
+        return None
+
+
+def issue(factors, subject="owner", claims=None):
+    # Sign and store a token for the verified factors. Passing the current
+    # claims (step-up) keeps the session id and absolute expiry: adding a factor
+    # does not extend the session.
+    if SESSION_TTL <= 0:
+        return None
+    now = int(time.time())
+    claims = dict(claims) if claims else {"sid": secrets.token_hex(8), "sub": subject, "iat": now,
+                                          "exp": now + SESSION_TTL}
+    claims["factors"] = sorted(set(claims.get("factors", ())) | set(factors))
+    claims["idle"] = min(now + IDLE_TIMEOUT, claims["exp"])
+    token = _sign(claims)
+    _write_private(SESSION_FILE, token.encode("ascii"))
+    return token
+
+
+def current(token=None, now=None):
+    # Claims of a genuine, unexpired token (the stored one by default), or None
+    if SESSION_TTL <= 0:
+        return None
+    if token is None:
+        try:
+            with open(SESSION_FILE, "r", encoding="ascii") as f:
+                token = f.read().strip()
+        except (OSError, UnicodeError):
+            return None
+    claims = _decode(token)
+    if claims is None:
+        return None
+    now = time.time() if now is None else now
+    if now >= claims["exp"] or now >= claims["idle"]:
+        return None
+    return claims
+
+
+def check(risk="high", token=None):
+    # Claims if the session covers an operation of this risk level, else None.
+    # A hit also counts as activity for the idle timeout.
+    claims = current(token)
+    if claims is None or len(set(claims["factors"]) & set(FACTORS)) < RISK_FACTORS[risk]:
+        return None
+    now = int(time.time())
+    if claims["idle"] - now < IDLE_TIMEOUT - IDLE_REFRESH and claims["idle"] < claims["exp"]:
+        issue((), claims=claims)
+    return claims
+
+
+def missing_factors(risk="high"):
+    # Factors still to verify for this risk level, given the current session
+    claims = current()
+    held = set(claims["factors"]) if claims else set()
+    needed = [f for f in FACTORS if f not in held]
+    return needed[:max(RISK_FACTORS[risk] - len(held & set(FACTORS)), 0)]
+
+
+def step_up(risk, verify_factor):
+    # Run only the factors the session lacks (verify_factor(name) -> bool) and
+    # extend the token with them. True when the operation may go ahead.
+    if check(risk) is not None:
+        return True
+    for factor in missing_factors(risk):
+        if not verify_factor(factor):
+            revoke()
+            return False
+        issue((factor,), claims=current())
+    return True
+
+
+def revoke():
+    try:
+        os.remove(SESSION_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def revoke_all():
+    # Lockdown: also invalidates copies of the token made elsewhere
+    revoke()
+    rotate_key()
+    clear_failures(subject=None)
+
+
+def remaining(claims, now=None):
+    # Seconds until the token expires, whichever deadline comes first
+    now = time.time() if now is None else now
+    return max(0, int(min(claims["exp"], claims["idle"]) - now))
+
+
+# === Failed Attempts ===
+@contextmanager
+def _failures_locked():
+    # Read-modify-write of FAILURES_FILE, exclusive across threads and processes
+    with _failures_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(FAILURES_LOCK_FILE), exist_ok=True)
+        fd = os.open(FAILURES_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # Releases the flock
+
+
+def _load_failures(now):
+    try:
+        with open(FAILURES_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {subject: [t for t in times if now - t < FAILURE_WINDOW] for subject, times in data.items()}
+
+
+def failures(subject="owner", now=None):
+    # Failed attempts for this subject still inside the window
+    now = time.time() if now is None else now
+    with _failures_locked():
+        return len(_load_failures(now).get(subject, []))
+
+
+def record_failure(subject="owner", now=None):
+    # Returns the count including this one
+    now = time.time() if now is None else now
+    with _failures_locked():
+        data = _load_failures(now)
+        data.setdefault(subject, []).append(now)
+        _write_private(FAILURES_FILE, json.dumps(data).encode())
+        return len(data[subject])
+
+
+def clear_failures(subject="owner"):
+    # subject=None clears every subject
+    with _failures_locked():
+        data = {} if subject is None else _load_failures(time.time())
+        data.pop(subject, None)
+        if data:
+            _write_private(FAILURES_FILE, json.dumps(data).encode())
+        elif os.path.exists(FAILURES_FILE):
+            os.remove(FAILURES_FILE)
+
+
+# === CLI ===
+# python -m utils.session status | revoke | revoke-all
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "status":
+        claims = current()
+        if claims is None:
+            print("🔒 No active session.")
+        else:
+            print(f"🔓 Session {claims['sid']} ({', '.join(claims['factors'])}), "
+                  f"expires in {remaining(claims)}s")
+    elif command == "revoke":
+        revoke()
+        print("🔒 Session revoked.")
+    elif command == "revoke-all":
+        revoke_all()
+        print("🔒 Session key rotated; all issued tokens are invalid.")
+    else:
+        sys.exit("Usage: python -m utils.session [status|revoke|revoke-all]")
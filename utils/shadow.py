@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from utils import trace
+from utils.lockdown import WIPE_SUFFIX, iter_files
+
+# === Shadow Encryption ===
+# Keeps the .enc copies in .encrypted_backups current while the protected files
+# change, so a lockdown finds them already backed up and only has to wipe.
+# A change-detection index records each file's mtime, size and a keyed content
+# hash when its backup was written:
+#   - same mtime and size      -> skipped without reading the file
+#   - new mtime, same content  -> index updated, nothing re-encrypted
+#   - new content              -> re-encrypted
+# Lockdown trusts a backup only if the file's mtime and size still match the
+# index at that moment; anything else is encrypted then, as before.
+ENABLED = os.environ.get("SECUREAUTH_SHADOW") == "1"  # auth_daemon.py runs a protector while it is up
+SHADOW_INTERVAL = float(os.environ.get("SECUREAUTH_SHADOW_INTERVAL", "30"))  # Seconds between sync passes
+INDEX_NAME = ".shadow_index.json"
+STOP_NAME = ".shadow_stop"  # Written by a lockdown in any process; protectors halt until `resume`
+STAGE_SUFFIX = ".shadow"  # Backups are written beside the .enc and only published if the file is still there
+INDEX_VERSION = 1
+HASH_BUFFER = 1024 * 1024
+
+_protectors = []  # Running in this process; a lockdown stops them before wiping
+# Protectors in other processes (the auth daemon) see the stop file instead; they
+# check it before every file and again before publishing a backup.
+
+
+def _hash_key(master_key):
+    # Content hashes are keyed, so the index does not reveal what the files contain
+    return hashlib.sha256(b"secureauthos shadow v1" + master_key).digest()
+
+
+def content_hash(path, hash_key):
+    h = hashlib.blake2b(key=hash_key, digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BUFFER)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+# === Change-Detection Index ===
+class ShadowIndex:
+    def __init__(self, encrypted_dir):
+        self.path = os.path.join(encrypted_dir, INDEX_NAME)
+        self.files = {}  # source path -> [mtime_ns, size, content hash, .enc path]
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.files = data["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        with self.lock:
+            data = json.dumps({"version": INDEX_VERSION, "files": self.files}, separators=(",", ":"))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".part"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def current(self, path):
+        # The .enc path if the backup still matches the file on disk, else None (one stat)
+        entry = self.files.get(os.path.normpath(path))
+        if entry is None:
+            return None
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return None
+        if st.st_mtime_ns != entry[0] or st.st_size != entry[1] or not os.path.exists(entry[3]):
+            return None
+        return entry[3]
+
+
+# === Sync ===
+class ShadowProtector:
+    def __init__(self, folder_path, master_key, encrypt_file, encrypted_dir, interval=SHADOW_INTERVAL):
+        self.folder_path = os.fspath(folder_path)
+        self.key = master_key
+        self.hash_key = _hash_key(master_key)
+        self.encrypt_file = encrypt_file
+        self.index = ShadowIndex(encrypted_dir)
+        self.stop_path = os.path.join(encrypted_dir, STOP_NAME)
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def stopped(self):
+        if not self.stop_event.is_set() and os.path.exists(self.stop_path):
+            self.stop_event.set()  # A lockdown ran, possibly in another process
+        return self.stop_event.is_set()
+
+    def _backup(self, path, st):
+        # Returns "unchanged", "touched", "encrypted" or "stopped"
+        key = os.path.normpath(path)
+        entry = self.index.files.get(key)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size and os.path.exists(entry[3]):
+            return "unchanged"
+        digest = content_hash(path, self.hash_key)
+        if entry and entry[1] == st.st_size and entry[2] == digest and os.path.exists(entry[3]):
+            enc_path = entry[3]
+            outcome = "touched"
+        else:
+            if self.stopped():
+                return "stopped"
+            staged = self.encrypt_file(path, self.key, STAGE_SUFFIX)
+            enc_path = staged[:-len(STAGE_SUFFIX)]
+            # A lockdown that took the file meanwhile (renamed it to *.wiping) owns
+            # its .enc now: the backup it wrote or trusted is never replaced
+            if self.stopped() or os.path.lexists(path + WIPE_SUFFIX) or not os.path.lexists(path):
+                os.remove(staged)
+                return "stopped"
+            os.replace(staged, enc_path)
+            outcome = "encrypted"
+        # Recorded only if the file did not change while it was hashed or encrypted;
+        # otherwise the next pass picks it up
+        after = os.stat(path, follow_symlinks=False)
+        if after.st_mtime_ns == st.st_mtime_ns and after.st_size == st.st_size:
+            with self.index.lock:
+                self.index.files[key] = [st.st_mtime_ns, st.st_size, digest, enc_path]
+        return outcome
+
+    @trace.traced("crypto.shadow_sync")
+    def sync(self):
+        # One pass over the folder; returns counts per outcome
+        stats = {"unchanged": 0, "touched": 0, "encrypted": 0, "stopped": 0, "removed": 0, "errors": 0, "bytes": 0}
+        seen = set()
+        t0 = time.perf_counter()
+        for path, _ in iter_files(self.folder_path):
+            if self.stopped():
+                break
+            if path.endswith(WIPE_SUFFIX):
+                continue
+            seen.add(os.path.normpath(path))
+            try:
+                st = os.stat(path, follow_symlinks=False)
+                outcome = self._backup(path, st)
+            except OSError:
+                stats["errors"] += 1
+                continue
+            stats[outcome] += 1
+            if outcome == "encrypted":
+                stats["bytes"] += st.st_size
+
+        # Files gone from the protected folder leave the index. Their .enc copies
+        # stay: after a lockdown (possibly in another process) they are the only copy.
+        if not self.stop_event.is_set():
+            for key in [k for k in self.index.files if k not in seen]:
+                del self.index.files[key]
+                stats["removed"] += 1
+
+        if stats["touched"] or stats["encrypted"] or stats["removed"]:
+            self.index.save()
+        stats["seconds"] = time.perf_counter() - t0
+        return stats
+
+    def _run(self):
+        while not self.stopped():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"⚠️ Shadow sync failed: {e}")
+            self.stop_event.wait(self.interval)
+        if os.path.exists(self.stop_path):
+            print("🛑 Shadow encryption stopped by a lockdown. After restoring, run: python -m utils.shadow resume")
+
+    def start(self):
+        # The index file marks shadow encryption as in use (see stop_all), from the
+        # start and not only after the first pass has saved something
+        if not os.path.exists(self.index.path):
+            self.index.save()
+        self.thread = threading.Thread(target=self._run, name="shadow", daemon=True)
+        self.thread.start()
+        _protectors.append(self)
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+
+def request_stop(encrypted_dir):
+    # Halts protectors in every process, not just this one
+    os.makedirs(encrypted_dir, exist_ok=True)
+    with open(os.path.join(encrypted_dir, STOP_NAME), "w", encoding="utf-8") as f:
+        f.write(f"{time.time():.0f}\n")
+
+
+def resume(encrypted_dir):
+    path = os.path.join(encrypted_dir, STOP_NAME)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def stop_all(encrypted_dir=None):
+    # The stop file is only written where shadow encryption is in use (enabled
+    # here, running here, or an index left by a protector in any process), so a
+    # lockdown on an install that never used it does not block turning it on later
+    if encrypted_dir is not None and (ENABLED or _protectors
+                                      or os.path.exists(os.path.join(encrypted_dir, INDEX_NAME))):
+        request_stop(encrypted_dir)
+    while _protectors:
+        _protectors.pop().stop()
+
+
+def load_index(encrypted_dir):
+    # For the lockdown: the index if a protector has ever run, else None
+    index = ShadowIndex(encrypted_dir)
+    return index if index.files else None
+
+
+# === CLI ===
+# python -m utils.shadow sync          one pass, then exit
+# python -m utils.shadow watch         keep syncing every SECUREAUTH_SHADOW_INTERVAL seconds
+# python -m utils.shadow resume        allow protectors again after a lockdown stopped them
+# (auth_daemon.py runs the same loop when SECUREAUTH_SHADOW=1)
+if __name__ == "__main__":
+    from utils.encryption import ENCRYPTED_DIR, encrypt_file, load_key
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    folder = sys.argv[2] if len(sys.argv) > 2 else "secure_files"
+    if command == "resume":
+        resume(ENCRYPTED_DIR)
+        print("🛡 Shadow encryption may run again")
+        sys.exit(0)
+    protector = ShadowProtector(folder, load_key(), encrypt_file, ENCRYPTED_DIR)
+    if command == "sync":
+        stats = protector.sync()
+        print(f"🛡 {stats['encrypted']} encrypted ({stats['bytes'] / 1e6:.1f} MB), {stats['touched']} touched, "
+              f"{stats['unchanged']} unchanged, {stats['removed']} removed, {stats['errors']} errors "
+              f"in {stats['seconds']:.2f}s")
+    elif command == "watch":
+        print(f"🛡 Shadow-encrypting {folder} every {protector.interval:.0f}s (Ctrl+C to stop)")
+        protector.start()
+        try:
+            while protector.thread.is_alive():
+                protector.thread.join(1.0)
+        except KeyboardInterrupt:
+            protector.stop()
+    else:
+        print("Usage: python -m utils.shadow sync|watch|resume [folder]")
+        sys.exit(2)
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from utils.lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+pyaudio = lazy_import("pyaudio")
+sd = lazy_import("sounddevice")
+features = lazy_import("voice_auth.features")
+
+# === Capture Configuration ===
+# The webcam, microphone and keyboard are always used, whatever the environment:
+# a verification fed from files would accept a replayed face and voice. Only an
+# explicit test or benchmark entry point (benchmarks/bench_e2e.py) swaps in
+# recordings, through use_replay(), so the full flows run deterministically on
+# a machine with no camera, microphone or terminal.
+CAMERA_SOURCE = "0"  # Device index, video file or image directory
+MIC_SOURCE = ""  # WAV file or directory of WAVs, one per recording
+ANSWERS_FILE = ""  # One typed answer per line, in place of input()
+REALTIME = False  # Pace replays like live devices
+HEADLESS = os.environ.get("SECUREAUTH_HEADLESS") == "1"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+REPLAY_PASSES = 3  # A replayed camera loops this many times, so retry loops end instead of spinning
+DEFAULT_FPS = 30.0
+
+
+def use_replay(camera=None, mic=None, answers=None, realtime=False):
+    # Test/benchmark harnesses only; nothing in main.py, main_1.py or the daemon calls this
+    global CAMERA_SOURCE, MIC_SOURCE, ANSWERS_FILE, REALTIME, _answers, _replay_cursor
+    CAMERA_SOURCE = camera or "0"
+    MIC_SOURCE = mic or ""
+    ANSWERS_FILE = answers or ""
+    REALTIME = realtime
+    _answers, _replay_cursor = None, 0
+
+
+def is_replay():
+    return not CAMERA_SOURCE.isdigit() or bool(MIC_SOURCE)
+
+
+def show_preview():
+    # Preview windows need a display; replays and headless runs skip them
+    return not HEADLESS and CAMERA_SOURCE.isdigit()
+
+
+# === Frames ===
+class ReplayCamera:
+    # cv2.VideoCapture look-alike over a video file or a directory of images
+    def __init__(self, path, realtime=None, passes=REPLAY_PASSES):
+        self.path = path
+        self.passes = passes
+        self.cap = None
+        self.images = None
+        self.index = 0
+        self.loops = 0
+        if os.path.isdir(path):
+            names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+            # Decoded once: a camera hands over raw frames, it does not decode JPEGs
+            self.images = [cv2.imread(os.path.join(path, n)) for n in names]
+            fps = DEFAULT_FPS
+        else:
+            self.cap = cv2.VideoCapture(path)
+            fps = self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        self.interval = 1.0 / fps if (REALTIME if realtime is None else realtime) else 0.0
+        self.next_frame_at = None
+
+    def isOpened(self):
+        return bool(self.images) if self.cap is None else self.cap.isOpened()
+
+    def read(self):
+        if self.interval:
+            now = time.perf_counter()
+            if self.next_frame_at is not None and now < self.next_frame_at:
+                time.sleep(self.next_frame_at - now)
+            self.next_frame_at = max(now, self.next_frame_at or now) + self.interval
+
+        while self.loops < self.passes:
+            if self.images is not None:
+                if self.index < len(self.images):
+                    self.index += 1
+                    return True, self.images[self.index - 1].copy()
+            else:
+                ok, frame = self.cap.read()
+                if ok:
+                    return True, frame
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.index = 0
+            self.loops += 1
+        return False, None
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+def open_camera(realtime=None):
+    # A cv2.VideoCapture, or a ReplayCamera when use_replay() named a recording
+    if CAMERA_SOURCE.isdigit():
+        return cv2.VideoCapture(int(CAMERA_SOURCE))
+    return ReplayCamera(CAMERA_SOURCE, REALTIME if realtime is None else realtime)
+
+
+# === Audio ===
+# Sources hand out int16 mono samples: read(n) blocks for n samples like a
+# microphone would. Each replayed recording takes the next WAV in sorted order.
+class PyAudioMicrophone:
+    def __init__(self, rate, channels, chunk):
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(format=pyaudio.paInt16, channels=channels,
+                                      rate=rate, input=True, frames_per_buffer=chunk)
+
+    def read(self, n):
+        return np.frombuffer(self.stream.read(n), dtype=np.int16)
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+        self.audio.terminate()
+
+
+class SoundDeviceMicrophone:
+    # One input stream for the whole take, so consecutive chunked reads (the
+    # endpointer reads 1024 samples at a time) leave no gaps between them
+    def __init__(self, rate, channels):
+        self.stream = sd.InputStream(samplerate=rate, channels=channels, dtype='int16')
+        self.stream.start()
+
+    def read(self, n):
+        audio, _ = self.stream.read(n)
+        return audio.reshape(-1)
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+class ReplayMicrophone:
+    def __init__(self, path, rate, realtime=None):
+        y = features.load_wav(path, rate)
+        self.samples = np.clip(np.rint(y * 32768.0), -32768, 32767).astype(np.int16)
+        self.rate = rate
+        self.realtime = REALTIME if realtime is None else realtime
+        self.position = 0
+
+    def read(self, n):
+        chunk = self.samples[self.position:self.position + n]
+        self.position += n
+        if len(chunk) < n:
+            chunk = np.concatenate([chunk, np.zeros(n - len(chunk), dtype=np.int16)])  # Silence after the end
+        if self.realtime:
+            time.sleep(n / self.rate)
+        return chunk
+
+    def close(self):
+        pass
+
+
+_replay_lock = threading.Lock()
+_replay_cursor = 0
+
+
+def _next_recording():
+    global _replay_cursor
+    if os.path.isdir(MIC_SOURCE):
+        paths = sorted(os.path.join(MIC_SOURCE, n) for n in os.listdir(MIC_SOURCE) if n.lower().endswith(".wav"))
+    else:
+        paths = [MIC_SOURCE]
+    if not paths:
+        raise FileNotFoundError(f"No WAV files to replay in {MIC_SOURCE}")
+    with _replay_lock:
+        path = paths[_replay_cursor % len(paths)]
+        _replay_cursor += 1
+    return path
+
+
+def open_microphone(rate, channels=1, chunk=1024, backend="pyaudio"):
+    if MIC_SOURCE:
+        return ReplayMicrophone(_next_recording(), rate)
+    if backend == "sounddevice":
+        return SoundDeviceMicrophone(rate, channels)
+    return PyAudioMicrophone(rate, channels, chunk)
+
+
+# === Typed Answers ===
+_answers = None
+
+
+def ask(prompt):
+    # input(), or the next line of the use_replay() answers file (echoed so logs read the same)
+    global _answers
+    if not ANSWERS_FILE:
+        return input(prompt)
+    if _answers is None:
+        with open(ANSWERS_FILE, "r", encoding="utf-8") as f:
+            _answers = [line.rstrip("\n") for line in f]
+    if not _answers:
+        raise EOFError("No scripted answers left")
+    answer = _answers.pop(0)
+    print(prompt + answer)
+    return answer
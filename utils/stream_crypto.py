@@ -0,0 +1,141 @@
+import base64
+import os
+import struct
+import sys
+from utils.lazy import lazy_import
+
+aead = lazy_import("cryptography.hazmat.primitives.ciphers.aead")
+hkdf = lazy_import("cryptography.hazmat.primitives.kdf.hkdf")
+hashes = lazy_import("cryptography.hazmat.primitives.hashes")
+
+# === Chunked Container Format (v1) ===
+# header:  MAGIC(8) | version u8 | chunk_size u32 | salt(16)
+# body:    AES-256-GCM chunks of chunk_size plaintext bytes, each followed by a 16-byte tag
+#
+# The per-file key is HKDF(master key, salt), so counters can be used as nonces:
+# nonce = chunk index (11 bytes) | final flag (1 byte). The header is the AAD of
+# every chunk, reordering or dropping chunks breaks the nonce sequence, and
+# truncation is caught because the last chunk must carry the final flag.
+MAGIC = b"SAOSENC\x00"
+VERSION = 1
+HEADER = struct.Struct(">8sBI16s")
+TAG_SIZE = 16
+CHUNK_SIZE = 1024 * 1024  # Plaintext bytes per chunk; peak memory is a few of these
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+class ContainerError(Exception):
+    pass
+
+
+def _file_key(master_key, salt):
+    # master_key is the Fernet key from utils/.secretkey (urlsafe base64 of 32 bytes)
+    raw = base64.urlsafe_b64decode(master_key)
+    kdf = hkdf.HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"secureauthos stream v1")
+    return kdf.derive(raw)
+
+
+def _nonce(index, final):
+    return index.to_bytes(11, "big") + (b"\x01" if final else b"\x00")
+
+
+def is_container(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def encrypt_stream(src, dst, master_key, chunk_size=CHUNK_SIZE):
+    # src/dst are binary file objects; memory use is bounded by two chunks
+    salt = os.urandom(16)
+    header = HEADER.pack(MAGIC, VERSION, chunk_size, salt)
+    cipher = aead.AESGCM(_file_key(master_key, salt))
+    dst.write(header)
+
+    index = 0
+    chunk = src.read(chunk_size)
+    while True:
+        # Read one chunk ahead so the last chunk can be flagged as final
+        following = src.read(chunk_size) if len(chunk) == chunk_size else b""
+        final = not following
+        dst.write(cipher.encrypt(_nonce(index, final), chunk, header))
+        if final:
+            return index + 1
+        chunk = following
+        index += 1
+
+
+def decrypt_stream(src, dst, master_key):
+    header = src.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise ContainerError("File too short to be an encrypted container")
+    magic, version, chunk_size, salt = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ContainerError("Not an encrypted container")
+    if version != VERSION:
+        raise ContainerError(f"Unsupported container version {version}")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ContainerError("Corrupt container header")
+    cipher = aead.AESGCM(_file_key(master_key, salt))
+
+    index = 0
+    record_size = chunk_size + TAG_SIZE
+    record = src.read(record_size)
+    while True:
+        following = src.read(record_size) if len(record) == record_size else b""
+        final = not following
+        try:
+            dst.write(cipher.decrypt(_nonce(index, final), record, header))
+        except Exception:
+            raise ContainerError(f"Chunk {index} failed authentication (tampered or truncated file)")
+        if final:
+            return index + 1
+        record = following
+        index += 1
+
+
+def encrypt_path(src_path, dst_path, master_key, chunk_size=CHUNK_SIZE):
+    # Written to a side file and renamed, so a crash never leaves a half container at dst_path
+    tmp_path = dst_path + ".part"
+    with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+        encrypt_stream(src, dst, master_key, chunk_size)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, dst_path)
+    return dst_path
+
+
+def decrypt_path(src_path, dst_path, master_key):
+    tmp_path = dst_path + ".part"
+    try:
+        with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+            decrypt_stream(src, dst, master_key)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, dst_path)
+    return dst_path
+
+
+# === Decrypt Tool ===
+# python -m utils.stream_crypto decrypt <file.enc> <output>
+# Handles both the chunked container and the legacy whole-file Fernet format.
+if __name__ == "__main__":
+    from utils.encryption import load_key, fernet_lib
+
+    if len(sys.argv) != 4 or sys.argv[1] not in ("encrypt", "decrypt"):
+        print("Usage: python -m utils.stream_crypto encrypt|decrypt <input> <output>")
+        sys.exit(2)
+
+    command, input_path, output_path = sys.argv[1:]
+    key = load_key()
+    if command == "encrypt":
+        encrypt_path(input_path, output_path, key)
+    elif is_container(input_path):
+        decrypt_path(input_path, output_path, key)
+    else:
+        with open(input_path, "rb") as f:
+            data = fernet_lib.Fernet(key).decrypt(f.read())
+        with open(output_path, "wb") as f:
+            f.write(data)
+    print(f"✅ {command.capitalize()}ed {input_path} → {output_path}")
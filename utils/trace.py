@@ -0,0 +1,193 @@
+import atexit
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# === Tracing Configuration ===
+# Off unless SECUREAUTH_TRACE names an output file: "*.prom" gets a Prometheus
+# text-format snapshot of the per-stage histograms, anything else gets one JSON
+# line per span. When off, span() hands back a shared no-op and @traced returns
+# the function untouched, so instrumented code pays nothing.
+TRACE_FILE = os.environ.get("SECUREAUTH_TRACE", "")
+PROFILE_FILE = os.environ.get("SECUREAUTH_PROFILE", "")  # cProfile stats for one auth run
+ENABLED = bool(TRACE_FILE)
+PROMETHEUS = TRACE_FILE.endswith(".prom")
+FLUSH_EVERY = 256  # Spans buffered before the output file is written
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)  # Seconds
+METRIC = "secureauth_stage_seconds"
+
+
+# === Histograms and Export ===
+class Recorder:
+    def __init__(self, path, prometheus=False):
+        self.path = path
+        self.prometheus = prometheus
+        self.lock = threading.Lock()
+        self.histograms = {}  # stage -> [bucket counts..., sum, count]
+        self.lines = []
+        self.unflushed = 0
+
+    def record(self, name, seconds, parent=None, attrs=None):
+        with self.lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = [0] * len(BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+                    break
+            hist[-2] += seconds
+            hist[-1] += 1
+            if not self.prometheus:
+                event = {"ts": round(time.time() - seconds, 6), "span": name, "ms": round(seconds * 1000, 3),
+                         "parent": parent, "thread": threading.current_thread().name, "pid": os.getpid()}
+                if attrs:
+                    event.update(attrs)
+                self.lines.append(json.dumps(event, default=str))
+            self.unflushed += 1
+            if self.unflushed >= FLUSH_EVERY:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        self.unflushed = 0
+        if self.prometheus:
+            tmp = self.path + ".part"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, self.path)  # Scrapers never see a half-written file
+        elif self.lines:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(self.lines) + "\n")
+            self.lines = []
+
+    def prometheus_text(self):
+        out = [f"# HELP {METRIC} Time spent per authentication stage.", f"# TYPE {METRIC} histogram"]
+        for name, hist in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                out.append(f'{METRIC}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+            out.append(f'{METRIC}_sum{{stage="{name}"}} {hist[-2]:.6f}')
+            out.append(f'{METRIC}_count{{stage="{name}"}} {hist[-1]}')
+        return "\n".join(out) + "\n"
+
+    def summary(self):
+        # stage -> (count, total seconds), for printing at the end of a run
+        with self.lock:
+            return {name: (hist[-1], hist[-2]) for name, hist in self.histograms.items()}
+
+
+_recorder = Recorder(TRACE_FILE, PROMETHEUS) if ENABLED else None
+if _recorder is not None:
+    atexit.register(_recorder.flush)
+_local = threading.local()
+
+
+# === Spans ===
+class Span:
+    __slots__ = ("name", "attrs", "parent", "start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        # Attach results (scores, counts) to the span's JSON line
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        _local.stack.pop()
+        if exc_type is not None and not issubclass(exc_type, SystemExit):
+            self.attrs["error"] = exc_type.__name__
+        _recorder.record(self.name, elapsed, self.parent, self.attrs)
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = NullSpan()
+
+
+def span(name, **attrs):
+    # with trace.span("face.detect") as s: ...; s.set(faces=2)
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+
+def traced(name):
+    # Decorator: the whole call is one span. A no-op (same function) when tracing is off.
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(name, seconds, **attrs):
+    # A duration measured elsewhere (e.g. time blocked on a Future)
+    if ENABLED:
+        _recorder.record(name, seconds, None, attrs)
+
+
+def summary():
+    return _recorder.summary() if ENABLED else {}
+
+
+def flush():
+    if ENABLED:
+        _recorder.flush()
+
+
+# === Profiling ===
+@contextmanager
+def profiled(label):
+    # cProfile around one auth run when SECUREAUTH_PROFILE is set; inspect with
+    # `python -m pstats <file>` or snakeviz. Only the calling thread is profiled.
+    if not PROFILE_FILE:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(PROFILE_FILE)
+        print(f"🔬 Profile of {label} written to {PROFILE_FILE}")
@@ -1,12 +1,158 @@
 # utils/tts.py
-import pyttsx3
+import atexit
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from utils import trace
+from utils.lazy import lazy_import
 
-def speak(text: str):
-    try:
-        engine = pyttsx3.init()
-        engine.setProperty('rate', 150)  # Speed
-        engine.setProperty('volume', 0.9)
+pyttsx3 = lazy_import("pyttsx3")
+sd = lazy_import("sounddevice")
+wav = lazy_import("scipy.io.wavfile")
+
+TTS_MODE = os.environ.get("SECUREAUTH_TTS", "on")  # "off" = headless servers, prompts are silent no-ops
+CACHE_DIR = "utils/.tts_cache"
+RATE = 150  # Speed
+VOLUME = 0.9
+FLUSH_TIMEOUT = 10  # Seconds queued prompts may still play at exit
+
+
+# === Speech Engine ===
+# One pyttsx3 engine, created and used only on its own worker thread (engines
+# are not thread-safe). Callers either block on a prompt or fire and forget.
+class SpeechEngine:
+    def __init__(self, mode=TTS_MODE):
+        self.mode = mode
+        self.pending = deque()
+        self.cond = threading.Condition()
+        self.worker = None
+        self.engine = None
+        self.busy = False
+        # Written by the worker and by callers; every update and read holds self.cond
+        self.stats = {"spoken": 0, "dropped": 0, "cached_plays": 0, "blocked_seconds": 0.0, "speaking_seconds": 0.0}
+
+    def say(self, text, key=None, cache=False):
+        # Returns a Future resolved once the prompt has played (True) or been dropped (False)
+        future = Future()
+        if self.mode == "off":
+            future.set_result(True)
+            return future
+
+        with self.cond:
+            for item in list(self.pending):
+                # The same text already waiting: merge instead of saying it twice
+                if item["text"] == text:
+                    return item["future"]
+                # A newer prompt with the same key supersedes the queued one
+                if key is not None and item["key"] == key:
+                    self.pending.remove(item)
+                    item["future"].set_result(False)
+                    self.stats["dropped"] += 1
+            self.pending.append({"text": text, "key": key, "cache": cache, "future": future})
+            self._ensure_worker()
+            self.cond.notify()
+        return future
+
+    def wait(self, future, timeout=None):
+        start = time.perf_counter()
+        try:
+            return future.result(timeout)
+        finally:
+            blocked = time.perf_counter() - start
+            self._count("blocked_seconds", blocked)
+            trace.record("tts.blocked", blocked)
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        start = time.perf_counter()
+        with self.cond:
+            self.cond.wait_for(lambda: not self.pending and not self.busy, timeout)
+        self._count("blocked_seconds", time.perf_counter() - start)
+
+    def _count(self, name, amount=1):
+        with self.cond:
+            self.stats[name] += amount
+
+    def snapshot(self):
+        with self.cond:
+            return dict(self.stats)
+
+    def _ensure_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+            self.worker.start()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending)
+                item = self.pending.popleft()
+                self.busy = True
+
+            start = time.perf_counter()
+            spoken = 0
+            try:
+                with trace.span("tts.speak", cached=item["cache"]):
+                    self._speak(item["text"], item["cache"])
+                spoken = 1
+            except Exception as e:
+                print(f"[TTS Error] {e}")
+
+            with self.cond:
+                self.stats["spoken"] += spoken
+                self.stats["speaking_seconds"] += time.perf_counter() - start
+                self.busy = False
+                self.cond.notify_all()
+            item["future"].set_result(True)
+
+    def _get_engine(self):
+        if self.engine is None:
+            self.engine = pyttsx3.init()
+            self.engine.setProperty('rate', RATE)
+            self.engine.setProperty('volume', VOLUME)
+        return self.engine
+
+    def _speak(self, text, cache):
+        if cache and self._play_cached(text):
+            return
+        engine = self._get_engine()
         engine.say(text)
         engine.runAndWait()
-    except Exception as e:
-        print(f"[TTS Error] {e}")
+
+    def _play_cached(self, text):
+        # Fixed prompts are rendered to WAV once and replayed; returns False to fall back to live synthesis
+        digest = hashlib.sha256(f"{RATE}|{VOLUME}|{text}".encode("utf-8")).hexdigest()[:32]
+        path = os.path.join(CACHE_DIR, digest + ".wav")
+        try:
+            if not os.path.exists(path):
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                engine = self._get_engine()
+                engine.save_to_file(text, path + ".tmp.wav")
+                engine.runAndWait()
+                os.replace(path + ".tmp.wav", path)
+            rate, data = wav.read(path)
+            sd.play(data, rate)
+            sd.wait()
+            self._count("cached_plays")
+            return True
+        except Exception:
+            return False
+
+
+_engine = SpeechEngine()
+atexit.register(_engine.flush)
+
+
+def speak(text: str, wait=True, key=None, cache=False):
+    # wait=True blocks until spoken (the original behaviour); wait=False returns a Future.
+    # cache=True only for fixed prompts - never for text containing user data.
+    future = _engine.say(text, key=key, cache=cache)
+    if wait:
+        _engine.wait(future)
+    return future
+
+
+def speech_stats():
+    return _engine.snapshot()
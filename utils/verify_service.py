@@ -0,0 +1,412 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from utils import trace
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+face_verify = lazy_import("face_auth.recognize_face")
+detector = lazy_import("face_auth.detector")
+features = lazy_import("voice_auth.features")
+phrase_match = lazy_import("voice_auth.phrase_match")
+voice_verify = lazy_import("voice_auth.voice_verify")
+
+# === Multi-Session Verification ===
+# One host verifying many terminals at once. Terminals push camera frames and
+# endpointed utterances into their session; two worker threads (face, voice)
+# take work from all sessions in dynamic batches:
+#   - a batch takes at most one item per session, and closes when it is full
+#     or when its oldest item has waited BATCH_WAIT
+#   - face: detection per frame (skipped when the terminal sends a box), then
+#     one batched encode and one distance computation for the whole batch
+#   - voice: one MFCC pass over all utterances, GMM scores for every utterance
+#     sharing a voiceprint in one product, and one DTW sweep for every
+#     (utterance, template) pair
+#
+# Fairness: batches are filled round robin and a session that got a turn goes
+# to the back, so a terminal sending frames faster than the host can encode
+# them cannot crowd the others out.
+# Backpressure:
+#   - at most MAX_SESSIONS open sessions; open_session raises ServiceBusy beyond that
+#   - a session holds at most SESSION_FRAMES pending frames; a newer frame
+#     replaces the oldest (its future resolves to None), as the camera ring does
+#   - one pending utterance per session, and MAX_PENDING items per stage in
+#     total; beyond either, submit raises ServiceBusy and the terminal retries
+#
+# Each session is decided with the sequential flow's policy, enforced here and
+# not by the terminal:
+#   - the face passes on the first matching frame and fails after MAX_FACE_FRAMES
+#   - utterances are only accepted once the face has passed
+#   - rejected utterances count per subject (the enrolled identity), not per
+#     session, so closing and reopening a session does not buy new attempts;
+#     the voice fails once the subject has voice_verify.MAX_ATTEMPTS failures
+#     and an accepted utterance clears them
+#   - a session whose face passed and voice failed calls on_lockdown(session)
+#     on its own thread (the daemon wipes secure_files) and reports lockdown=True
+MAX_SESSIONS = int(os.environ.get("SECUREAUTH_MAX_SESSIONS", "32"))
+# dlib only runs a face batch faster than one face at a time on CUDA builds;
+# on CPU a batch costs as much per face and holds every result back until the
+# slowest is done, so CPU builds encode one frame per batch (see face_batch_size)
+FACE_BATCH = os.environ.get("SECUREAUTH_FACE_BATCH", "auto")
+CUDA_FACE_BATCH = 8
+VOICE_BATCH = 16
+BATCH_WAIT = float(os.environ.get("SECUREAUTH_BATCH_WAIT_MS", "20")) / 1000  # Longest an item waits for a batch to fill
+SESSION_FRAMES = 2
+SESSION_UTTERANCES = 1
+MAX_PENDING = 256
+MAX_FACE_FRAMES = 5  # Same as verify_face's attempts
+FACE_TOLERANCE = 0.6  # Same as face_recognition.compare_faces
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+class FailureCounter:
+    # Failed voice attempts per subject, in memory. The daemon passes utils.session
+    # instead, which has the same two calls and keeps the count on disk.
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record_failure(self, subject="owner"):
+        with self.lock:
+            self.counts[subject] = self.counts.get(subject, 0) + 1
+            return self.counts[subject]
+
+    def clear_failures(self, subject="owner"):
+        with self.lock:
+            self.counts.pop(subject, None)
+
+
+# === Dynamic Batcher ===
+class DynamicBatcher:
+    # process(items) -> one result per item, called on the worker thread with up
+    # to max_batch items taken round robin across sessions. open_sessions() caps
+    # the wait: once every open session has an item queued, nothing else can join.
+    def __init__(self, name, process, max_batch, max_wait=BATCH_WAIT, per_session=1, drop_oldest=False,
+                 max_pending=MAX_PENDING, open_sessions=None):
+        self.name = name
+        self.process = process
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.per_session = per_session
+        self.drop_oldest = drop_oldest
+        self.max_pending = max_pending
+        self.open_sessions = open_sessions
+        self.queues = OrderedDict()  # session id -> deque of (item, future, enqueued at); turn order
+        self.pending = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.stats = {"batches": 0, "items": 0, "dropped": 0, "rejected": 0}
+        self.thread = threading.Thread(target=self._run, name=f"batch-{name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, session_id, item):
+        future = Future()
+        dropped = None
+        with self.cond:
+            if self.closed:
+                raise ServiceBusy("Verification service is stopped")
+            queue = self.queues.get(session_id)
+            if queue is not None and len(queue) >= self.per_session:
+                if not self.drop_oldest:
+                    self.stats["rejected"] += 1
+                    raise ServiceBusy(f"Session {session_id} already has {len(queue)} pending {self.name} item(s)")
+                _, dropped, _ = queue.popleft()
+                self.pending -= 1
+                self.stats["dropped"] += 1
+            elif self.pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise ServiceBusy(f"{self.pending} {self.name} items pending")
+            if queue is None:
+                queue = self.queues[session_id] = deque()
+            queue.append((item, future, time.perf_counter()))
+            self.pending += 1
+            self.cond.notify()
+        if dropped is not None:
+            dropped.set_result(None)  # Superseded by a newer item from the same session
+        return future
+
+    def discard(self, session_id):
+        # A closed session's pending items are not processed
+        with self.cond:
+            queue = self.queues.pop(session_id, ())
+            self.pending -= len(queue)
+        for _, future, _ in queue:
+            future.cancel()
+
+    def _target(self):
+        if self.open_sessions is None:
+            return self.max_batch
+        return min(self.max_batch, self.open_sessions())
+
+    def _take(self):
+        # One item per session per batch: a session's next frame is only worth
+        # encoding if this one did not already decide it
+        batch = []
+        for session_id in list(self.queues):
+            queue = self.queues[session_id]
+            batch.append(queue.popleft())
+            self.pending -= 1
+            if queue:
+                self.queues.move_to_end(session_id)
+            else:
+                del self.queues[session_id]
+            if len(batch) == self.max_batch:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending or self.closed)
+                if not self.pending:
+                    return
+                deadline = min(queue[0][2] for queue in self.queues.values()) + self.max_wait
+                while len(self.queues) < self._target() and not self.closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch = self._take()
+
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                with trace.span(f"service.{self.name}_batch"):
+                    results = self.process([item for item, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stop(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+
+
+# === Sessions ===
+class VerificationSession:
+    def __init__(self, service, session_id, saved_encoding, gmm_model, phrase_templates, subject="owner"):
+        self.service = service
+        self.id = session_id
+        self.subject = subject
+        self.saved_encoding = np.asarray(saved_encoding, dtype=np.float64)
+        self.gmm_model = gmm_model
+        self.templates, self.phrase_threshold = phrase_templates
+        self.detector = None  # Created on the first frame that needs detection
+        self.frames = 0
+        self.attempts = 0
+        self.face = None  # None while undecided, then True/False
+        self.voice = None
+        self.opened = time.perf_counter()
+        self.decided = None
+
+    def submit_frame(self, rgb_frame, box=None):
+        # Future of {"match", "distance", "face"}, or None if a newer frame replaced this one.
+        # box: (top, right, bottom, left) when the terminal already located the face.
+        if self.face is not None:
+            return _done(self._face_result(None, None))
+        return self.service.faces.submit(self.id, (self, rgb_frame, box))
+
+    def submit_utterance(self, samples):
+        # Future of {"accepted", "likelihood", "phrase_distance", "voice"}; samples: int16 PCM at 16 kHz
+        if self.voice is not None:
+            return _done({"accepted": bool(self.voice), "likelihood": None, "phrase_distance": None,
+                          "voice": self.voice})
+        if not self.face:
+            raise ValueError("Voice is only accepted once the face has passed")
+        return self.service.voices.submit(self.id, (self, samples))
+
+    def _face_result(self, match, distance):
+        return {"match": match, "distance": distance, "face": self.face}
+
+    def _record_face(self, distance):
+        # On the face worker thread
+        self.frames += 1
+        match = distance is not None and distance <= FACE_TOLERANCE
+        if self.face is None:
+            if match:
+                self.face = True
+            elif self.frames >= MAX_FACE_FRAMES:
+                self.face = False
+            self._check_decided()
+        return self._face_result(match, distance)
+
+    def _record_voice(self, accepted, likelihood, phrase_distance):
+        # On the voice worker thread
+        self.attempts += 1
+        if self.voice is None:
+            failures = self.service.failures
+            if accepted:
+                self.voice = True
+                failures.clear_failures(self.subject)
+            elif failures.record_failure(self.subject) >= voice_verify.MAX_ATTEMPTS:
+                self.voice = False
+                if self.service.on_lockdown is not None:
+                    # Off the voice worker, so other sessions' utterances are not held up
+                    threading.Thread(target=self.service.on_lockdown, args=(self,), name="lockdown").start()
+            self._check_decided()
+        return {"accepted": accepted, "likelihood": likelihood, "phrase_distance": phrase_distance,
+                "voice": self.voice}
+
+    def _check_decided(self):
+        if self.decided is None and (self.face is False or self.voice is False or (self.face and self.voice)):
+            self.decided = time.perf_counter()
+
+    def decision(self):
+        # Same shape as orchestrator.verify_concurrently's outcome
+        granted = bool(self.face and self.voice)
+        end = self.decided or time.perf_counter()
+        return {"granted": granted, "face": self.face, "voice": self.voice,
+                "lockdown": bool(self.face) and self.voice is False, "decided": self.decided is not None,
+                "timings": {"total": end - self.opened}}
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def face_batch_size():
+    if FACE_BATCH != "auto":
+        return int(FACE_BATCH)
+    api = getattr(face_verify.face_recognition, "api", None)
+    cuda = api is not None and getattr(getattr(api, "dlib", None), "DLIB_USE_CUDA", False)
+    return CUDA_FACE_BATCH if cuda else 1
+
+
+# === Batch Processing ===
+def process_faces(items):
+    # items: (session, rgb frame, box or None)
+    images, boxes, owners = [], [], []
+    for i, (session, rgb, box) in enumerate(items):
+        if session.face is not None:
+            continue  # Decided by an earlier frame
+        if box is None:
+            if session.detector is None:
+                session.detector = detector.make_detector()
+            with trace.span("face.detect"):
+                found = session.detector.locate(rgb)
+            box = found[0] if found else None
+        if box is not None:
+            images.append(rgb)
+            boxes.append(tuple(int(v) for v in box))
+            owners.append(i)
+
+    distances = [None] * len(items)
+    if images:
+        with trace.span("face.encode"):
+            encodings = face_verify.encode_faces(images, boxes)
+        saved = np.stack([items[i][0].saved_encoding for i in owners])
+        for i, d in zip(owners, np.linalg.norm(encodings - saved, axis=1)):
+            distances[i] = float(d)
+    return [session._face_result(None, None) if session.face is not None and d is None else session._record_face(d)
+            for (session, _, _), d in zip(items, distances)]
+
+
+def process_voices(items):
+    # items: (session, int16 samples)
+    frames, pooled = features.extract_batch([samples for _, samples in items], voice_verify.RATE)
+    pooled = pooled.astype(np.float64)
+
+    # Utterances scored against the same voiceprint share one product
+    likelihoods = np.empty(len(items))
+    groups = {}
+    for i, (session, _) in enumerate(items):
+        groups.setdefault(id(session.gmm_model), []).append(i)
+    with trace.span("voice.score"):
+        for rows in groups.values():
+            likelihoods[rows] = items[rows[0]][0].gmm_model.score_samples(pooled[rows])
+
+    with trace.span("voice.phrase_match"):
+        distances = phrase_match.match_phrases([phrase_match.frame_features(mfcc) for mfcc in frames],
+                                               [session.templates for session, _ in items])
+
+    results = []
+    for (session, _), likelihood, phrase_distance in zip(items, likelihoods, distances):
+        phrase_distance = float(phrase_distance)
+        accepted = bool(phrase_distance <= session.phrase_threshold
+                        and likelihood >= voice_verify.LIKELIHOOD_THRESHOLD)
+        results.append(session._record_voice(accepted, round(float(likelihood), 2), round(phrase_distance, 2)))
+    return results
+
+
+# === Service ===
+class VerificationService:
+    # Sessions verify against the owner's models given here unless open_session
+    # is handed others (e.g. a claimed identity's gallery encoding and voiceprint,
+    # with that identity as the subject). failures: record_failure/clear_failures
+    # per subject (FailureCounter by default).
+    def __init__(self, saved_encoding=None, gmm_model=None, phrase_templates=None, max_sessions=MAX_SESSIONS,
+                 face_batch=None, voice_batch=VOICE_BATCH, max_wait=BATCH_WAIT, failures=None, on_lockdown=None):
+        self.failures = FailureCounter() if failures is None else failures
+        self.on_lockdown = on_lockdown
+        self.saved_encoding = saved_encoding
+        self.gmm_model = gmm_model
+        self.phrase_templates = phrase_templates
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.faces = DynamicBatcher("face", process_faces, face_batch or face_batch_size(), max_wait,
+                                    per_session=SESSION_FRAMES, drop_oldest=True, open_sessions=self.open_count)
+        self.voices = DynamicBatcher("voice", process_voices, voice_batch, max_wait,
+                                     per_session=SESSION_UTTERANCES, open_sessions=self.open_count)
+
+    def open_count(self):
+        return len(self.sessions)
+
+    def open_session(self, saved_encoding=None, gmm_model=None, phrase_templates=None, subject="owner"):
+        saved_encoding = self.saved_encoding if saved_encoding is None else saved_encoding
+        gmm_model = self.gmm_model if gmm_model is None else gmm_model
+        phrase_templates = self.phrase_templates if phrase_templates is None else phrase_templates
+        if saved_encoding is None or gmm_model is None:
+            raise ValueError("Biometric model missing. Please run setup.")
+        if not phrase_templates or not phrase_templates[0]:
+            # The phrase is checked offline with DTW only; Google ASR per utterance would not batch
+            raise ValueError("No enrolled phrase recordings (voice_auth/phrase_templates.npz). Please re-enroll.")
+        with self.lock:
+            if len(self.sessions) >= self.max_sessions:
+                raise ServiceBusy(f"{len(self.sessions)} sessions open (max {self.max_sessions})")
+            session_id = f"s{next(self.ids)}"
+            session = self.sessions[session_id] = VerificationSession(self, session_id, saved_encoding,
+                                                                      gmm_model, phrase_templates, subject)
+        return session
+
+    def session(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise ValueError(f"Unknown session: {session_id}")
+        return session
+
+    def close_session(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if session is None:
+            raise ValueError(f"Unknown session: {session_id}")
+        self.faces.discard(session_id)
+        self.voices.discard(session_id)
+        return session.decision()
+
+    def stats(self):
+        with self.lock:
+            open_sessions = len(self.sessions)
+        return {"sessions": open_sessions, "face": dict(self.faces.stats), "voice": dict(self.voices.stats)}
+
+    def stop(self):
+        self.faces.stop()
+        self.voices.stop()
@@ -0,0 +1,86 @@
+import errno
+import os
+import stat
+import time
+from utils.lazy import lazy_import
+
+ciphers = lazy_import("cryptography.hazmat.primitives.ciphers")
+
+WIPE_PASSES = 1  # One random pass is enough on modern disks; more for policy/compliance
+WIPE_BUFFER = 4 * 1024 * 1024  # Largest write buffer, reused for every write; smaller files get one their size
+
+
+# === Keystream ===
+# AES-256-CTR over a zero buffer, keyed from os.urandom once per wipe. Several
+# GB/s on one core, where os.urandom is limited by the kernel entropy path.
+class Keystream:
+    def __init__(self, size=WIPE_BUFFER):
+        algorithm = ciphers.algorithms.AES(os.urandom(32))
+        self.encryptor = ciphers.Cipher(algorithm, ciphers.modes.CTR(os.urandom(16))).encryptor()
+        self.zeros = memoryview(bytearray(size))
+
+    def fill(self, buf):
+        # update_into needs room for one extra block in the output buffer
+        self.encryptor.update_into(self.zeros[:len(buf) - 15], buf)
+        return buf
+
+
+def data_extents(fd, size):
+    # Allocated regions of a (possibly sparse) file; holes hold no data to wipe
+    if not hasattr(os, "SEEK_DATA"):
+        return [(0, size)]
+    extents = []
+    offset = 0
+    try:
+        while offset < size:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+            end = os.lseek(fd, start, os.SEEK_HOLE)
+            extents.append((start, min(end, size)))
+            offset = end
+    except OSError as e:
+        # ENXIO: no data past offset. Anything else: filesystem cannot tell, wipe everything.
+        if e.errno != errno.ENXIO:
+            return [(0, size)]
+    return extents
+
+
+def wipe_file(path, passes=WIPE_PASSES):
+    # Overwrites the file in place (no truncation, which would free the old blocks
+    # unwiped), fsyncs after every pass, then unlinks it. Returns wipe statistics.
+    result = {"path": path, "bytes": 0, "passes": 0, "seconds": 0.0, "skipped": None}
+    st = os.lstat(path)
+
+    if stat.S_ISLNK(st.st_mode) or not stat.S_ISREG(st.st_mode):
+        result["skipped"] = "not a regular file"
+    elif st.st_nlink > 1:
+        # Other names still point at the same data; overwriting would destroy files
+        # outside the protected folder, so only this name is removed
+        result["skipped"] = f"hard-linked ({st.st_nlink} links)"
+    else:
+        start = time.perf_counter()
+        # Small files get small buffers: faulting in 8 MiB per file dominated wiping many small ones
+        size = max(min(st.st_size, WIPE_BUFFER), 1)
+        keystream = Keystream(size)
+        buf = bytearray(size + 15)
+        view = memoryview(buf)
+        fd = os.open(path, os.O_WRONLY | getattr(os, "O_NOFOLLOW", 0))
+        try:
+            extents = data_extents(fd, st.st_size)
+            for _ in range(passes):
+                for start_offset, end_offset in extents:
+                    os.lseek(fd, start_offset, os.SEEK_SET)
+                    remaining = end_offset - start_offset
+                    while remaining > 0:
+                        n = min(remaining, size)
+                        keystream.fill(view[:n + 15])
+                        written = os.write(fd, view[:n])
+                        remaining -= written
+                        result["bytes"] += written
+                os.fsync(fd)
+                result["passes"] += 1
+        finally:
+            os.close(fd)
+        result["seconds"] = time.perf_counter() - start
+
+    os.remove(path)
+    return result
@@ -0,0 +1,179 @@
+import threading
+import wave
+from utils import trace
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+librosa = lazy_import("librosa")
+
+RATE = 16000
+N_MFCC = 13
+N_FFT = 2048  # librosa.feature.mfcc defaults, so features match voiceprints enrolled with librosa
+HOP_LENGTH = 512
+N_MELS = 128
+TOP_DB = 80.0
+AMIN = 1e-10
+MIN_FRAMES = 5
+BLOCK_FRAMES = 64  # Frames per FFT + mel block (about 1 MB of float32 working set)
+SEGMENT_FRAMES = 64  # ~2 s windows for segment pooling at enrollment
+SEGMENT_HOP = 16
+
+_matrices = {}
+_matrices_lock = threading.Lock()
+
+
+# === Analysis Matrices ===
+# Pure NumPy versions of librosa.filters.mel (Slaney scale and area
+# normalisation, librosa's default) and the orthonormal DCT-II, built once per
+# sample rate and kept in float32.
+def _hz_to_mel(hz):
+    hz = np.asarray(hz, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    logstep = np.log(6.4) / 27.0
+    mel = hz / f_sp
+    log_region = hz >= min_log_hz
+    mel[log_region] = min_log_hz / f_sp + np.log(hz[log_region] / min_log_hz) / logstep
+    return mel
+
+
+def _mel_to_hz(mel):
+    mel = np.asarray(mel, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_mel = 1000.0 / f_sp
+    logstep = np.log(6.4) / 27.0
+    hz = f_sp * mel
+    log_region = mel >= min_log_mel
+    hz[log_region] = 1000.0 * np.exp(logstep * (mel[log_region] - min_log_mel))
+    return hz
+
+
+def mel_filterbank(sr=RATE, n_fft=N_FFT, n_mels=N_MELS):
+    fft_freqs = np.linspace(0.0, sr / 2.0, 1 + n_fft // 2)
+    mel_min, mel_max = _hz_to_mel(np.array([0.0, sr / 2.0]))
+    mel_freqs = _mel_to_hz(np.linspace(mel_min, mel_max, n_mels + 2))
+    fdiff = np.diff(mel_freqs)
+    ramps = mel_freqs[:, None] - fft_freqs[None, :]
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0.0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_freqs[2:] - mel_freqs[:-2]))[:, None]
+    return weights.astype(np.float32)
+
+
+def dct_matrix(n_mfcc=N_MFCC, n_mels=N_MELS):
+    k = np.arange(n_mfcc)[:, None]
+    m = np.arange(n_mels)[None, :]
+    dct = np.cos(np.pi * k * (2 * m + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)
+    dct[0] /= np.sqrt(2.0)  # Orthonormal DCT-II
+    return dct.astype(np.float32)
+
+
+def analysis_matrices(sr=RATE):
+    # (window, mel_basis, dct), shared by batch extraction and StreamingMFCC
+    with _matrices_lock:
+        if sr not in _matrices:
+            n = np.arange(N_FFT)
+            window = (0.5 - 0.5 * np.cos(2.0 * np.pi * n / N_FFT)).astype(np.float32)  # Periodic Hann
+            _matrices[sr] = (window, mel_filterbank(sr), dct_matrix())
+        return _matrices[sr]
+
+
+# === Audio Input ===
+def to_float(samples):
+    # int16 PCM -> float32 in [-1, 1), the same scaling librosa.load applies
+    samples = np.asarray(samples)
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / 32768.0
+    return samples.astype(np.float32, copy=False)
+
+
+def load_wav(path, sr=RATE):
+    # 16-bit PCM WAV via the standard library; only other rates need librosa (to resample)
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit PCM, got {8 * wf.getsampwidth()}-bit")
+        rate = wf.getframerate()
+        channels = wf.getnchannels()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    y = to_float(samples)
+    if channels > 1:
+        y = y.reshape(-1, channels).mean(axis=1)
+    if rate != sr:
+        y = librosa.resample(y, orig_sr=rate, target_sr=sr).astype(np.float32)
+    return y
+
+
+# === MFCC ===
+# Same framing as librosa.feature.mfcc(center=True): n_fft // 2 zeros on both
+# ends, Hann window, power spectrum, mel, dB with an 80 dB floor, DCT.
+def frames_of(y):
+    # (frames, N_FFT) strided view over the centre-padded signal; 1 + len(y) // hop frames
+    padded = np.pad(to_float(y), N_FFT // 2)
+    return np.lib.stride_tricks.sliding_window_view(padded, N_FFT)[::HOP_LENGTH]
+
+
+def frame_power(frames, window):
+    spectrum = np.fft.rfft(frames * window, axis=1)
+    return spectrum.real ** 2 + spectrum.imag ** 2
+
+
+def mel_power(frames, window, mel_basis, out=None):
+    # (frames, n_mels) mel power, BLOCK_FRAMES at a time so the windowed frames
+    # and their spectra stay in cache instead of round-tripping through memory
+    if out is None:
+        out = np.empty((len(frames), mel_basis.shape[0]), dtype=np.float32)
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        out[start:start + BLOCK_FRAMES] = frame_power(frames[start:start + BLOCK_FRAMES], window) @ mel_basis.T
+    return out
+
+
+def mel_to_mfcc(mel, dct):
+    # mel: (frames, n_mels) power. top_db is relative to this utterance's loudest bin.
+    log_mel = 10.0 * np.log10(np.maximum(mel, np.float32(AMIN)))
+    log_mel = np.maximum(log_mel, log_mel.max() - np.float32(TOP_DB))
+    return dct @ log_mel.T  # (n_mfcc, frames), same layout as librosa
+
+
+@trace.traced("voice.mfcc")
+def mfcc(samples, sr=RATE):
+    window, mel_basis, dct = analysis_matrices(sr)
+    return mel_to_mfcc(mel_power(frames_of(samples), window, mel_basis), dct)
+
+
+def pooled(mfcc_frames):
+    # The per-utterance mean vector the voiceprint GMM is trained and scored on
+    return mfcc_frames.mean(axis=1)
+
+
+def extract(samples, sr=RATE):
+    # Returns (frame-level MFCC (n_mfcc, frames), pooled mean (n_mfcc,))
+    frames = mfcc(samples, sr)
+    return frames, pooled(frames)
+
+
+def segment_pooled(mfcc_frames, segment_frames=SEGMENT_FRAMES, hop=SEGMENT_HOP):
+    # Pooled vectors over overlapping windows of one recording (plus the whole
+    # recording), so a few enrollment sentences give the GMM more than a few points
+    n = mfcc_frames.shape[1]
+    vectors = [pooled(mfcc_frames)]
+    for start in range(0, n - segment_frames + 1, hop):
+        vectors.append(pooled(mfcc_frames[:, start:start + segment_frames]))
+    return np.stack(vectors)
+
+
+@trace.traced("voice.mfcc_batch")
+def extract_batch(utterances, sr=RATE):
+    # Several utterances in one call: one mel buffer for the whole batch, then
+    # each utterance gets its own dB floor and DCT.
+    # Returns (list of frame-level MFCCs, pooled matrix (n_utterances, n_mfcc)).
+    if len(utterances) == 0:
+        return [], np.empty((0, N_MFCC), dtype=np.float32)
+    window, mel_basis, dct = analysis_matrices(sr)
+    framed = [frames_of(y) for y in utterances]
+    bounds = np.cumsum([0] + [len(f) for f in framed])
+    mel = np.empty((bounds[-1], mel_basis.shape[0]), dtype=np.float32)
+    for f, start, end in zip(framed, bounds[:-1], bounds[1:]):
+        mel_power(f, window, mel_basis, out=mel[start:end])
+    frames = [mel_to_mfcc(mel[start:end], dct) for start, end in zip(bounds[:-1], bounds[1:])]
+    return frames, np.stack([pooled(f) for f in frames])
@@ -0,0 +1,136 @@
+import math
+from utils import model_format
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+MODEL_KIND = "gmm-diag"
+REG_COVAR = 1e-2  # Added to every variance, as GaussianMixture(reg_covar=1e-2) did at enrollment
+EM_TOL = 1e-3  # Stop when the average log-likelihood improves by less than this
+MAP_RELEVANCE = 16.0  # MAP adaptation: a component moves halfway after this much evidence
+MAX_SAMPLES = 512  # Training vectors kept with a voiceprint; the oldest are dropped beyond this
+
+
+# === Diagonal GMM ===
+# Pure NumPy replacement for sklearn's GaussianMixture(covariance_type="diag")
+# for scoring, training and adaptation. score() follows sklearn's _estimate_log_gaussian_prob
+# term for term, so thresholds tuned against GaussianMixture.score still hold.
+class DiagonalGMM:
+    def __init__(self, weights, means, precisions):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.precisions = np.asarray(precisions, dtype=np.float64)
+        if self.means.shape != self.precisions.shape or self.weights.shape != self.means.shape[:1]:
+            raise ValueError("weights, means and precisions do not describe the same mixture")
+
+        # Everything that does not depend on the input is folded in once
+        n_features = self.means.shape[1]
+        self._mean_prec = self.means * self.precisions
+        self._const = (np.log(self.weights)
+                       + 0.5 * np.sum(np.log(self.precisions), axis=1)
+                       - 0.5 * (n_features * math.log(2 * math.pi) + np.sum(self.means ** 2 * self.precisions, axis=1)))
+
+    @property
+    def n_components(self):
+        return self.means.shape[0]
+
+    @property
+    def n_features(self):
+        return self.means.shape[1]
+
+    def weighted_log_prob(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        return self._const - 0.5 * ((X ** 2) @ self.precisions.T - 2.0 * X @ self._mean_prec.T)
+
+    def score_samples(self, X):
+        weighted = self.weighted_log_prob(X)
+        peak = weighted.max(axis=1)
+        return peak + np.log(np.exp(weighted - peak[:, None]).sum(axis=1))
+
+    def score(self, X):
+        return float(self.score_samples(X).mean())
+
+    def responsibilities(self, X):
+        weighted = self.weighted_log_prob(X)
+        log_norm = self.score_samples(X)
+        return np.exp(weighted - log_norm[:, None]), float(log_norm.mean())
+
+    # === Training ===
+    # EM with the same E/M steps as sklearn's diagonal GaussianMixture, but able
+    # to start from an existing model: enrollment refines the voiceprint as each
+    # recording arrives instead of refitting from scratch at the end.
+    def refine(self, X, max_iter=100, reg_covar=REG_COVAR, tol=EM_TOL):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        model = self
+        previous = -np.inf
+        for _ in range(max_iter):
+            resp, log_likelihood = model.responsibilities(X)
+            model = DiagonalGMM._m_step(X, resp, reg_covar)
+            if abs(log_likelihood - previous) < tol:
+                break
+            previous = log_likelihood
+        return model
+
+    @staticmethod
+    def _m_step(X, resp, reg_covar):
+        nk = resp.sum(axis=0) + 10 * np.finfo(np.float64).eps
+        means = resp.T @ X / nk[:, None]
+        variances = resp.T @ (X * X) / nk[:, None] - means ** 2 + reg_covar
+        return DiagonalGMM(nk / len(X), means, 1.0 / np.maximum(variances, reg_covar))
+
+    @classmethod
+    def fit(cls, X, n_components=3, max_iter=100, reg_covar=REG_COVAR, seed=0):
+        # k-means++ seeding and a few Lloyd iterations, then EM (sklearn's "kmeans" init)
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        n_components = min(n_components, len(X))
+        rng = np.random.default_rng(seed)
+        centres = X[[rng.integers(len(X))]]
+        while len(centres) < n_components:
+            d2 = ((X[:, None, :] - centres[None]) ** 2).sum(axis=2).min(axis=1)
+            probs = d2 / d2.sum() if d2.sum() > 0 else None
+            centres = np.vstack([centres, X[rng.choice(len(X), p=probs)]])
+        for _ in range(10):
+            labels = ((X[:, None, :] - centres[None]) ** 2).sum(axis=2).argmin(axis=1)
+            centres = np.array([X[labels == c].mean(axis=0) if np.any(labels == c) else centres[c]
+                                for c in range(n_components)])
+        resp = np.eye(n_components)[labels]
+        return cls._m_step(X, resp, reg_covar).refine(X, max_iter, reg_covar)
+
+    def adapt(self, X, relevance=MAP_RELEVANCE):
+        # MAP adaptation of the means (Reynolds et al.): each component moves towards
+        # the new data in proportion to how much of it it explains, so one accepted
+        # login nudges the voiceprint without retraining or letting it drift far
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        resp, _ = self.responsibilities(X)
+        nk = resp.sum(axis=0)
+        data_means = resp.T @ X / np.maximum(nk, 1e-12)[:, None]
+        alpha = (nk / (nk + relevance))[:, None]
+        return DiagonalGMM(self.weights, alpha * data_means + (1 - alpha) * self.means, self.precisions)
+
+    @classmethod
+    def from_sklearn(cls, gmm):
+        if gmm.covariance_type == "diag":
+            precisions = 1.0 / gmm.covariances_
+        elif gmm.covariance_type == "spherical":
+            precisions = np.repeat((1.0 / gmm.covariances_)[:, None], gmm.means_.shape[1], axis=1)
+        else:
+            raise ValueError(f"Only diag/spherical mixtures can be converted, got {gmm.covariance_type}")
+        return cls(gmm.weights_, gmm.means_, precisions)
+
+    def save(self, path, samples=None):
+        # samples: optional training vectors kept with the voiceprint so it can be refined later
+        arrays = {"weights": self.weights, "means": self.means, "precisions": self.precisions}
+        if samples is not None:
+            arrays["samples"] = np.asarray(samples, dtype=np.float64)
+        return model_format.save(path, MODEL_KIND, arrays)
+
+    @classmethod
+    def load(cls, path):
+        arrays, _ = model_format.load(path, kind=MODEL_KIND)
+        return cls(arrays["weights"], arrays["means"], arrays["precisions"])
+
+
+def load_training_samples(path):
+    # Training vectors stored with the voiceprint, or None for models saved without them
+    arrays, _ = model_format.load(path, kind=MODEL_KIND)
+    return np.array(arrays["samples"]) if "samples" in arrays else None
@@ -0,0 +1,133 @@
+import os
+from utils import trace
+from utils.lazy import lazy_import
+from voice_auth.stream import StreamingMFCC, N_MELS
+
+np = lazy_import("numpy")
+
+TEMPLATE_FILE = "voice_auth/phrase_templates.npz"
+BAND = 0.25  # Sakoe-Chiba band as a fraction of the longer sequence
+TRIM_DB = 30.0  # Leading/trailing frames this far below the loudest frame are silence
+MIN_FRAMES = 5
+DEFAULT_THRESHOLD = 15.0  # Normalised DTW distance; replaced by a calibrated value when 2+ templates exist
+CALIBRATION_MARGIN = 1.5  # Accept up to this multiple of the worst template-to-template distance
+
+
+# === Frame Features ===
+# Per-frame MFCCs (c1..c12, c0 only used for trimming) with cepstral mean
+# normalisation, so the microphone and room matter less than what was said.
+def frame_features(mfcc):
+    frame_db = mfcc[0] / np.sqrt(N_MELS)
+    voiced = np.flatnonzero(frame_db >= frame_db.max() - TRIM_DB)
+    if len(voiced) == 0:
+        return None
+    feats = mfcc[1:, voiced[0]:voiced[-1] + 1].T.astype(np.float32)
+    if len(feats) < MIN_FRAMES:
+        return None
+    return feats - feats.mean(axis=0)
+
+
+def features_from_samples(samples, sr=16000):
+    extractor = StreamingMFCC(sr)
+    extractor.push(samples)
+    return frame_features(extractor.finish())
+
+
+# === Banded DTW ===
+# Cells on one anti-diagonal (i + j = k) only depend on diagonals k-1 and k-2,
+# so each diagonal is filled with one vectorized step.
+def _band_cost(a, b, band):
+    # Frame-to-frame Euclidean distances, inf outside the band
+    n, m = len(a), len(b)
+    cost = np.sqrt(np.maximum(
+        np.einsum("ij,ij->i", a, a)[:, None] - 2.0 * (a @ b.T) + np.einsum("ij,ij->i", b, b)[None, :], 0.0))
+
+    width = max(int(band * max(n, m)), abs(n - m) + 1)
+    i_idx = np.arange(n)[:, None]
+    j_idx = np.arange(m)[None, :]
+    return np.where(np.abs(i_idx * (m / n) - j_idx) <= width, cost, np.inf)
+
+
+def dtw_distance(a, b, band=BAND):
+    n, m = len(a), len(b)
+    cost = _band_cost(a, b, band)
+    acc = np.full((n + 1, m + 1), np.inf)
+    acc[0, 0] = 0.0
+    for k in range(2, n + m + 1):
+        i = np.arange(max(1, k - m), min(n, k - 1) + 1)
+        j = k - i
+        best = np.minimum(np.minimum(acc[i - 1, j - 1], acc[i - 1, j]), acc[i, j - 1])
+        acc[i, j] = cost[i - 1, j - 1] + best
+    return acc[n, m] / (n + m)
+
+
+def dtw_distance_batch(pairs, band=BAND):
+    # dtw_distance for every (a, b) pair with one anti-diagonal sweep for all of
+    # them: on phrase-length sequences the per-diagonal Python steps cost more
+    # than the arithmetic, so a batch pays for them once instead of per pair.
+    # Pairs are padded to the longest; padding cells cost inf and never reach a
+    # pair's own end cell, so every distance is exactly what dtw_distance gives.
+    if not pairs:
+        return np.empty(0)
+    n_max = max(len(a) for a, _ in pairs)
+    m_max = max(len(b) for _, b in pairs)
+    cost = np.full((len(pairs), n_max, m_max), np.inf)
+    for p, (a, b) in enumerate(pairs):
+        cost[p, :len(a), :len(b)] = _band_cost(a, b, band)
+
+    acc = np.full((len(pairs), n_max + 1, m_max + 1), np.inf)
+    acc[:, 0, 0] = 0.0
+    for k in range(2, n_max + m_max + 1):
+        i = np.arange(max(1, k - m_max), min(n_max, k - 1) + 1)
+        j = k - i
+        best = np.minimum(np.minimum(acc[:, i - 1, j - 1], acc[:, i - 1, j]), acc[:, i, j - 1])
+        acc[:, i, j] = cost[:, i - 1, j - 1] + best
+    return np.array([acc[p, len(a), len(b)] / (len(a) + len(b)) for p, (a, b) in enumerate(pairs)])
+
+
+# === Template Store ===
+def load_templates(path=TEMPLATE_FILE):
+    if not os.path.exists(path):
+        return [], DEFAULT_THRESHOLD
+    with np.load(path) as data:
+        count = int(data["count"])
+        templates = [data[f"template_{i}"] for i in range(count)]
+        threshold = float(data["threshold"])
+    return templates, threshold
+
+
+def calibrate_threshold(templates):
+    if len(templates) < 2:
+        return DEFAULT_THRESHOLD
+    worst = max(dtw_distance(a, b) for i, a in enumerate(templates) for b in templates[i + 1:])
+    return worst * CALIBRATION_MARGIN
+
+
+def save_templates(templates, path=TEMPLATE_FILE):
+    arrays = {f"template_{i}": t for i, t in enumerate(templates)}
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, count=len(templates), threshold=calibrate_threshold(templates), **arrays)
+    os.replace(tmp_path, path)
+
+
+@trace.traced("voice.phrase_dtw")
+def match_phrase(features, templates):
+    # Smallest normalised DTW distance to any enrolled recording (inf if nothing to compare)
+    if features is None or not templates:
+        return float("inf")
+    return min(dtw_distance(features, t) for t in templates)
+
+
+@trace.traced("voice.phrase_dtw_batch")
+def match_phrases(features_list, templates_list):
+    # match_phrase for several utterances at once, each against its own template
+    # list (sessions may belong to different users); one DTW sweep for all pairs
+    pairs, owners = [], []
+    for u, (features, templates) in enumerate(zip(features_list, templates_list)):
+        if features is not None:
+            pairs.extend((features, t) for t in templates)
+            owners.extend([u] * len(templates))
+    best = np.full(len(features_list), np.inf)
+    if pairs:
+        np.minimum.at(best, np.array(owners), dtw_distance_batch(pairs))
+    return best
@@ -0,0 +1,168 @@
+import os
+from utils import model_format
+from utils.lazy import lazy_import
+from voice_auth.gmm import DiagonalGMM
+
+np = lazy_import("numpy")
+
+BANK_DIR = "voice_bank"
+BANK_FILENAME = "speakers.model"
+MODEL_KIND = "speaker-bank"
+SCORE_BLOCK_SPEAKERS = 2048  # Speakers scored per block, keeps frames x components temporaries bounded
+PRUNE_FRAMES = 16  # At most this many frames are used by the coarse pass when pruning
+
+
+# === Speaker Bank ===
+# Every enrolled speaker's diagonal GMM stacked into S x C (x D) arrays, so an
+# utterance is scored against all of them in one matrix product instead of one
+# GaussianMixture.score call per user. Speakers with fewer components are padded
+# with zero-weight components, which contribute nothing to the log-sum-exp.
+class SpeakerBank:
+    def __init__(self, directory=BANK_DIR):
+        self.directory = directory
+        self.path = os.path.join(directory, BANK_FILENAME)
+        self.reload()
+
+    def reload(self):
+        self.ids = []
+        self.weights = self.means = self.precisions = None
+        if os.path.exists(self.path):
+            arrays, meta = model_format.load(self.path, kind=MODEL_KIND)
+            self.ids = meta["ids"]
+            self.weights, self.means, self.precisions = arrays["weights"], arrays["means"], arrays["precisions"]
+            if len(self.ids) != len(self.weights):
+                raise ValueError(f"Speaker bank is corrupt: {len(self.weights)} models but {len(self.ids)} ids")
+        self._prepare()
+
+    def _prepare(self):
+        # Input-independent terms, flattened to (S*C) rows for a single GEMM per block
+        if not self.ids:
+            self._const = self._mean_prec = self._prec = self._dominant = None
+            return
+        n_speakers, n_components, n_features = self.means.shape
+        with np.errstate(divide="ignore"):
+            log_weights = np.log(self.weights)
+        const = (log_weights
+                 + 0.5 * np.sum(np.log(self.precisions), axis=2)
+                 - 0.5 * (n_features * np.log(2 * np.pi) + np.sum(self.means ** 2 * self.precisions, axis=2)))
+        self._const = const.reshape(-1)
+        self._mean_prec = (self.means * self.precisions).reshape(-1, n_features)
+        self._prec = np.asarray(self.precisions).reshape(-1, n_features)
+        self._dominant = np.arange(n_speakers) * n_components + np.argmax(self.weights, axis=1)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def n_components(self):
+        return 0 if self.means is None else self.means.shape[1]
+
+    def add(self, identity, gmm):
+        return self.add_many([(identity, gmm)])
+
+    def add_many(self, speakers):
+        # speakers: (identity, gmm) pairs, gmm a DiagonalGMM or a fitted sklearn
+        # GaussianMixture (diag/spherical); re-enrolling an identity replaces its
+        # model. The bank is small (S x C x D floats), so it is rewritten
+        # atomically on each call.
+        ids = list(self.ids)
+        weights, means, precisions = ([], [], []) if self.means is None else \
+            (list(self.weights), list(self.means), list(self.precisions))
+        added = 0
+        for identity, gmm in speakers:
+            if not identity:
+                raise ValueError("Speaker identity must be a non-empty string")
+            if not isinstance(gmm, DiagonalGMM):
+                gmm = DiagonalGMM.from_sklearn(gmm)
+            if identity in ids:
+                i = ids.index(identity)
+                weights[i], means[i], precisions[i] = gmm.weights, gmm.means, gmm.precisions
+            else:
+                ids.append(identity)
+                weights.append(gmm.weights)
+                means.append(gmm.means)
+                precisions.append(gmm.precisions)
+            added += 1
+        if not added:
+            return 0
+        if len({m.shape[1] for m in means}) != 1:
+            raise ValueError("All speaker models must use the same number of features")
+
+        n_components = max(len(w) for w in weights)
+        padded = [self._padded(w, m, p, n_components) for w, m, p in zip(weights, means, precisions)]
+        weights, means, precisions = (np.stack(a) for a in zip(*padded))
+
+        os.makedirs(self.directory, exist_ok=True)
+        model_format.save(self.path, MODEL_KIND,
+                          {"weights": weights, "means": means, "precisions": precisions},
+                          meta={"ids": ids})
+        self.reload()
+        return added
+
+    @staticmethod
+    def _padded(weights, means, precisions, n_components):
+        pad = n_components - len(weights)
+        if pad == 0:
+            return weights, means, precisions
+        return (np.concatenate([weights, np.zeros(pad)]),
+                np.concatenate([means, np.zeros((pad, means.shape[1]))]),
+                np.concatenate([precisions, np.ones((pad, means.shape[1]))]))
+
+    def model(self, identity):
+        i = self.ids.index(identity)
+        keep = self.weights[i] > 0
+        return DiagonalGMM(self.weights[i][keep], self.means[i][keep], self.precisions[i][keep])
+
+    # === Batched Scoring ===
+    # Average per-frame log-likelihood of X under every speaker, i.e. the value
+    # GaussianMixture.score(X) would give for each one.
+    def score_all(self, X, speakers=None):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        rows = np.arange(len(self)) if speakers is None else np.asarray(speakers)
+        n_components = self.n_components
+        x_sq = X ** 2
+        scores = np.empty(len(rows))
+
+        for start in range(0, len(rows), SCORE_BLOCK_SPEAKERS):
+            block = rows[start:start + SCORE_BLOCK_SPEAKERS]
+            flat = (block[:, None] * n_components + np.arange(n_components)).reshape(-1)
+            # (frames, speakers * components) in one product, then log-sum-exp over components
+            weighted = self._const[flat] - 0.5 * (x_sq @ self._prec[flat].T - 2.0 * X @ self._mean_prec[flat].T)
+            weighted = weighted.reshape(len(X), len(block), n_components)
+            peak = weighted.max(axis=2)
+            per_frame = peak + np.log(np.exp(weighted - peak[..., None]).sum(axis=2))
+            scores[start:start + len(block)] = per_frame.mean(axis=0)
+        return scores
+
+    def coarse_scores(self, X):
+        # Cheap pruning score: each speaker's heaviest component only (a lower
+        # bound of its log-sum-exp), over at most PRUNE_FRAMES evenly spaced frames
+        if len(X) > PRUNE_FRAMES:
+            X = X[np.linspace(0, len(X) - 1, PRUNE_FRAMES).astype(int)]
+        rows = self._dominant
+        weighted = self._const[rows] - 0.5 * ((X ** 2) @ self._prec[rows].T - 2.0 * X @ self._mean_prec[rows].T)
+        return weighted.mean(axis=0)
+
+    def search(self, X, k=1, prune=None):
+        # Top-k (indices, scores), best first. With prune=M the coarse pass keeps
+        # the M most likely speakers and only those get the exact score.
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        candidates = None
+        if prune is not None and max(prune, k) < len(self):
+            keep = max(prune, k)
+            candidates = np.argpartition(-self.coarse_scores(X), keep - 1)[:keep]
+
+        scores = self.score_all(X, candidates)
+        rows = np.arange(len(self)) if candidates is None else candidates
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def match(self, X, k=1, threshold=None, prune=None):
+        # Returns up to k (identity, log-likelihood) pairs at or above threshold
+        idx, scores = self.search(X, k, prune=prune)
+        return [(self.ids[i], float(s)) for i, s in zip(idx, scores) if threshold is None or s >= threshold]
@@ -0,0 +1,72 @@
+from utils.lazy import lazy_import
+from voice_auth.features import (RATE, N_MFCC, N_FFT, HOP_LENGTH, N_MELS, analysis_matrices, mel_power,
+                                 mel_to_mfcc, to_float)
+
+np = lazy_import("numpy")
+
+
+# === In-Memory Audio Buffer ===
+# One preallocated int16 buffer shared by capture, MFCC and phrase recognition.
+class AudioBuffer:
+    def __init__(self, max_samples):
+        self.data = np.zeros(max_samples, dtype=np.int16)
+        self.length = 0
+
+    def append(self, samples):
+        samples = samples[:len(self.data) - self.length]
+        self.data[self.length:self.length + len(samples)] = samples
+        self.length += len(samples)
+        return len(samples)
+
+    @property
+    def samples(self):
+        return self.data[:self.length]
+
+    def to_bytes(self):
+        return self.samples.tobytes()
+
+
+# === Streaming MFCC ===
+# Computes mel power frames as audio arrives, so when recording ends only the
+# dB scaling and DCT of the already-computed frames remain. Framing matches
+# librosa.feature.mfcc(center=True): n_fft//2 zeros are padded on both ends.
+class StreamingMFCC:
+    def __init__(self, sr=RATE):
+        self.sr = sr
+        self.window, self.mel_basis, self.dct = analysis_matrices(sr)
+        self.pending = np.zeros(N_FFT // 2, dtype=np.float32)  # Leading centre padding
+        self.mel_frames = []
+        self.total_samples = 0
+        self.finished = False
+
+    def push(self, samples):
+        # samples: raw int16 PCM (or floats already scaled to [-1, 1])
+        samples = to_float(samples)
+        self.total_samples += len(samples)
+        self.pending = np.concatenate([self.pending, samples])
+        self._consume()
+
+    def _consume(self):
+        n_frames = 1 + (len(self.pending) - N_FFT) // HOP_LENGTH if len(self.pending) >= N_FFT else 0
+        if n_frames <= 0:
+            return
+        idx = np.arange(N_FFT)[None, :] + HOP_LENGTH * np.arange(n_frames)[:, None]
+        self.mel_frames.append(mel_power(self.pending[idx], self.window, self.mel_basis))
+        self.pending = self.pending[n_frames * HOP_LENGTH:]
+
+    def finish(self):
+        # Trailing centre padding, then the frames librosa would produce: 1 + n // hop
+        if not self.finished:
+            self.pending = np.concatenate([self.pending, np.zeros(N_FFT // 2, dtype=np.float32)])
+            self._consume()
+            self.finished = True
+        return self.mfcc()
+
+    def mfcc(self):
+        if not self.mel_frames:
+            return np.zeros((N_MFCC, 0), dtype=np.float32)
+        mel = np.vstack(self.mel_frames)[:1 + self.total_samples // HOP_LENGTH]
+        return mel_to_mfcc(mel, self.dct)
+
+    def mean(self):
+        return np.mean(self.finish().T, axis=0)
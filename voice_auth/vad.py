@@ -0,0 +1,156 @@
+import os
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# === Voice-Activity Endpointing ===
+# Recording starts listening as before, but the take ends shortly after the
+# speaker stops instead of after a fixed window, and only the speech (plus a
+# short margin) reaches the MFCC front end.
+#
+# Energy-based, per 20 ms frame, against a noise floor measured at the start of
+# the recording. Onset needs ONSET_FRAMES loud frames in a row; once speaking,
+# a quieter OFFSET threshold applies (hysteresis), and the take only ends after
+# HANGOVER_MS of silence, so pauses between words do not cut it. Nothing is
+# emitted until MIN_SPEECH_MS of speech confirms the onset: a shorter burst is
+# folded back into the wait. With no confirmed onset before the wait runs out
+# (counted from the first frame, bursts included), the whole recording is kept
+# (the old behaviour).
+ENABLED = os.environ.get("SECUREAUTH_VAD", "on") != "off"
+FRAME_MS = 20
+CALIBRATION_MS = 160  # Opening frames that set the noise floor (the quietest one wins)
+NOISE_FLOOR_DB = -60.0  # Floor never assumed below this (digital silence would make any hiss "speech")
+ONSET_DB = 12.0  # Above the noise floor to start speech
+OFFSET_DB = 6.0  # Above the noise floor to keep speech going
+ONSET_FRAMES = 3
+HANGOVER_MS = 500
+PRE_ROLL_MS = 200  # Kept before the onset frames: soft consonants start below the threshold
+TAIL_MS = 150  # Kept after the last speech frame
+MIN_SPEECH_MS = 300  # Shorter bursts (a click, a cough) do not end the wait
+
+
+def frame_db(frame):
+    x = frame.astype(np.float32) / 32768.0
+    return 10.0 * np.log10(float(np.mean(x * x)) + 1e-10)
+
+
+class Endpointer:
+    # push(int16 samples) returns the samples to keep, as soon as that is known;
+    # `done` turns True once the utterance has ended (or the wait/length cap hit).
+    def __init__(self, rate, max_wait_seconds, max_speech_seconds):
+        self.rate = rate
+        self.frame = rate * FRAME_MS // 1000
+        self.max_wait_frames = int(max_wait_seconds * 1000 / FRAME_MS)
+        self.max_speech_frames = int(max_speech_seconds * 1000 / FRAME_MS)
+        self.calibration = []
+        self.floor_db = None
+        self.state = "waiting"  # waiting -> speech -> done
+        self.leftover = np.zeros(0, dtype=np.int16)
+        self.waiting = []  # Every frame before the confirmed onset (kept whole if speech never starts)
+        self.pending = []  # Pre-roll and speech since an unconfirmed onset, emitted once confirmed
+        self.confirmed = False
+        self.run = 0
+        self.held = []  # Quiet frames during speech: kept if speech resumes, dropped after the hangover
+        self.speech_frames = 0
+        self.frames_seen = 0
+        self.onset_frame = None
+        self.end_frame = None
+
+    @property
+    def done(self):
+        return self.state == "done"
+
+    def push(self, samples):
+        samples = np.concatenate([self.leftover, np.asarray(samples, dtype=np.int16).reshape(-1)])
+        usable = len(samples) - len(samples) % self.frame
+        self.leftover = samples[usable:]
+        kept = []
+        for start in range(0, usable, self.frame):
+            if self.done:
+                break
+            kept.extend(self._frame(samples[start:start + self.frame]))
+        return np.concatenate(kept) if kept else np.zeros(0, dtype=np.int16)
+
+    def _frame(self, frame):
+        self.frames_seen += 1
+        db = frame_db(frame)
+        if self.floor_db is None:
+            self.calibration.append(db)
+            self.waiting.append(frame)
+            if len(self.calibration) * FRAME_MS >= CALIBRATION_MS:
+                self.floor_db = max(min(self.calibration), NOISE_FLOOR_DB)
+            return []
+
+        if self.state == "waiting":
+            self.waiting.append(frame)
+            self.run = self.run + 1 if db >= self.floor_db + ONSET_DB else 0
+            if self.run >= ONSET_FRAMES:
+                self.state = "speech"
+                self.onset_frame = self.frames_seen - ONSET_FRAMES
+                self.pending = self.waiting[-(ONSET_FRAMES + PRE_ROLL_MS // FRAME_MS):]
+                self.speech_frames = ONSET_FRAMES
+                return []
+            return self._wait_over()
+
+        # Speaking
+        if not self.confirmed:
+            self.waiting.append(frame)  # Still part of the wait if the burst is too short
+        if db >= self.floor_db + OFFSET_DB:
+            kept, self.held = self.held + [frame], []
+            self.speech_frames += len(kept)
+        else:
+            self.held.append(frame)
+            kept = []
+            if len(self.held) * FRAME_MS >= HANGOVER_MS:
+                if self.speech_frames * FRAME_MS < MIN_SPEECH_MS:
+                    # Too short to be the phrase (a click, a cough): none of it was
+                    # emitted, and the wait goes on where it was
+                    self.state = "waiting"
+                    self.pending, self.held, self.run = [], [], 0
+                    self.speech_frames, self.onset_frame = 0, None
+                    return self._wait_over()
+                kept = self.held[:TAIL_MS // FRAME_MS]
+                self._end()
+        if self.speech_frames >= self.max_speech_frames:
+            self._end()
+        if not self.confirmed:
+            self.pending.extend(kept)
+            if self.speech_frames * FRAME_MS < MIN_SPEECH_MS and not self.done:
+                return self._wait_over()
+            self.confirmed = True
+            kept, self.pending, self.waiting = self.pending, [], []
+        return kept
+
+    def _wait_over(self):
+        # Nobody spoke (confirmed) before the wait ran out: keep everything, as the fixed window did
+        if self.frames_seen < self.max_wait_frames:
+            return []
+        self._end()
+        self.onset_frame = None
+        kept, self.waiting, self.pending = self.waiting, [], []
+        return kept
+
+    def _end(self):
+        self.state = "done"
+        self.end_frame = self.frames_seen
+
+    def stats(self):
+        # Seconds listened, and when speech started (None if it never did)
+        seconds = lambda frames: None if frames is None else frames * FRAME_MS / 1000
+        return {"listened": seconds(self.frames_seen), "onset": seconds(self.onset_frame),
+                "speech": seconds(self.speech_frames) if self.onset_frame is not None else 0.0}
+
+
+def record(mic, rate, chunk, max_seconds, consume, cancel_event=None):
+    # Reads `chunk` samples at a time until the utterance ends; consume(samples)
+    # receives the kept audio as soon as it is decided (e.g. buffer + streaming
+    # MFCC). Returns the Endpointer (see stats()), or None if cancelled.
+    # The wait for speech and the speech itself are each capped at max_seconds.
+    endpointer = Endpointer(rate, max_wait_seconds=max_seconds, max_speech_seconds=max_seconds)
+    while not endpointer.done:
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        kept = endpointer.push(mic.read(chunk))
+        if len(kept):
+            consume(kept)
+    return endpointer
@@ -1,97 +1,189 @@
 import os
-import sounddevice as sd
-import numpy as np
-import scipy.io.wavfile as wav
-import pickle
 import time
-from sklearn.mixture import GaussianMixture as GMM
+from concurrent.futures import ThreadPoolExecutor
 from utils.tts import speak
-import librosa
+from utils import sources, trace
+from utils.lazy import lazy_import
+from voice_auth import features, phrase_match, vad
+from voice_auth.gmm import DiagonalGMM, MAX_SAMPLES, load_training_samples
+from voice_auth.speaker_bank import SpeakerBank
+
+np = lazy_import("numpy")
+wav = lazy_import("scipy.io.wavfile")
 
 SAMPLE_RATE = 16000
-DURATION = 4  # seconds
+DURATION = 4  # seconds; with the endpointer, the longest wait for speech and the longest take
+CHUNK = 1024
 TEMP_DIR = "voice_auth/temp"
-MODEL_FILE = "voiceprint.gmm"
+MODEL_FILE = "voiceprint.model"
 SECRET_FILE = "voice_auth/secret_phrase.txt"
+PHRASE_REPETITIONS = 2  # Extra recordings of the secret phrase kept as offline match templates
+N_COMPONENTS = 3
+GUIDED_SENTENCES = [
+    "Security is not a product, it's a process.",
+    "Voice authentication is active now.",
+    "This is a test to train your voice model."
+]
 
-def record_voice(filename):
+@trace.traced("voice.record")
+def record_samples():
+    # One take as int16, or None if it failed or was too quiet
     try:
         speak(f"Recording started. Please speak now.")
-        print(f"🎤 Recording: {filename}")
-        audio = sd.rec(int(DURATION * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1, dtype='int16')
-        sd.wait()
+        mic = sources.open_microphone(SAMPLE_RATE, chunk=CHUNK, backend="sounddevice")
+        if vad.ENABLED:
+            # Stops shortly after the sentence ends; only the speech is kept
+            kept = []
+            vad.record(mic, SAMPLE_RATE, CHUNK, DURATION, kept.append)
+            audio = np.concatenate(kept) if kept else np.zeros(0, dtype=np.int16)
+        else:
+            audio = mic.read(int(DURATION * SAMPLE_RATE))
+        mic.close()
+
+        if len(audio) == 0:
+            print("❌ No audio recorded.")
+            return None
 
         if np.max(audio) - np.min(audio) < 500:
             print("❌ Audio too quiet. Please speak louder.")
-            return False
-
-        wav.write(filename, SAMPLE_RATE, audio)
-        return True
+            return None
+        return audio.reshape(-1)
     except Exception as e:
         print(f"❌ Error recording voice: {e}")
+        return None
+
+def record_voice(filename):
+    print(f"🎤 Recording: {filename}")
+    audio = record_samples()
+    if audio is None:
         return False
+    wav.write(filename, SAMPLE_RATE, audio)
+    return True
 
 def extract_features(file_path):
     try:
-        y, sr = librosa.load(file_path, sr=SAMPLE_RATE)
-        if np.abs(y).mean() < 0.001:
-            print("❌ Audio file too silent. Skipping.")
-            return None
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        if mfcc.shape[1] < 5:
-            print("❌ Not enough MFCC data. Skipping.")
-            return None
-        return np.mean(mfcc.T, axis=0)
+        return sample_vectors(features.load_wav(file_path, SAMPLE_RATE))
     except Exception as e:
         print(f"❌ Error extracting features: {e}")
         return None
 
-def record_and_save_voice():
-    os.makedirs(TEMP_DIR, exist_ok=True)
-    features = []
+def sample_vectors(samples):
+    # Training vectors for one recording (whole-take and ~2 s segment MFCC means), or None if unusable
+    y = features.to_float(samples)
+    if np.abs(y).mean() < 0.001:
+        print("❌ Audio file too silent. Skipping.")
+        return None
+    mfcc = features.mfcc(y, SAMPLE_RATE)
+    if mfcc.shape[1] < features.MIN_FRAMES:
+        print("❌ Not enough MFCC data. Skipping.")
+        return None
+    return features.segment_pooled(mfcc)
 
-    speak("We will now record your voice three times using different sentences.")
-    guided_sentences = [
-        "Security is not a product, it's a process.",
-        "Voice authentication is active now.",
-        "This is a test to train your voice model."
-    ]
-
-    for i, sentence in enumerate(guided_sentences, start=1):
-        file_path = os.path.join(TEMP_DIR, f"sample_{i}.wav")
-        speak(f"Please say the following sentence: {sentence}")
-        print(f"🗣️ Speak this: \"{sentence}\"")
+# === Background Trainer ===
+# Feature extraction and EM run on a worker thread while the next sentence is
+# prompted and recorded. Each recording refines the current model (warm-started
+# EM over all stored vectors) instead of fitting from scratch at the end.
+# Voiceprints saved without training vectors are MAP-adapted instead.
+class VoiceprintTrainer:
+    def __init__(self, model=None, vectors=None):
+        self.model = model
+        self.vectors = vectors
+        self.adapt_only = model is not None and vectors is None
+        self.recordings = 0
+        self.train_seconds = 0.0
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="enroll")
+        self.pending = []
 
-        success = record_voice(file_path)
-        if success:
-            feat = extract_features(file_path)
-            if feat is not None:
-                features.append(feat)
-            else:
-                print("❌ Skipped invalid sample.")
+    def submit(self, samples):
+        self.pending.append(self.pool.submit(self._train, samples))
+
+    @trace.traced("voice.train")
+    def _train(self, samples):
+        start = time.perf_counter()
+        new = sample_vectors(samples)
+        if new is None:
+            print("❌ Skipped invalid sample.")
+            return False
+
+        if self.adapt_only:
+            self.model = self.model.adapt(new)
         else:
+            self.vectors = new if self.vectors is None else np.vstack([self.vectors, new])[-MAX_SAMPLES:]
+            if self.model is None or self.model.n_components < N_COMPONENTS:
+                self.model = DiagonalGMM.fit(self.vectors, N_COMPONENTS)
+            else:
+                self.model = self.model.refine(self.vectors)
+        self.recordings += 1
+        self.train_seconds += time.perf_counter() - start
+        return True
+
+    def finish(self):
+        for future in self.pending:
+            future.result()
+        self.pool.shutdown()
+        return self.model
+
+def record_sentences(trainer, sentences):
+    for sentence in sentences:
+        speak(f"Please say the following sentence: {sentence}")
+        print(f"🗣️ Speak this: \"{sentence}\"")
+        samples = record_samples()
+        if samples is None:
             print("❌ Voice recording failed.")
+            continue
+        trainer.submit(samples)
 
-    if len(features) < 2:
+@trace.traced("voice.enroll")
+def record_and_save_voice(identity=None):
+    start = time.perf_counter()
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    speak("We will now record your voice three times using different sentences.")
+    trainer = VoiceprintTrainer()
+    record_sentences(trainer, GUIDED_SENTENCES)
+
+    speak("Training voice model now.", wait=False)
+    model = trainer.finish()
+    if trainer.recordings < 2:
         speak("Not enough valid audio data. Please try again.")
         raise ValueError("Not enough valid samples to train voice model.")
 
-    speak("Training voice model now.")
-    gmm = GMM(n_components=3, max_iter=200, covariance_type='diag', n_init=3, reg_covar=1e-2)
-
     try:
-        gmm.fit(np.vstack(features))
-        with open(MODEL_FILE, 'wb') as f:
-            pickle.dump(gmm, f)
+        # Training vectors are kept with the model so later samples refine it
+        model.save(MODEL_FILE, samples=trainer.vectors)
+        # Multi-user deployments also enroll the voiceprint into the shared speaker bank
+        if identity:
+            SpeakerBank().add(identity, model)
         speak("Voice model saved successfully.")
         print("✅ Voice model trained and saved.")
     except Exception as e:
         print(f"❌ Error training GMM: {e}")
         speak("Voice model training failed due to audio or hardware issue. Please restart the application.")
         exit(1)
+    print(f"⏱ Voice enrollment took {time.perf_counter() - start:.1f}s "
+          f"(feature extraction and training: {trainer.train_seconds:.2f}s, in the background)")
 
     capture_secret_phrase()
 
+@trace.traced("voice.enroll_more")
+def add_voice_samples(sentences=GUIDED_SENTENCES, identity=None):
+    # Later enrollment: refines the existing voiceprint with new recordings
+    if not os.path.exists(MODEL_FILE):
+        print("❌ No voice model found. Please run setup first.")
+        return None
+    start = time.perf_counter()
+    trainer = VoiceprintTrainer(DiagonalGMM.load(MODEL_FILE), load_training_samples(MODEL_FILE))
+    record_sentences(trainer, sentences)
+    model = trainer.finish()
+    if trainer.recordings == 0:
+        print("❌ No usable recordings. Voice model unchanged.")
+        return None
+    model.save(MODEL_FILE, samples=trainer.vectors)
+    if identity:
+        SpeakerBank().add(identity, model)
+    print(f"✅ Voice model updated with {trainer.recordings} new sample(s) "
+          f"in {time.perf_counter() - start:.1f}s.")
+    return model
+
 def capture_secret_phrase():
     for attempt in range(3):
         speak("Please speak your secret phrase.")
@@ -99,22 +191,23 @@ def capture_secret_phrase():
         success = record_voice("voice_auth/temp/secret.wav")
         if success:
             try:
-                y, sr = librosa.load("voice_auth/temp/secret.wav", sr=SAMPLE_RATE)
-                text_attempt = input("🗣️ Enter what you just said (as best as you can): ").strip()
+                _, samples = wav.read("voice_auth/temp/secret.wav")
+                text_attempt = sources.ask("🗣️ Enter what you just said (as best as you can): ").strip()
                 speak(f"You said: {text_attempt}. Is this correct?")
-                confirm = input("✅ Is this correct? (y/n): ").strip().lower()
+                confirm = sources.ask("✅ Is this correct? (y/n): ").strip().lower()
                 if confirm == "y":
                     with open(SECRET_FILE, "w") as f:
                         f.write(text_attempt)
                     speak("Secret phrase saved successfully.")
                     print("✅ Secret phrase saved.")
+                    save_phrase_templates(samples.reshape(-1))
                     return
             except Exception as e:
                 print(f"❌ Could not process recording: {e}")
 
     speak("Voice input failed. Please type your secret phrase.")
     print("❌ Voice recording failed. Please type your secret phrase manually:")
-    phrase = input("📝 Secret phrase: ").strip()
+    phrase = sources.ask("📝 Secret phrase: ").strip()
     try:
         with open(SECRET_FILE, "w") as f:
             f.write(phrase)
@@ -123,3 +216,27 @@ def capture_secret_phrase():
     except:
         print("❌ Failed to save secret phrase.")
         print("Please manually create a file at voice_auth/secret_phrase.txt or rerun the app.")
+
+@trace.traced("voice.phrase_templates")
+def save_phrase_templates(first_samples):
+    # Frame-level MFCC templates of the spoken phrase, for offline DTW matching at login
+    templates = []
+    first = phrase_match.features_from_samples(first_samples, SAMPLE_RATE)
+    if first is not None:
+        templates.append(first)
+
+    for i in range(PHRASE_REPETITIONS):
+        speak("Please say your secret phrase once more.")
+        print(f"🔁 Repetition {i + 1} of {PHRASE_REPETITIONS}: Speak your secret phrase again.")
+        if not record_voice("voice_auth/temp/secret.wav"):
+            continue
+        _, samples = wav.read("voice_auth/temp/secret.wav")
+        feats = phrase_match.features_from_samples(samples.reshape(-1), SAMPLE_RATE)
+        if feats is not None:
+            templates.append(feats)
+
+    if not templates:
+        print("⚠️ No usable phrase recording. Phrase checks will use speech recognition.")
+        return
+    phrase_match.save_templates(templates)
+    print(f"✅ Saved {len(templates)} offline phrase template(s).")
@@ -2,18 +2,27 @@ import os
 import wave
 import pickle
 import time
-import numpy as np
-import speech_recognition as sr
-from sklearn.mixture import GaussianMixture
-import pyaudio
 import difflib
 from utils import encryption
+from utils import session
 from utils import tts
+from utils import sources
+from utils import trace
+from utils.lazy import lazy_import
+from voice_auth.stream import AudioBuffer, StreamingMFCC
+from voice_auth import features
+from voice_auth import phrase_match
+from voice_auth import vad
+from voice_auth.gmm import DiagonalGMM, MAX_SAMPLES, load_training_samples
+from voice_auth.speaker_bank import SpeakerBank
 from pathlib import Path
 
-VOICE_MODEL_FILE = "voiceprint.gmm"
+np = lazy_import("numpy")
+sr = lazy_import("speech_recognition")
+
+VOICE_MODEL_FILE = "voiceprint.model"
+LEGACY_VOICE_MODEL_FILE = "voiceprint.gmm"  # Pickled sklearn GaussianMixture; run python -m utils.migrate_models
 PHRASE_FILE = "voice_auth/secret_phrase.txt"
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 16000
 CHUNK = 1024
@@ -23,11 +32,15 @@ TEMP_FILE = "voice_auth/temp_verify.wav"
 MAX_ATTEMPTS = 3
 SIMILARITY_THRESHOLD = 0.8
 LIKELIHOOD_THRESHOLD = -100  # Set a more realistic threshold based on training
+# "dtw" matches against the enrolled phrase recordings offline; "text" uses Google ASR + difflib
+PHRASE_BACKEND = os.environ.get("SECUREAUTH_PHRASE_BACKEND", "dtw")
+# Confident logins nudge the voiceprint towards the user's current voice (MAP adaptation)
+ADAPT_ON_LOGIN = os.environ.get("SECUREAUTH_VOICE_ADAPT") == "1"
+ADAPT_MARGIN = 10.0  # Only logins at least this far above LIKELIHOOD_THRESHOLD adapt the model
 
+@trace.traced("voice.capture")
 def record_for_verification(filename):
-    audio = pyaudio.PyAudio()
-    stream = audio.open(format=FORMAT, channels=CHANNELS,
-                        rate=RATE, input=True, frames_per_buffer=CHUNK)
+    mic = sources.open_microphone(RATE, CHANNELS, CHUNK)
 
     print("\n🎙 Please speak your secret phrase when prompted...")
     tts.speak("Please speak your secret phrase when prompted")
@@ -37,32 +50,91 @@ def record_for_verification(filename):
     frames = []
 
     for _ in range(0, int(RATE / CHUNK * RECORD_SECONDS)):
-        data = stream.read(CHUNK)
-        frames.append(data)
+        frames.append(mic.read(CHUNK))
 
     print("🔵 Done recording.\n")
     tts.speak("Recording done")
 
-    stream.stop_stream()
-    stream.close()
-    audio.terminate()
+    mic.close()
 
     with wave.open(filename, 'wb') as wf:
         wf.setnchannels(CHANNELS)
-        wf.setsampwidth(audio.get_sample_size(FORMAT))
+        wf.setsampwidth(2)  # int16
         wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
+        wf.writeframes(np.concatenate(frames).tobytes())
+
+@trace.traced("voice.capture")
+def record_to_memory(cancel_event=None, settle_seconds=1):
+    # Same prompts as record_for_verification, but the audio stays in one int16
+    # buffer and MFCC frames are computed while it streams in. With the endpointer
+    # (voice_auth/vad.py) recording stops shortly after the phrase ends and only
+    # the speech reaches the buffer; it waits up to RECORD_SECONDS for speech to start.
+    # Returns (None, None) if cancel_event is set while recording.
+    mic = sources.open_microphone(RATE, CHANNELS, CHUNK)
+
+    print("\n🎙 Please speak your secret phrase when prompted...")
+    tts.speak("Please speak your secret phrase when prompted", cache=True)
+    time.sleep(settle_seconds)
+    print("🔴 Recording... Speak NOW!")
+    tts.speak("Recording started. Speak now.", cache=True)
+
+    n_chunks = int(RATE / CHUNK * RECORD_SECONDS)
+    mfcc = StreamingMFCC(RATE)
+    cancelled = False
+    if vad.ENABLED:
+        buffer = AudioBuffer(2 * n_chunks * CHUNK)  # Up to RECORD_SECONDS of waiting, then of speech
+
+        def consume(samples):
+            buffer.append(samples)
+            mfcc.push(samples)
+
+        endpointer = vad.record(mic, RATE, CHUNK, RECORD_SECONDS, consume, cancel_event)
+        cancelled = endpointer is None
+    else:
+        buffer = AudioBuffer(n_chunks * CHUNK)
+        for _ in range(n_chunks):
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                break
+            chunk = mic.read(CHUNK)
+            buffer.append(chunk)
+            mfcc.push(chunk)
+
+    mic.close()
+    if cancelled:
+        print("⏹ Recording cancelled.")
+        return None, None
+
+    if vad.ENABLED:
+        stats = endpointer.stats()
+        if stats["onset"] is None:
+            print(f"🔵 Done recording (no speech detected in {stats['listened']:.1f}s).\n")
+        else:
+            print(f"🔵 Done recording: {stats['speech']:.1f}s of speech, listened {stats['listened']:.1f}s "
+                  f"(fixed window {RECORD_SECONDS}s).\n")
+    else:
+        print("🔵 Done recording.\n")
+    tts.speak("Recording done", wait=False, cache=True)
+    return buffer, mfcc
 
 def extract_features(filename):
-    import librosa
-    y, sr = librosa.load(filename, sr=RATE)
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    return np.mean(mfcc.T, axis=0)
+    _, pooled = features.extract(features.load_wav(filename, RATE), RATE)
+    return pooled
 
 def recognize_phrase_from_audio(filename):
     recognizer = sr.Recognizer()
     with sr.AudioFile(filename) as source:
         audio = recognizer.record(source)
+    return _recognize(recognizer, audio)
+
+def recognize_phrase_from_buffer(samples):
+    # int16 mono PCM straight from memory, no WAV round trip
+    recognizer = sr.Recognizer()
+    audio = sr.AudioData(samples.tobytes(), RATE, 2)
+    return _recognize(recognizer, audio)
+
+@trace.traced("voice.asr")
+def _recognize(recognizer, audio):
     try:
         return recognizer.recognize_google(audio, language='en-IN').lower()
     except sr.UnknownValueError:
@@ -71,54 +143,136 @@ def recognize_phrase_from_audio(filename):
         print("⚠️ Speech recognition failed. Check internet.")
         return None
 
-def verify_speaker_and_phrase():
-    if not os.path.exists(VOICE_MODEL_FILE) or not os.path.exists(PHRASE_FILE):
-        print("❌ Voice model or passphrase file not found. Please run initial setup first.")
-        tts.speak("Setup incomplete. Please run registration.")
-        return False
+def voice_model_exists():
+    return os.path.exists(VOICE_MODEL_FILE) or os.path.exists(LEGACY_VOICE_MODEL_FILE)
 
-    with open(VOICE_MODEL_FILE, "rb") as f:
-        gmm_model = pickle.load(f)
+def load_voice_models():
+    # The native model needs only NumPy; a legacy pickle still pulls in sklearn once
+    if os.path.exists(VOICE_MODEL_FILE):
+        gmm_model = DiagonalGMM.load(VOICE_MODEL_FILE)
+    else:
+        print("⚠️ Loading legacy pickled voice model. Run: python -m utils.migrate_models")
+        with open(LEGACY_VOICE_MODEL_FILE, "rb") as f:
+            gmm_model = DiagonalGMM.from_sklearn(pickle.load(f))
 
     with open(PHRASE_FILE, "r") as f:
         saved_phrase = f.read().strip().lower()
+    return gmm_model, saved_phrase
 
-    for attempt in range(1, MAX_ATTEMPTS + 1):
-        print(f"\n🔁 Attempt {attempt} of {MAX_ATTEMPTS}")
-        tts.speak(f"Attempt {attempt} of {MAX_ATTEMPTS}")
-        record_for_verification(TEMP_FILE)
+@trace.traced("voice.adapt")
+def adapt_voiceprint(vector, log_likelihood):
+    # Called after an accepted attempt; returns the adapted model or None if skipped
+    if log_likelihood < LIKELIHOOD_THRESHOLD + ADAPT_MARGIN or not os.path.exists(VOICE_MODEL_FILE):
+        return None
+    model = DiagonalGMM.load(VOICE_MODEL_FILE).adapt(vector)
+    samples = load_training_samples(VOICE_MODEL_FILE)
+    if samples is not None:
+        samples = np.vstack([samples, vector])[-MAX_SAMPLES:]
+    model.save(VOICE_MODEL_FILE, samples=samples)
+    print("🔧 Voiceprint adapted.")
+    return model
 
-        print("🧠 Analyzing voice...")
-        tts.speak("Analyzing voice")
-        features = extract_features(TEMP_FILE).reshape(1, -1)
-        log_likelihood = gmm_model.score(features)
+@trace.traced("voice.attempt")
+def voice_attempt(gmm_model, saved_phrase, phrase_templates, cancel_event=None, settle_seconds=1, on_accept=None,
+                  on_scores=None):
+    # One record-and-score pass. Returns True/False, or None when the phrase could
+    # not be understood or the recording was cancelled. on_accept(vector, log_likelihood)
+    # runs after an accepted attempt; on_scores(dict) receives the likelihood and phrase score.
+    templates, phrase_threshold = phrase_templates
+    # Without enrolled recordings (typed phrase fallback) only the text backend can work
+    use_dtw = PHRASE_BACKEND == "dtw" and bool(templates)
 
-        recognized_phrase = recognize_phrase_from_audio(TEMP_FILE)
+    buffer, mfcc = record_to_memory(cancel_event, settle_seconds)
+    if buffer is None:
+        return None
+
+    print("🧠 Analyzing voice...")
+    tts.speak("Analyzing voice", wait=False, key="status", cache=True)
+    vector = mfcc.mean().reshape(1, -1)
+    with trace.span("voice.score"):
+        log_likelihood = gmm_model.score(vector)
+
+    if use_dtw:
+        # Reuses the MFCC frames computed during capture; no network round trip
+        phrase_distance = phrase_match.match_phrase(phrase_match.frame_features(mfcc.finish()), templates)
+        phrase_ok = phrase_distance <= phrase_threshold
+        scores = {"phrase_distance": round(float(phrase_distance), 2)}
+        print(f"🔍 Phrase distance:     {phrase_distance:.2f} (max {phrase_threshold:.2f})")
+    else:
+        recognized_phrase = recognize_phrase_from_buffer(buffer.samples)
         if not recognized_phrase:
             print("❌ Could not understand your voice. Try again.")
-            tts.speak("Could not understand your voice. Please try again.")
-            time.sleep(5)
-            continue
+            tts.speak("Could not understand your voice. Please try again.", wait=False, key="status", cache=True)
+            return None
 
         phrase_similarity = difflib.SequenceMatcher(None, recognized_phrase, saved_phrase).ratio()
+        phrase_ok = phrase_similarity >= SIMILARITY_THRESHOLD
+        scores = {"phrase_similarity": round(phrase_similarity, 2)}
 
         print(f"🗣 You said:            '{recognized_phrase}'")
         print(f"🔍 Phrase similarity:   {phrase_similarity:.2f}")
-        print(f"🎯 Voice likelihood:    {log_likelihood:.2f}")
+    print(f"🎯 Voice likelihood:    {log_likelihood:.2f}")
+    if on_scores is not None:
+        on_scores(dict(scores, likelihood=round(float(log_likelihood), 2)))
+
+    accepted = bool(phrase_ok and log_likelihood >= LIKELIHOOD_THRESHOLD)
+    if accepted and on_accept is not None:
+        on_accept(vector, log_likelihood)
+    return accepted
 
-        if phrase_similarity >= SIMILARITY_THRESHOLD and log_likelihood >= LIKELIHOOD_THRESHOLD:
+@trace.traced("voice.identify")
+def identify_speaker(k=1, threshold=LIKELIHOOD_THRESHOLD, prune=None):
+    # Returns the top-k (identity, log-likelihood) speakers from the bank, or [] if nobody scored high enough
+    bank = SpeakerBank()
+    if len(bank) == 0:
+        print("❌ Speaker bank is empty. Please enroll speakers first.")
+        return []
+
+    buffer, mfcc = record_to_memory()
+    print("🧠 Identifying speaker...")
+    matches = bank.match(mfcc.mean(), k=k, threshold=threshold, prune=prune)
+    if matches:
+        print(f"✅ Identified: {matches[0][0]} (likelihood {matches[0][1]:.2f})")
+    else:
+        print("❌ Voice not found in speaker bank.")
+    return matches
+
+@trace.traced("voice.verify")
+def verify_speaker_and_phrase(gmm_model=None, saved_phrase=None, phrase_templates=None):
+    # A warm caller (the auth daemon) passes models it already holds in memory
+    if gmm_model is None or saved_phrase is None:
+        if not voice_model_exists() or not os.path.exists(PHRASE_FILE):
+            print("❌ Voice model or passphrase file not found. Please run initial setup first.")
+            tts.speak("Setup incomplete. Please run registration.", wait=False)
+            return False
+        gmm_model, saved_phrase = load_voice_models()
+    if phrase_templates is None:
+        phrase_templates = phrase_match.load_templates()
+
+    # Continues from the failures left by earlier runs and other entry points
+    # (utils/.failures), so repeated requests do not each get MAX_ATTEMPTS
+    for attempt in range(session.failures() + 1, MAX_ATTEMPTS + 1):
+        print(f"\n🔁 Attempt {attempt} of {MAX_ATTEMPTS}")
+        tts.speak(f"Attempt {attempt} of {MAX_ATTEMPTS}", wait=False, key="attempt", cache=True)
+        result = voice_attempt(gmm_model, saved_phrase, phrase_templates,
+                               on_accept=adapt_voiceprint if ADAPT_ON_LOGIN else None)
+
+        if result:
+            session.clear_failures()
             print("✅ Voice and phrase match! Access granted.")
-            tts.speak("Access granted.")
+            tts.speak("Access granted.", wait=False, cache=True)
             return True
-        else:
+        session.record_failure()
+        if result is not None:
             print("❌ Verification failed.")
-            tts.speak("Verification failed.")
-            time.sleep(5)
+            tts.speak("Verification failed.", wait=False, key="status", cache=True)
+        if attempt < MAX_ATTEMPTS:
+            time.sleep(5)  # Not after the last attempt: the lockdown starts at once
 
     # After 3 failed attempts, encrypt and delete
     print("\n⛔ Maximum attempts reached.")
     print("🔐 Initiating secure file destruction process...")
-    tts.speak("Maximum attempts reached. Initiating secure destruction.")
+    tts.speak("Maximum attempts reached. Initiating secure destruction.", wait=False, cache=True)
     PROTECTED_FOLDER = Path("secure_files")  
     encryption.secure_delete_folder(PROTECTED_FOLDER)
     return False